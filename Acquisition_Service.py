@@ -0,0 +1,269 @@
+#Script for a local service that polls the sensor nodes once and shares the readings with every other script
+
+
+import asyncio  # Module for serving many local subscribers while polling the nodes
+import json     # Module for encoding the readings sent to subscribers
+import os       # Module for file system operations (for removing a stale socket file)
+import socket   # Module for connecting to the service from the other scripts
+import time     # Module for handling time-related functions (for timestamps and reconnect delays)
+
+from Async_Poller import AsyncSensorPoller, poll_forever
+from Metrics import READINGS, READ_FAILURES, QUEUE_DEPTH, QUEUE_DROPPED, start_metrics_server
+
+# The sensor nodes to poll, and how often. Subscribers that want fewer readings ask for a longer interval.
+SENSOR_HOSTS = ["192.168.0.5"]
+POLL_INTERVAL = 4.0
+REQUEST_TIMEOUT = 5.0
+# Where the service listens: a Unix socket path, or a (host, port) pair where Unix sockets aren't available
+SERVICE_ADDRESS = "/tmp/sensor_readings.sock" if hasattr(socket, "AF_UNIX") else ("127.0.0.1", 8765)
+# Readings held for a subscriber that isn't keeping up, before the oldest are dropped
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Serve the service's metrics (see Metrics.py) at http://127.0.0.1:METRICS_PORT/metrics, or None not to
+METRICS_PORT = 9109
+
+
+def encode_reading(host, timestamp, temperature_c, humidity):
+    """
+    Encode a reading as one line of the service's protocol.
+
+    Args:
+        host (str): The node the reading came from.
+        timestamp (float): Time of the reading in seconds since the epoch.
+        temperature_c (float): Temperature in degrees Celsius, or None if the node could not be read.
+        humidity (float): Relative humidity in percentage, or None if the node could not be read.
+
+    Returns:
+        bytes: A JSON object followed by a newline.
+    """
+    return (json.dumps({"host": host, "time": timestamp, "temperature": temperature_c,
+                        "humidity": humidity}) + "\n").encode('utf-8')
+
+
+def decode_reading(line):
+    """
+    Decode one line of the service's protocol.
+
+    Args:
+        line (bytes): A line as written by encode_reading.
+
+    Returns:
+        tuple: The host, timestamp, temperature (°C) and humidity (%).
+    """
+    reading = json.loads(line)
+    return reading["host"], reading["time"], reading["temperature"], reading["humidity"]
+
+
+class Subscriber:
+    """
+    One connected consumer, with its own host filter, downsampling rate and send queue.
+    """
+
+    def __init__(self, hosts=None, min_interval=0.0, slack=0.0):
+        """
+        Args:
+            hosts (list of str): Only send readings from these nodes, or None for every node.
+            min_interval (float): Minimum seconds between two readings sent for the same node.
+            slack (float): How early a reading may arrive and still count for the next interval,
+                so small polling jitter doesn't push it back a whole poll.
+        """
+        self.hosts = None if hosts is None else set(hosts)
+        self.min_interval = min_interval
+        self.slack = slack
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+        self._next_due = {}
+        self._next_failure_due = {}
+
+    def offer(self, host, timestamp, temperature_c, humidity):
+        """
+        Queue a reading for this subscriber if it wants it.
+
+        Failed readings (None values) are downsampled separately from good ones: the first failure in
+        each interval is passed on, so the subscriber can tell the node is down, without it holding
+        back the next good reading.
+        """
+        if self.hosts is not None and host not in self.hosts:
+            return
+        next_due = self._next_due if temperature_c is not None else self._next_failure_due
+        if timestamp < next_due.get(host, timestamp) - self.slack:
+            return
+        next_due[host] = timestamp + self.min_interval
+        if self.queue.full():
+            # A slow subscriber loses its oldest readings rather than holding up the others
+            self.queue.get_nowait()
+            self.dropped += 1
+            QUEUE_DROPPED.labels('subscribers').inc()
+        self.queue.put_nowait(encode_reading(host, timestamp, temperature_c, humidity))
+
+
+class ReadingPublisher:
+    """
+    Fan readings out to every connected subscriber over a local socket.
+
+    A subscriber connects, sends one JSON line such as {"min_interval": 300, "hosts": ["192.168.0.5"]}
+    (an empty line takes the defaults) and then receives one JSON line per reading, as
+    written by encode_reading.
+    """
+
+    def __init__(self, slack=0.0):
+        """
+        Args:
+            slack (float): Passed on to every Subscriber - normally half the polling interval.
+        """
+        self.slack = slack
+        self.subscribers = set()
+
+    def publish(self, host, temperature_c, humidity, timestamp=None):
+        """
+        Send a reading to every subscriber that wants it.
+
+        Args:
+            host (str): The node the reading came from.
+            temperature_c (float): Temperature in degrees Celsius, or None if the node could not be read.
+            humidity (float): Relative humidity in percentage, or None if the node could not be read.
+            timestamp (float): Time of the reading in seconds since the epoch, or None for now.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if temperature_c is None:
+            READ_FAILURES.labels(host).inc()
+        else:
+            READINGS.labels(host).inc()
+        for subscriber in self.subscribers:
+            subscriber.offer(host, timestamp, temperature_c, humidity)
+        QUEUE_DEPTH.labels('subscribers').set(max((subscriber.queue.qsize() for subscriber in self.subscribers), default=0))
+
+    async def _handle_client(self, reader, writer):
+        # Read the subscription, then stream the subscriber's queue to it until it disconnects
+        subscriber = None
+        try:
+            line = (await reader.readline()).strip()
+            request = json.loads(line) if line else {}
+            subscriber = Subscriber(request.get("hosts"), float(request.get("min_interval", 0.0)), self.slack)
+            self.subscribers.add(subscriber)
+            while True:
+                writer.write(await subscriber.queue.get())
+                await writer.drain()
+        except (ConnectionError, ValueError, AttributeError) as e:
+            print(f"Subscriber disconnected: {e}")
+        except asyncio.CancelledError:
+            # The service is shutting down
+            pass
+        finally:
+            if subscriber is not None:
+                self.subscribers.discard(subscriber)
+            writer.close()
+
+    async def serve(self, address=SERVICE_ADDRESS):
+        """
+        Start listening for subscribers.
+
+        Args:
+            address (str or tuple): A Unix socket path, or a (host, port) pair for TCP.
+
+        Returns:
+            asyncio.Server: The running server.
+        """
+        if isinstance(address, str):
+            # A socket file left behind by a previous run would stop the server starting
+            if os.path.exists(address):
+                os.remove(address)
+            return await asyncio.start_unix_server(self._handle_client, address)
+        return await asyncio.start_server(self._handle_client, *address)
+
+
+async def run_service(hosts=SENSOR_HOSTS, interval=POLL_INTERVAL, address=SERVICE_ADDRESS, timeout=REQUEST_TIMEOUT):
+    """
+    Poll every node once per interval and publish the readings until interrupted.
+
+    Args:
+        hosts (list of str): The IP addresses or hostnames of the sensor nodes.
+        interval (float): Seconds between polls - the fastest rate any subscriber can get.
+        address (str or tuple): Where to listen for subscribers.
+        timeout (float): Seconds to wait for each request to a node.
+    """
+    publisher = ReadingPublisher(slack=interval / 2)
+    server = await publisher.serve(address)
+    print(f"Publishing readings from {len(hosts)} node(s) on {address}")
+    try:
+        poller = AsyncSensorPoller(hosts, timeout=timeout)
+        await poll_forever(poller, interval, publisher.publish)
+    finally:
+        server.close()
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)
+
+
+def _connect(address):
+    # Open a blocking socket to the service
+    if isinstance(address, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        connection.connect(address)
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+def subscribe(min_interval=0.0, hosts=None, address=SERVICE_ADDRESS, idle_timeout=None, reconnect_delay=5.0):
+    """
+    Receive readings from the acquisition service, reconnecting whenever it is unavailable.
+
+    Args:
+        min_interval (float): Minimum seconds between two readings from the same node.
+        hosts (list of str): Only receive readings from these nodes, or None for every node.
+        address (str or tuple): Where the service listens.
+        idle_timeout (float): Yield None after this many seconds without a reading, so the
+            caller can do other work, or None to wait indefinitely.
+        reconnect_delay (float): Seconds to wait before trying to reconnect.
+
+    Yields:
+        tuple: The host, timestamp, temperature (°C) and humidity (%) of each reading
+               (the values are None if the node could not be read), or None when idle.
+    """
+    request = (json.dumps({"min_interval": min_interval, "hosts": hosts}) + "\n").encode('utf-8')
+    while True:
+        try:
+            connection = _connect(address)
+        except OSError as e:
+            print(f"Could not connect to the acquisition service at {address}: {e}")
+            time.sleep(reconnect_delay)
+            yield None
+            continue
+        try:
+            connection.settimeout(idle_timeout)
+            connection.sendall(request)
+            received = b""
+            while True:
+                try:
+                    data = connection.recv(65536)
+                except socket.timeout:
+                    yield None
+                    continue
+                if not data:
+                    raise ConnectionResetError("service closed the connection")
+                # Hold back a partly received line until the rest of it arrives
+                *lines, received = (received + data).split(b"\n")
+                for line in lines:
+                    yield decode_reading(line)
+        except OSError as e:
+            print(f"Lost connection to the acquisition service: {e}")
+        finally:
+            connection.close()
+
+
+# This ensures that the service only runs when the script is executed
+if __name__ == "__main__":
+    if METRICS_PORT is not None:
+        try:
+            start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            # The metrics are only for watching the service - e.g. a port in use mustn't stop it
+            print(f"Not serving metrics on port {METRICS_PORT}: {e}")
+    try:
+        asyncio.run(run_service())
+    except KeyboardInterrupt:
+        pass
@@ -1,183 +1,368 @@
 #Script for animated plot
 
-import urllib.request
-import re
 import time
+import queue
+import threading
+import urllib.parse
+import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
+# The fetch/parse/convert functions are shared with the other scripts
+from Sensor_Data import get_readings
+from Acquisition_Service import subscribe, SERVICE_ADDRESS
+from Metrics import QUEUE_DEPTH, QUEUE_DROPPED
+from History_Store import HistoryStore
+from Log_Writer import wall_clock_seconds
+
 # Global variables to store the IP address and update interval
 SENSOR_URL = "http://192.168.0.5/"
 temp_url = "http://192.168.0.5/temp"      #read sensor readings from these urls
 hmdt_url = "http://192.168.0.5/humidity"
 
 
-UPDATE_INTERVAL = 4000  # Update interval in milliseconds
-
-# Data lists to store temperature and humidity values for plotting
-temperatures = []
-humidities = []
+FETCH_INTERVAL = 4.0    # Seconds between readings from the sensor
+FRAME_INTERVAL = 250    # Milliseconds between redraws of the plot
+REQUEST_TIMEOUT = 5.0   # Seconds to wait for the sensor before giving up on a request
+QUEUE_SIZE = 100        # Readings the background thread may queue up before the oldest are dropped
+STALE_AFTER = 3 * FETCH_INTERVAL  # Seconds without a reading before the plot is marked stale
+WINDOW_LENGTH = 200     # Number of most recent points shown on the plot
+# Plot the readings of a running Acquisition_Service.py instead of polling the sensor here
+USE_ACQUISITION_SERVICE = False
+# Every reading is also kept in a HistoryStore; press these keys to show the last hour/day/week of it
+# ('1' goes back to the live window)
+HISTORY_KEYS = {'1': None, '2': 3600, '3': 24 * 3600, '4': 7 * 24 * 3600}
+# Sensor log to fill the history from at startup (parsed once, then cached), or None to start empty
+HISTORY_LOG = None
 
-def fetch_sensor_data(url):
+def read_sensor():
     """
-    Fetch raw HTML data from the sensor's web server.
-   
-    Args:
-        url (str): The URL of the sensor's web server.
-       
+    Fetch, parse and convert one reading from the sensor.
+
     Returns:
-        str: HTML content from the server, or None if an error occurs.
+        tuple: The temperature in Celsius and the humidity percentage,
+               or (None, None) if data retrieval fails.
     """
-    try:
-        with urllib.request.urlopen(url) as response: #Send HTTP request to url
-            #This reads the entire content of the response as a sequence of bytes.    
-            #Since the response.read() returns a byte object, decode('utf-8') converts it into a string
-            data = response.read().decode('utf-8')
-            return data
-    #error handling
-    except Exception as e:
-        print(f"Error fetching data from {url}: {e}")
-        return None
-
-#parse => break down data for easier management
-def parse_sensor_data_temp(temp_html_data):
+    temp_c, humidity = get_readings(temp_url, hmdt_url, REQUEST_TIMEOUT)
+    if temp_c is None:
+        print("No data received from sensor.")
+    return temp_c, humidity
+
+class AcquisitionThread(threading.Thread):
     """
-    Parse the temperature and humidity data from the HTML content.
+    Background thread that reads the sensor on a fixed cadence and queues the readings.
 
-    Args:
-        html_data (str): The HTML content containing the sensor data.
+    The network requests happen here rather than in the animation callback, so a
+    stalled or unreachable sensor never freezes the plot window. Readings are put
+    on a bounded queue as (timestamp, temperature_c, humidity); if the plot falls
+    behind, the oldest queued readings are dropped to make room.
+    """
 
-    Returns:
-        tuple: A tuple containing the temperature in Fahrenheit and the humidity percentage,
-               or (None, None) if parsing fails.
+    def __init__(self, readings, fetch_interval=FETCH_INTERVAL, read=read_sensor):
+        """
+        Args:
+            readings (queue.Queue): Bounded queue to put the readings on.
+            fetch_interval (float): Seconds between the starts of consecutive readings.
+            read (callable): Returns one (temperature_c, humidity) reading, with Nones on failure.
+        """
+        super().__init__(name="sensor-acquisition", daemon=True)
+        self.readings = readings
+        self.fetch_interval = fetch_interval
+        self.read = read
+        self.last_attempt = None  # time.time() of the last finished attempt, successful or not
+        self._stop_event = threading.Event()
+
+    def _publish(self, reading):
+        # Make room by dropping the oldest reading rather than blocking the thread
+        while True:
+            try:
+                self.readings.put_nowait(reading)
+                QUEUE_DEPTH.labels('plot').set(self.readings.qsize())
+                return
+            except queue.Full:
+                try:
+                    self.readings.get_nowait()
+                    QUEUE_DROPPED.labels('plot').inc()
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        next_fetch = time.monotonic()
+        while not self._stop_event.is_set():
+            temp_c, humidity = self.read()
+            self.last_attempt = time.time()
+            if temp_c is not None and humidity is not None:
+                self._publish((self.last_attempt, temp_c, humidity))
+            # Keep to the cadence however long the requests took, skipping slots that were missed
+            next_fetch += self.fetch_interval
+            now = time.monotonic()
+            if next_fetch < now:
+                next_fetch = now
+            self._stop_event.wait(next_fetch - now)
+
+    def stop(self):
+        """
+        Ask the thread to finish after its current reading.
+        """
+        self._stop_event.set()
+
+class SubscriptionThread(AcquisitionThread):
     """
-    try:
-        # Define regular expression patterns to find temperature and humidity values
-        #r denotes raw string => regex syntax will work
-        #\d: Matches any digit (0-9)
-        #\.: Matches a literal period (.), allowing for decimal numbers.
-        #+ allows multiple digits/ decimal points.
-        # F is just fahrenheit after the temperature value
-        temp_pattern = r"Temperature: ([\d\.]+) F"
-
-        # Search the HTML data for the temperature pattern
-        temp_match = re.search(temp_pattern, temp_html_data)
-
-        if temp_match:
-            # Extract the temperature value from the regex match and convert to float
-            temperature_f = float(temp_match.group(1))
-           
-            return temperature_f
-        else:
-            # If the patterns are not found, print a warning message
-            print("Failed to parse sensor temperature data from HTML content.")
-            return None
-    #error handling
-    except Exception as e:
-        # Print an error message if something goes wrong during parsing
-        print(f"Error parsing sensor temperature data: {e}")
-        return None
-       
-def parse_sensor_data_hmdt(hmdt_html_data):
+    Background thread that takes the readings from the acquisition service instead of the sensor.
+
+    The service downsamples the readings to at most one per fetch_interval, and the
+    readings are queued exactly like AcquisitionThread's.
     """
-    Parse the temperature and humidity data from the HTML content.
 
-    Args:
-        html_data (str): The HTML content containing the sensor data.
+    def __init__(self, readings, fetch_interval=FETCH_INTERVAL, host=None, address=SERVICE_ADDRESS):
+        """
+        Args:
+            readings (queue.Queue): Bounded queue to put the readings on.
+            fetch_interval (float): Minimum seconds between two readings.
+            host (str): The node to plot, or None for the node in SENSOR_URL.
+            address (str or tuple): Where the acquisition service listens.
+        """
+        super().__init__(readings, fetch_interval)
+        self.host = host if host is not None else urllib.parse.urlsplit(SENSOR_URL).hostname
+        self.address = address
 
-    Returns:
-        tuple: A tuple containing the temperature in Fahrenheit and the humidity percentage,
-               or (None, None) if parsing fails.
+    def run(self):
+        # Wake up at least once a second to check whether the thread should stop
+        for reading in subscribe(self.fetch_interval, [self.host], self.address, idle_timeout=1.0):
+            if self._stop_event.is_set():
+                return
+            if reading is None:
+                continue
+            _, timestamp, temp_c, humidity = reading
+            self.last_attempt = time.time()
+            if temp_c is not None and humidity is not None:
+                self._publish((timestamp, temp_c, humidity))
+
+class RingBuffer:
     """
-    try:
-        # Define regular expression patterns to find temperature and humidity values
-        humidity_pattern = r"Humidity: ([\d\.]+)%"
+    Fixed-capacity circular buffer of (temperature, humidity) pairs in preallocated NumPy arrays.
 
-        # Search the HTML data for the humidity pattern
-        humidity_match = re.search(humidity_pattern, hmdt_html_data)
+    Every sample is stored twice, 'capacity' slots apart, so the most recent samples
+    are always one contiguous slice - reading them never copies or reorders anything.
+    """
 
-        if humidity_match:
-            # Extract the humidity value from the regex match and convert to float
-            humidity = float(humidity_match.group(1))
-            return humidity
-        else:
-            # If the patterns are not found, print a warning message
-            print("Failed to parse sensor humidity data from HTML content.")
-            return None
-    except Exception as e:
-        # Print an error message if something goes wrong during parsing
-        print(f"Error parsing sensor humidity data: {e}")
-        return None
-
-def fahrenheit_to_celsius(temp_f):
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity (int): Maximum number of samples kept; older ones are overwritten.
+        """
+        self.capacity = capacity
+        self._temperatures = np.zeros(2 * capacity)
+        self._humidities = np.zeros(2 * capacity)
+        self._next = 0   # slot the next sample goes into
+        self.count = 0   # number of samples currently held
+
+    def append(self, temperature, humidity):
+        """
+        Add a sample, overwriting the oldest one if the buffer is full. O(1).
+        """
+        self._temperatures[self._next] = self._temperatures[self._next + self.capacity] = temperature
+        self._humidities[self._next] = self._humidities[self._next + self.capacity] = humidity
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def view(self):
+        """
+        Get the held samples, oldest first.
+
+        Returns:
+            tuple: Views of the temperatures and humidities (not copies).
+        """
+        start = (self._next - self.count) % self.capacity
+        return (self._temperatures[start:start + self.count],
+                self._humidities[start:start + self.count])
+
+
+class LivePlot:
     """
-    Convert Fahrenheit to Celsius.
-   
-    Args:
-        temp_f (float): Temperature in Fahrenheit.
-       
-    Returns:
-        float: Temperature in Celsius.
+    Real-time temperature vs. humidity plot that is drawn with blitting.
+
+    The line, labels, title and grid are created once. Each frame only updates the
+    line's data, so redrawing costs the same however long the window is. The axes
+    are only redrawn in full when a point falls outside the current limits.
     """
-    return (temp_f - 32) * 5.0 / 9.0
 
-def update_plot(frame):
+    def __init__(self, ax, readings, window_length=WINDOW_LENGTH, margin=0.1, stale_after=STALE_AFTER, history=None):
+        """
+        Args:
+            ax: The Matplotlib axes to draw on.
+            readings (queue.Queue): Queue of (timestamp, temperature_c, humidity) readings to plot.
+            window_length (int): Number of most recent points to show.
+            margin (float): Extra room added around the data when the limits grow, as a fraction of the range.
+            stale_after (float): Seconds without a new reading before the plot is marked stale.
+            history (HistoryStore): Store every reading is added to, for show_span, or None for a new one.
+        """
+        self.ax = ax
+        self.readings = readings
+        self.buffer = RingBuffer(window_length)
+        self.history = HistoryStore(sample_interval=FETCH_INTERVAL) if history is None else history
+        self.span = None  # seconds of history shown, or None for the live window
+        self.margin = margin
+        self.stale_after = stale_after
+        self.last_reading = None  # timestamp of the newest reading plotted
+        self.started = time.time()
+        # Create the artists once - animated=True keeps them out of the normal (full) redraws
+        self.line, = ax.plot([], [], color='b', marker='o', linestyle='-', animated=True)
+        # Status text in the top left corner, e.g. "Last reading 3 s ago"
+        self.status = ax.text(0.02, 0.97, "", transform=ax.transAxes, va='top', animated=True)
+        ax.set_xlabel("Temperature (°C)")
+        ax.set_ylabel("Humidity (%)")
+        ax.set_title("Real-Time Temperature vs. Humidity")
+        ax.grid(True) #plot a grid to make value comparison easier.
+
+    def init(self):
+        """
+        Init function for FuncAnimation - draws the (empty) line.
+        """
+        self._refresh_line()
+        return [self.line, self.status]
+
+    def _refresh_line(self):
+        # Show the live window, or the history of the last 'span' seconds at a resolution that suits the width
+        if self.span is None:
+            self.line.set_data(*self.buffer.view())
+            return
+        end = self.history.last_time
+        if end is None:
+            self.line.set_data([], [])
+            return
+        history = self.history.query(end - self.span, end, max_points=max(int(self.ax.bbox.width), 100))
+        self.line.set_data(history['Temperature'], history['Humidity'])
+
+    def _fit_limits(self, temp_c=None, humidity=None):
+        # Grow the limits (with some room to spare) if the new point doesn't fit
+        (x_low, x_high), (y_low, y_high) = self.ax.get_xlim(), self.ax.get_ylim()
+        temperatures, humidities = (np.asarray(data, dtype=float) for data in self.line.get_data())
+        if temp_c is not None and x_low <= temp_c <= x_high and y_low <= humidity <= y_high and len(temperatures) > 1:
+            return
+        if not np.isfinite(temperatures).any() or not np.isfinite(humidities).any():
+            return
+        x_min, x_max = np.nanmin(temperatures), np.nanmax(temperatures)
+        y_min, y_max = np.nanmin(humidities), np.nanmax(humidities)
+        x_pad = max((x_max - x_min) * self.margin, 0.5)
+        y_pad = max((y_max - y_min) * self.margin, 0.5)
+        self.ax.set_xlim(x_min - x_pad, x_max + x_pad)
+        self.ax.set_ylim(y_min - y_pad, y_max + y_pad)
+        # The ticks have changed, so the static background has to be redrawn once
+        self.ax.figure.canvas.draw()
+
+    def add_reading(self, temp_c, humidity, timestamp=None):
+        """
+        Add a reading to the plot's window and its history.
+
+        Args:
+            temp_c (float): Temperature in degrees Celsius.
+            humidity (float): Relative humidity in percentage.
+            timestamp (float): Time of the reading in seconds since the epoch, or None for now.
+        """
+        self.buffer.append(temp_c, humidity)
+        self.history.append(wall_clock_seconds(time.time() if timestamp is None else timestamp), temp_c, humidity)
+        self._refresh_line()
+        self._fit_limits(temp_c, humidity)
+
+    def show_span(self, span):
+        """
+        Switch between the live window and the history of the last 'span' seconds.
+
+        Args:
+            span (float): Seconds of history to show, or None for the live window.
+        """
+        self.span = span
+        self._refresh_line()
+        title = "Real-Time Temperature vs. Humidity"
+        if span is not None:
+            title += f" (last {span / 3600:g} h)"
+        self.ax.set_title(title)
+        self._fit_limits()
+        self.ax.figure.canvas.draw()
+
+    def on_key(self, event):
+        """
+        Key press handler - the keys in HISTORY_KEYS switch between the live window and the history.
+        """
+        if event.key in HISTORY_KEYS:
+            self.show_span(HISTORY_KEYS[event.key])
+
+    def _update_status(self):
+        # Show how old the newest reading is, in red once it is older than stale_after
+        now = time.time()
+        if self.last_reading is None:
+            waited = now - self.started
+            self.status.set_text(f"Waiting for data ({waited:.0f} s)")
+            self.status.set_color('red' if waited > self.stale_after else 'black')
+        else:
+            age = now - self.last_reading
+            stale = age > self.stale_after
+            self.status.set_text(f"Last reading {age:.0f} s ago" + (" - STALE" if stale else ""))
+            self.status.set_color('red' if stale else 'black')
+
+    def update(self, frame):
+        """
+        Update function for the animated plot.
+
+        Only takes the readings the acquisition thread has queued - it never waits on the network.
+
+        Args:
+            frame: Frame number (not used here but required by FuncAnimation).
+
+        Returns:
+            List of plot elements that have changed (required by FuncAnimation).
+        """
+        # Drain everything queued since the last frame
+        while True:
+            try:
+                timestamp, temp_c, humidity = self.readings.get_nowait()
+            except queue.Empty:
+                break
+            self.add_reading(temp_c, humidity, timestamp)
+            self.last_reading = timestamp
+        QUEUE_DEPTH.labels('plot').set(0)
+        self._update_status()
+        # Return the changed artists for FuncAnimation to re-render
+        return [self.line, self.status]
+
+
+def main():
     """
-    Update function for the animated plot.
-   
-    Args:
-        frame: Frame number (not used here but required by FuncAnimation).
-       
-    Returns:
-        List of plot elements that have changed (required by FuncAnimation).
+    Set up the figure and run the animated plot until the window is closed.
     """
-   # Fetch the raw HTML data from the sensor's web server
-    temp_html_data = fetch_sensor_data(temp_url)
-    hmdt_html_data = fetch_sensor_data(hmdt_url)
-    
-    #if both the temp and humidity variable values aren't None, False, 0 or empty
-    if temp_html_data and hmdt_html_data:
-        # Parse the temperature and humidity values from the HTML data
-        temp_f = parse_sensor_data_temp(temp_html_data)
-        humidity = parse_sensor_data_hmdt(hmdt_html_data)
-       
-        
-        #if both the temp and humidity aren't None
-        if temp_f is not None and humidity is not None:
-            # Convert the temperature from Fahrenheit to Celsius
-            temp_c = fahrenheit_to_celsius(temp_f)
-
-            # Append data to lists
-            temperatures.append(temp_c)
-            humidities.append(humidity)
-           
-            # Limit data lists to the last 100 points for better performance
-            if len(temperatures) > 200:
-                temperatures.pop(0)
-                humidities.pop(0)
-           
-            # Clear and update the plot
-            plt.cla()  # Clear the axes for the new plot
-            plt.plot(temperatures, humidities, color='b', marker='o', linestyle='-')
-            plt.xlabel("Temperature (°C)")
-            plt.ylabel("Humidity (%)")
-            plt.title("Real-Time Temperature vs. Humidity")
-            plt.grid(True) #plot a grid to make value comparison easier.
-           
-            # Return the line object for FuncAnimation to re-render
-            return plt.gca().lines
-    #handles the case of temp or humidity data before parsing being falsy
+    # Set up the figure and axis for Matplotlib
+    fig, ax = plt.subplots()
+    ax.set_xlim(0, 100)  # Initial x-axis limit; grows to fit the data
+    ax.set_ylim(0, 100)  # Initial y-axis limit; grows to fit the data
+
+    # Read the sensor in the background; the plot only drains the queue
+    readings = queue.Queue(maxsize=QUEUE_SIZE)
+    if USE_ACQUISITION_SERVICE:
+        acquisition = SubscriptionThread(readings, FETCH_INTERVAL)
     else:
-        print("No data received from sensor.")
-        return []
+        acquisition = AcquisitionThread(readings, FETCH_INTERVAL)
+    history = None
+    if HISTORY_LOG is not None:
+        # Parse the log once (later runs reuse the parse cache); after that the history is all in memory
+        from Parse_Cache import load_sensor_log
+        history = HistoryStore.from_frame(load_sensor_log(HISTORY_LOG), ['Sensor_Temperature', 'Sensor_Humidity'],
+                                          ['Temperature', 'Humidity'], sample_interval=FETCH_INTERVAL)
+    live_plot = LivePlot(ax, readings, WINDOW_LENGTH, history=history)
+    fig.canvas.mpl_connect('key_press_event', live_plot.on_key)
 
-# Set up the figure and axis for Matplotlib
-fig, ax = plt.subplots()
-ax.set_xlim(0, 100)  # Initial x-axis limit; can be updated dynamically if needed
-ax.set_ylim(0, 100)  # Initial y-axis limit; can be updated dynamically if needed
+    # Set up the animated plot - blit=True redraws only the changed artists each frame
+    ani = FuncAnimation(fig, live_plot.update, init_func=live_plot.init, interval=FRAME_INTERVAL,
+                        blit=True, cache_frame_data=False)
 
-# Set up the animated plot
-ani = FuncAnimation(fig, update_plot, interval=UPDATE_INTERVAL)
+    acquisition.start()
+    try:
+        # Display the plot
+        plt.show()
+    finally:
+        acquisition.stop()
+    return ani
 
-# Display the plot
-plt.show()
\ No newline at end of file
+# This ensures that the plot only runs when the script is executed
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#Script for polling many sensor nodes at the same time
+
+
+import asyncio  # Module for running many network requests concurrently
+import math     # Module for math functions (for counting missed cycles)
+import time     # Module for handling time-related functions (for the monotonic clock and timing requests)
+
+from Metrics import FETCH_SECONDS, FETCH_ERRORS
+from Sensor_Data import parse_sensor_data_temp, parse_sensor_data_hmdt, fahrenheit_to_celsius
+
+# The pages served by the DHTServer firmware on every node
+TEMP_PATH = "/temp"
+HMDT_PATH = "/humidity"
+
+
+class SensorConnection:
+    """
+    A reusable HTTP/1.1 keep-alive connection to a sensor's web server.
+
+    The connection is opened on first use and kept open between requests. If the
+    server closes it (the ESP8266 web server may do so after each response) it is
+    transparently reopened on the next request.
+    """
+
+    def __init__(self, host, port=80):
+        """
+        Args:
+            host (str): The IP address or hostname of the sensor node.
+            port (int): The port the sensor's web server listens on.
+        """
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def _connect(self):
+        # Open a new TCP connection to the sensor's web server
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        """
+        Close the underlying TCP connection if it is open.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                # The connection may already have been dropped by the server
+                pass
+        self._reader = None
+        self._writer = None
+
+    async def _request(self, path):
+        # Send the request - 'Connection: keep-alive' asks the server not to hang up afterwards
+        request = (f"GET {path} HTTP/1.1\r\n"
+                   f"Host: {self.host}\r\n"
+                   "Connection: keep-alive\r\n\r\n")
+        self._writer.write(request.encode('ascii'))
+        await self._writer.drain()
+
+        # Read the status line, e.g. "HTTP/1.1 200 OK"
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        status = int(status_line.split()[1])
+
+        # Read the headers up to the blank line that ends them
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        # Read the body using whichever framing the server chose
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b""
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                body += await self._reader.readexactly(size)
+                await self._reader.readline()
+        elif 'content-length' in headers:
+            body = await self._reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self._reader.read()
+            headers['connection'] = 'close'
+
+        # Drop the connection if the server won't keep it open
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+
+        if status != 200:
+            raise ConnectionError(f"HTTP status {status}")
+        return body.decode('utf-8')
+
+    async def get(self, path):
+        """
+        Request a page from the sensor's web server, reusing the open connection.
+
+        Args:
+            path (str): The path of the page to fetch, e.g. "/temp".
+
+        Returns:
+            str: The decoded body of the response.
+        """
+        reused = self._writer is not None
+        if not reused:
+            await self._connect()
+        try:
+            return await self._request(path)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+        # A reused keep-alive connection may have gone stale - retry once on a fresh one
+        await self._connect()
+        try:
+            return await self._request(path)
+        except BaseException:
+            await self.close()
+            raise
+
+
+async def fetch_sensor_data_async(connection, path, timeout):
+    """
+    Fetch the raw HTML data from one page of a sensor's web server.
+
+    Args:
+        connection (SensorConnection): The connection to fetch the page through.
+        path (str): The path of the page to fetch.
+        timeout (float): Seconds to wait for the response before giving up.
+
+    Returns:
+        str: The HTML content retrieved from the server, or None if an error occurs.
+    """
+    url = f"http://{connection.host}{path}"
+    # Label the metrics the same way as Sensor_Data.fetch_sensor_data, e.g. "192.168.0.5/temp"
+    endpoint = f"{connection.host}{path}"
+    start = time.perf_counter()
+    try:
+        data = await asyncio.wait_for(connection.get(path), timeout)
+        FETCH_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+        return data
+    except asyncio.TimeoutError:
+        # A half-finished response leaves the connection unusable
+        await connection.close()
+        FETCH_ERRORS.labels(endpoint, 'timeout').inc()
+        print(f"Timed out fetching data from {url} after {timeout} s")
+        return None
+    except Exception as e:
+        await connection.close()
+        FETCH_ERRORS.labels(endpoint, 'error').inc()
+        print(f"Error fetching data from {url}: {e}")
+        return None
+
+
+class AsyncSensorPoller:
+    """
+    Poll the /temp and /humidity pages of a fleet of sensor nodes concurrently.
+
+    Every node gets one keep-alive connection, and the nodes are read at the same
+    time, so a full cycle takes as long as the slowest node rather than the sum of
+    all of them. A node's two pages are fetched one after the other on its
+    connection: the firmware answers one request at a time, so a second connection
+    would just wait behind the first (or, kept open idle, block the node's server).
+    """
+
+    def __init__(self, hosts, timeout=5.0, max_concurrency=16, port=80):
+        """
+        Args:
+            hosts (list of str): The IP addresses or hostnames of the sensor nodes.
+            timeout (float): Seconds to wait for each individual request.
+            max_concurrency (int): Maximum number of requests in flight at once.
+            port (int): The port the sensors' web servers listen on.
+        """
+        self.hosts = list(hosts)
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._connections = {host: SensorConnection(host, port) for host in self.hosts}
+        # Created lazily so the semaphore belongs to the running event loop
+        self._semaphore = None
+
+    async def _fetch(self, connection, path):
+        # Hold a slot for the whole request so no more than max_concurrency run at once
+        async with self._semaphore:
+            return await fetch_sensor_data_async(connection, path, self.timeout)
+
+    async def get_readings(self, host):
+        """
+        Fetch and parse one node's readings, and convert the temperature to Celsius.
+
+        Args:
+            host (str): The node to read.
+
+        Returns:
+            tuple: The temperature in Celsius and the humidity percentage,
+                   or (None, None) if data retrieval fails.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        connection = self._connections[host]
+        # Fetch the pages one after the other over the node's one connection
+        temp_html_data = await self._fetch(connection, TEMP_PATH)
+        hmdt_html_data = await self._fetch(connection, HMDT_PATH) if temp_html_data else None
+        if temp_html_data and hmdt_html_data:
+            # Hand off to the same parse/convert path as the single-sensor script
+            temp_f = parse_sensor_data_temp(temp_html_data)
+            humidity = parse_sensor_data_hmdt(hmdt_html_data)
+            if temp_f is not None and humidity is not None:
+                return fahrenheit_to_celsius(temp_f), humidity
+        return None, None
+
+    async def poll(self):
+        """
+        Read every node once, all at the same time.
+
+        Returns:
+            dict: Maps each host to its (temperature_c, humidity) tuple,
+                  with (None, None) for nodes that could not be read.
+        """
+        results = await asyncio.gather(*(self.get_readings(host) for host in self.hosts))
+        return dict(zip(self.hosts, results))
+
+    async def close(self):
+        """
+        Close every open connection.
+        """
+        await asyncio.gather(*(connection.close() for connection in self._connections.values()))
+
+
+async def poll_forever(poller, interval, handle_reading):
+    """
+    Poll every node on a fixed interval and pass each result on.
+
+    Args:
+        poller (AsyncSensorPoller): The poller to read the nodes with.
+        interval (float): Seconds between the starts of consecutive cycles.
+        handle_reading (callable): Called as handle_reading(host, temperature_c, humidity)
+            for every node on every cycle; the values are None if the node could not be read.
+    """
+    try:
+        next_cycle = time.monotonic()
+        while True:
+            readings = await poller.poll()
+            for host, (temperature, humidity) in readings.items():
+                handle_reading(host, temperature, humidity)
+            # Sleep until the next slot on a fixed grid, so the period doesn't drift;
+            # if a cycle overran, skip the slots that have already gone by
+            next_cycle += interval
+            now = time.monotonic()
+            if next_cycle < now:
+                next_cycle += math.ceil((now - next_cycle) / interval) * interval
+            await asyncio.sleep(next_cycle - now)
+    finally:
+        await poller.close()
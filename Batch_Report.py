@@ -0,0 +1,162 @@
+#Script for calibrating many sensor/data logger pairs at once without a display, writing the figures and a summary table to files
+
+
+import os        # Module for file system operations (for the output folder and paths in the manifest)
+import sys       # Module for reading command line arguments
+import csv       # Module for writing the summary table
+import json      # Module for reading the manifest
+import time      # Module for timing each report
+from concurrent.futures import ProcessPoolExecutor
+
+# Render to image files only - this has to happen before pyplot is imported (by Calibration_Analysis too)
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from Calibration_Analysis import load_calibration_data, plot_time_series, match_calibration_data, plot_fit, bootstrap_calibration
+
+# Columns of the summary table, one row per sensor
+SUMMARY_FIELDS = ['name', 'matched', 'temperature_slope', 'temperature_intercept', 'temperature_r',
+                  'humidity_slope', 'humidity_intercept', 'humidity_r',
+                  'temperature_slope_low', 'temperature_slope_high', 'temperature_intercept_low', 'temperature_intercept_high',
+                  'humidity_slope_low', 'humidity_slope_high', 'humidity_intercept_low', 'humidity_intercept_high',
+                  'seconds', 'error']
+
+
+def read_manifest(manifest_path):
+    """
+    Read the list of sensors to calibrate.
+
+    The manifest is a JSON list with one entry per sensor, e.g.
+    [{"name": "node1", "sensor_log": "logs/sensor_log_node1.txt",
+      "reference": ["lascar/Session1.csv", "lascar/Session2.csv"], "start_time": "14:30"}]
+    "start_time" is optional (no cut-off if it is missing). Relative paths are taken
+    from the manifest's folder.
+
+    Args:
+        manifest_path (str): The path of the manifest file.
+
+    Returns:
+        list: The entries, with their paths made absolute.
+    """
+    with open(manifest_path, 'r') as file:
+        entries = json.load(file)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    for entry in entries:
+        entry['sensor_log'] = os.path.join(base, entry['sensor_log'])
+        references = entry['reference']
+        entry['reference'] = [os.path.join(base, path) for path in ([references] if isinstance(references, str) else references)]
+        entry.setdefault('start_time', None)
+    return entries
+
+
+def render_report(entry, output_dir, use_parse_cache=True, processes=None):
+    """
+    Calibrate one sensor against its reference logger and save its three figures.
+
+    Errors are caught and reported in the result rather than raised, so one bad
+    sensor doesn't stop the rest of the batch.
+
+    Args:
+        entry (dict): One entry of the manifest (see read_manifest).
+        output_dir (str): The folder to save the figures in.
+        use_parse_cache (bool): Whether to reuse parsed data from earlier runs.
+        processes (int): Processes for reading the reference sessions and for the bootstrap confidence
+            intervals, or None for one per core.
+
+    Returns:
+        dict: A row of the summary table (see SUMMARY_FIELDS).
+    """
+    name = entry['name']
+    row = {'name': name}
+    start = time.perf_counter()
+    try:
+        sensor_data, lascar_data = load_calibration_data(entry['sensor_log'], entry['reference'], use_parse_cache, processes)
+
+        fig, _ = plot_time_series(sensor_data, lascar_data)
+        fig.savefig(os.path.join(output_dir, f"{name}_time_series.png"))
+        plt.close(fig)
+
+        merged_data = match_calibration_data(sensor_data, lascar_data, entry['start_time'])
+        row['matched'] = len(merged_data)
+        bootstraps = bootstrap_calibration(merged_data, processes=processes)
+        for quantity in ('Temperature', 'Humidity'):
+            fig, fit, bootstrap = plot_fit(merged_data, quantity, bootstraps[quantity])
+            fig.savefig(os.path.join(output_dir, f"{name}_{quantity.lower()}_fit.png"))
+            plt.close(fig)
+            row[f'{quantity.lower()}_slope'] = fit.slope
+            row[f'{quantity.lower()}_intercept'] = fit.intercept
+            row[f'{quantity.lower()}_r'] = fit.rvalue
+            for field in ('slope_low', 'slope_high', 'intercept_low', 'intercept_high'):
+                row[f'{quantity.lower()}_{field}'] = getattr(bootstrap, field)
+    except Exception as e:
+        # Keep going with the other sensors, and record what went wrong with this one
+        plt.close('all')
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['seconds'] = round(time.perf_counter() - start, 2)
+    return row
+
+
+def write_summary(rows, summary_path):
+    """
+    Write the summary table as a CSV file.
+
+    Args:
+        rows (list of dict): The rows returned by render_report.
+        summary_path (str): The CSV file to write.
+    """
+    with open(summary_path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_summary(rows):
+    # Print the fits as a table, one line per sensor
+    print(f"{'name':20} {'matched':>9} {'temp slope':>11} {'intercept':>10} {'r':>7} {'hum slope':>10} {'intercept':>10} {'r':>7}")
+    for row in rows:
+        if row.get('error'):
+            print(f"{row['name']:20} failed: {row['error']}")
+            continue
+        print(f"{row['name']:20} {row['matched']:9d} {row['temperature_slope']:11.4f} {row['temperature_intercept']:10.4f} "
+              f"{row['temperature_r']:7.4f} {row['humidity_slope']:10.4f} {row['humidity_intercept']:10.4f} {row['humidity_r']:7.4f}")
+
+
+def run_batch(manifest_path, output_dir, processes=None, use_parse_cache=True):
+    """
+    Calibrate every sensor in a manifest, spread over a pool of processes.
+
+    Args:
+        manifest_path (str): The path of the manifest file (see read_manifest).
+        output_dir (str): The folder for the figures and the summary table (created if needed).
+        processes (int): Number of worker processes, or None for one per core.
+        use_parse_cache (bool): Whether to reuse parsed data from earlier runs.
+
+    Returns:
+        list: The summary rows, in manifest order.
+    """
+    entries = read_manifest(manifest_path)
+    os.makedirs(output_dir, exist_ok=True)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(min(processes, len(entries)), 1)
+    if processes > 1:
+        # The sensors already share out the cores, so each worker reads its reference sessions and does its
+        # bootstrap in-process (processes=1) rather than starting a pool of its own
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            rows = list(executor.map(render_report, entries, [output_dir] * len(entries), [use_parse_cache] * len(entries),
+                                     [1] * len(entries)))
+    else:
+        rows = [render_report(entry, output_dir, use_parse_cache) for entry in entries]
+    write_summary(rows, os.path.join(output_dir, "summary.csv"))
+    return rows
+
+
+# Run with e.g. python Batch_Report.py manifest.json reports/ (optionally followed by the number of processes)
+if __name__ == "__main__":
+    manifest = sys.argv[1] if len(sys.argv) > 1 else "manifest.json"
+    reports = sys.argv[2] if len(sys.argv) > 2 else "reports"
+    worker_count = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    summary_rows = run_batch(manifest, reports, worker_count)
+    print_summary(summary_rows)
+    print(f"Wrote figures and summary.csv for {len(summary_rows)} sensors to {reports}")
@@ -0,0 +1,65 @@
+#Script for comparing the line-by-line and vectorized sensor log parsers
+
+
+import os        # Module for file system operations (for file sizes and cleanup)
+import sys       # Module for reading command line arguments
+import time      # Module for timing the parsers
+import tempfile  # Module for creating a scratch directory for the synthetic logs
+
+from Calibration_Analysis import extract_sensor_log_data, extract_sensor_log_data_vectorized
+from Synthetic_Data import write_sensor_log
+
+
+def time_parser(parser, file_path):
+    """
+    Time one run of a parser over a log file.
+
+    Args:
+        parser (callable): The parser, called as parser(file_path).
+        file_path (str): The log file to parse.
+
+    Returns:
+        tuple: The parsed DataFrame and the time it took in seconds.
+    """
+    start = time.perf_counter()
+    sensor_df = parser(file_path)
+    return sensor_df, time.perf_counter() - start
+
+
+def run_benchmark(n_lines, directory, skip_loop=False):
+    """
+    Generate a synthetic log and time both parsers on it.
+
+    Args:
+        n_lines (int): Number of lines in the synthetic log.
+        directory (str): Where to write the synthetic log.
+        skip_loop (bool): Whether to time only the vectorized parser.
+    """
+    file_path = os.path.join(directory, f"sensor_log_{n_lines}.txt")
+    write_sensor_log(file_path, n_lines)
+    size_mb = os.path.getsize(file_path) / 1e6
+    print(f"{n_lines:,} lines ({size_mb:.0f} MB)")
+
+    vectorized_df, vectorized_time = time_parser(extract_sensor_log_data_vectorized, file_path)
+    print(f"  vectorized:   {vectorized_time:8.2f} s  {n_lines / vectorized_time:12,.0f} lines/s  {size_mb / vectorized_time:7.1f} MB/s")
+
+    if not skip_loop:
+        loop_df, loop_time = time_parser(extract_sensor_log_data, file_path)
+        print(f"  line-by-line: {loop_time:8.2f} s  {n_lines / loop_time:12,.0f} lines/s  {size_mb / loop_time:7.1f} MB/s")
+        print(f"  speedup: {loop_time / vectorized_time:.1f}x")
+        # Make sure the two parsers agree before trusting the numbers
+        same = (len(loop_df) == len(vectorized_df)
+                and (loop_df['Time'].astype('datetime64[ns]') == vectorized_df['Time']).all()
+                and (loop_df['Sensor_Temperature'] == vectorized_df['Sensor_Temperature']).all()
+                and (loop_df['Sensor_Humidity'] == vectorized_df['Sensor_Humidity']).all())
+        print(f"  results match: {same}")
+    os.remove(file_path)
+
+
+# Run with e.g. python Benchmark_Parsing.py 1000000 10000000 (add --vectorized-only to skip the slow loop)
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith('--')]
+    line_counts = [int(argument) for argument in arguments] or [1000000, 10000000]
+    with tempfile.TemporaryDirectory() as scratch_directory:
+        for line_count in line_counts:
+            run_benchmark(line_count, scratch_directory, skip_loop='--vectorized-only' in sys.argv)
@@ -0,0 +1,281 @@
+#Script for benchmarking every stage of the pipeline - polling, log writing, parsing, Lascar ingestion and the calibration fit
+
+
+import os                  # Module for file system operations (for file sizes)
+import sys                 # Module for checking the platform (for memory units)
+import io                  # Module for capturing printed messages
+import json                # Module for saving the results
+import time                # Module for timing the stages
+import asyncio             # Module for running the asynchronous poller
+import argparse            # Module for reading command line options
+import tempfile            # Module for creating a scratch directory for the synthetic data
+import contextlib          # Module for silencing the expected error messages
+import multiprocessing     # Module for running each stage in a fresh process
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+# Everything is imported up front, so the memory of each stage's process only grows with the stage's own work
+from scipy.stats import linregress
+
+from Sensor_Stand_In import StandInSensor
+from Sensor_Data import get_readings
+from Async_Poller import AsyncSensorPoller
+from Log_Writer import BufferedLogWriter, format_log_entry
+from Binary_Log import BinaryLogWriter
+from Calibration_Analysis import extract_sensor_log_data_vectorized, extract_csv_data, match_calibration_data
+from Streaming_Calibration import streaming_calibration
+from Synthetic_Data import write_sensor_log, write_lascar_csv
+
+try:
+    import resource        # Module for reading the peak memory of a process (not on Windows)
+except ImportError:
+    resource = None
+
+
+def peak_memory_mb():
+    """
+    Peak resident memory of this process so far, in MB, or None where it can't be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of a list of numbers
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def bench_polling(nodes, cycles, latency, jitter, failure_rate):
+    """
+    Poll stand-in sensor nodes, first one request at a time with urllib and then with AsyncSensorPoller.
+
+    Every node gets its own stand-in on its own loopback address (127.0.0.1, 127.0.0.2, ...),
+    which works on Linux; elsewhere use nodes=1.
+    """
+    sensors = [StandInSensor("127.0.0.1", latency=latency, jitter=jitter, failure_rate=failure_rate, seed=0).start()]
+    for i in range(1, nodes):
+        sensors.append(StandInSensor(f"127.0.0.{i + 1}", sensors[0].port, latency=latency, jitter=jitter,
+                                     failure_rate=failure_rate, seed=i).start())
+    results = {}
+    try:
+        # Fetch errors are expected when failure_rate > 0 - keep them out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            # The original scripts' way: one blocking request after another
+            cycle_times = []
+            good = 0
+            start = time.perf_counter()
+            for _ in range(cycles):
+                cycle_start = time.perf_counter()
+                for sensor in sensors:
+                    temperature, _ = get_readings(sensor.url + "/temp", sensor.url + "/humidity", 5)
+                    good += temperature is not None
+                cycle_times.append(time.perf_counter() - cycle_start)
+            elapsed = time.perf_counter() - start
+            results['sequential'] = {'readings_per_s': nodes * cycles / elapsed, 'good_readings': good,
+                                     'cycle_p50_s': percentile(cycle_times, 0.5), 'cycle_p95_s': percentile(cycle_times, 0.95)}
+
+            # Every node at once
+            async def poll_cycles():
+                poller = AsyncSensorPoller([sensor.host for sensor in sensors], timeout=5, port=sensors[0].port)
+                cycle_times = []
+                good = 0
+                try:
+                    for _ in range(cycles):
+                        cycle_start = time.perf_counter()
+                        readings = await poller.poll()
+                        good += sum(temperature is not None for temperature, _ in readings.values())
+                        cycle_times.append(time.perf_counter() - cycle_start)
+                finally:
+                    await poller.close()
+                return cycle_times, good
+
+            start = time.perf_counter()
+            cycle_times, good = asyncio.run(poll_cycles())
+            elapsed = time.perf_counter() - start
+            results['concurrent'] = {'readings_per_s': nodes * cycles / elapsed, 'good_readings': good,
+                                     'cycle_p50_s': percentile(cycle_times, 0.5), 'cycle_p95_s': percentile(cycle_times, 0.95)}
+    finally:
+        for sensor in sensors:
+            sensor.stop()
+    return results
+
+
+def bench_log_writing(directory, rows):
+    """
+    Write rows with the original open/append per line, BufferedLogWriter and BinaryLogWriter.
+    """
+    results = {}
+    first = time.time()
+    # The original log_data, minus the print - one open/append per reading (capped, it's slow)
+    per_line_rows = min(rows, 100000)
+    path = os.path.join(directory, "per_line_log.txt")
+    start = time.perf_counter()
+    for i in range(per_line_rows):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(first + i))
+        with open(path, "a") as file:
+            file.write(format_log_entry(timestamp, 21.0, 45.0) + "\n")
+    elapsed = time.perf_counter() - start
+    results['per_line_open'] = {'rows_per_s': per_line_rows / elapsed, 'rows': per_line_rows}
+
+    for name, writer_class, file_name in (('buffered_text', BufferedLogWriter, "buffered_log.txt"),
+                                          ('buffered_binary', BinaryLogWriter, "buffered_log.bin")):
+        path = os.path.join(directory, file_name)
+        start = time.perf_counter()
+        with writer_class(path, max_batch=1000, max_age=float('inf')) as writer:
+            for i in range(rows):
+                writer.write(21.0, 45.0, first + i)
+        elapsed = time.perf_counter() - start
+        results[name] = {'rows_per_s': rows / elapsed, 'mb_per_s': os.path.getsize(path) / 1e6 / elapsed, 'rows': rows}
+    return results
+
+
+def bench_parsing(sensor_log):
+    """
+    Parse the synthetic sensor log with the vectorized parser.
+    """
+    size_mb = os.path.getsize(sensor_log) / 1e6
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        sensor_df = extract_sensor_log_data_vectorized(sensor_log)
+        elapsed = time.perf_counter() - start
+    return {'lines_per_s': len(sensor_df) / elapsed, 'mb_per_s': size_mb / elapsed, 'rows': len(sensor_df)}
+
+
+def bench_lascar_ingestion(csv_files):
+    """
+    Read every synthetic Lascar session with extract_csv_data.
+    """
+    size_mb = sum(os.path.getsize(file_path) for file_path in csv_files) / 1e6
+    start = time.perf_counter()
+    lascar_df = extract_csv_data(csv_files)
+    elapsed = time.perf_counter() - start
+    return {'rows_per_s': len(lascar_df) / elapsed, 'mb_per_s': size_mb / elapsed, 'rows': len(lascar_df),
+            'sessions': len(csv_files)}
+
+
+def bench_merge_fit(sensor_log, csv_files):
+    """
+    Time the matching (match_calibration_data) and the two fits of Calibration_Analysis.py,
+    then the whole streaming calibration.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        sensor_df = extract_sensor_log_data_vectorized(sensor_log)
+        lascar_df = extract_csv_data(csv_files)
+
+        start = time.perf_counter()
+        # No time-of-day cut-off, as in the streaming calibration below
+        merged = match_calibration_data(sensor_df.sort_values('Time'), lascar_df.sort_values('Time'), start_time_of_day=None)
+        merge_time = time.perf_counter() - start
+        start = time.perf_counter()
+        linregress(merged['Sensor_Temperature'], merged['Lascar_Temperature'])
+        linregress(merged['Sensor_Humidity'], merged['Lascar_Humidity'])
+        fit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, _, matched = streaming_calibration(sensor_log, csv_files)
+        streaming_time = time.perf_counter() - start
+    return {'merge_s': merge_time, 'fit_s': fit_time, 'matched': len(merged),
+            'streaming_calibration_s': streaming_time, 'streaming_matched': matched}
+
+
+def _run_stage(stage, args):
+    # Runs in a fresh process, so the peak memory belongs to this stage alone
+    baseline = peak_memory_mb()
+    start = time.perf_counter()
+    results = stage(*args)
+    results['stage_s'] = time.perf_counter() - start
+    peak = peak_memory_mb()
+    results['peak_memory_mb'] = None if peak is None else peak - baseline
+    return results
+
+
+def run_stage(stage, *args):
+    """
+    Run one benchmark stage in a fresh process and return its results.
+
+    Args:
+        stage (callable): One of the bench_ functions in this file.
+        *args: Passed on to the stage.
+
+    Returns:
+        dict: The stage's numbers, plus its total time and its peak memory above the process's baseline.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_run_stage, stage, args).result()
+
+
+def print_results(name, results):
+    # One line per measurement, nested results indented under their stage
+    print(name)
+    for key, value in results.items():
+        if isinstance(value, dict):
+            print(f"  {key}")
+            for sub_key, sub_value in value.items():
+                print(f"    {sub_key:26} {sub_value:14,.3f}" if isinstance(sub_value, float) else f"    {sub_key:26} {sub_value!s:>14}")
+        elif isinstance(value, float):
+            print(f"  {key:28} {value:14,.3f}")
+        else:
+            print(f"  {key:28} {value!s:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sensor pipeline on a stand-in sensor and synthetic data.")
+    parser.add_argument('--nodes', type=int, default=4, help="stand-in sensor nodes to poll")
+    parser.add_argument('--cycles', type=int, default=20, help="polling cycles to time")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every stand-in response")
+    parser.add_argument('--jitter', type=float, default=0.02, help="up to this many random seconds more per response")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of stand-in requests that fail")
+    parser.add_argument('--log-rows', type=int, default=200000, help="rows written by the log writers")
+    parser.add_argument('--log-lines', type=int, default=1000000, help="lines in the synthetic sensor log")
+    parser.add_argument('--sessions', type=int, default=10, help="synthetic Lascar sessions")
+    parser.add_argument('--session-rows', type=int, default=50000, help="readings per Lascar session")
+    parser.add_argument('--stages', default='polling,writing,parsing,lascar,fit', help="comma-separated stages to run")
+    parser.add_argument('--json', help="also save the results to this JSON file, to compare runs")
+    options = parser.parse_args()
+    stages = options.stages.split(',')
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        # The sensor log and the Lascar sessions cover the same stretch of time
+        sensor_log = os.path.join(directory, "sensor_log.txt")
+        csv_files = []
+        if {'parsing', 'lascar', 'fit'} & set(stages):
+            start = datetime(2024, 11, 5, 14, 0, 0)
+            write_sensor_log(sensor_log, options.log_lines, start=start, interval=5)
+            session_length = options.log_lines * 5 // max(options.sessions, 1)
+            for i in range(options.sessions):
+                csv_file = os.path.join(directory, f"session_{i}.csv")
+                write_lascar_csv(csv_file, options.session_rows, start=start + timedelta(seconds=i * session_length),
+                                 interval=max(session_length // max(options.session_rows, 1), 1), seed=i)
+                csv_files.append(csv_file)
+
+        if 'polling' in stages:
+            results['polling'] = run_stage(bench_polling, options.nodes, options.cycles, options.latency,
+                                           options.jitter, options.failure_rate)
+            print_results(f"Polling ({options.nodes} nodes, {options.cycles} cycles)", results['polling'])
+        if 'writing' in stages:
+            results['log_writing'] = run_stage(bench_log_writing, directory, options.log_rows)
+            print_results(f"Log writing ({options.log_rows:,} rows)", results['log_writing'])
+        if 'parsing' in stages:
+            results['parsing'] = run_stage(bench_parsing, sensor_log)
+            print_results(f"Sensor log parsing ({options.log_lines:,} lines)", results['parsing'])
+        if 'lascar' in stages:
+            results['lascar_ingestion'] = run_stage(bench_lascar_ingestion, csv_files)
+            print_results(f"Lascar ingestion ({options.sessions} sessions)", results['lascar_ingestion'])
+        if 'fit' in stages:
+            results['merge_fit'] = run_stage(bench_merge_fit, sensor_log, csv_files)
+            print_results("Merge and fit", results['merge_fit'])
+
+    if options.json:
+        with open(options.json, 'w') as file:
+            json.dump({'options': vars(options), 'results': results}, file, indent=2)
+        print(f"Saved results to {options.json}")
+
+
+# Run with e.g. python Benchmark_Suite.py --log-lines 5000000 --json before.json
+if __name__ == "__main__":
+    main()
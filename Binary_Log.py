@@ -0,0 +1,171 @@
+#Script for the fixed-width binary sensor log format, and for converting text logs to it
+
+
+import os        # Module for file system operations (for file sizes)
+import re        # Module for regular expressions (for parsing the text log lines)
+import struct    # Module for packing readings into fixed-width binary records
+import sys       # Module for reading command line arguments
+import calendar  # Module for converting wall-clock times to seconds since the epoch
+from datetime import datetime
+
+from Log_Writer import BufferedLogWriter, wall_clock_seconds
+
+# Every binary log starts with this 16 byte header: a magic string, the record size and padding
+MAGIC = b"DAHLOG01"
+HEADER_SIZE = 16
+# Every record is three little-endian float64s: timestamp, temperature (°C) and humidity (%).
+# The timestamp is the local wall-clock time of the reading, as seconds since 1970-01-01 00:00,
+# so it matches the text log's timestamps exactly. Using float64 for all three fields lets
+# the reader view the whole file as one 2D float array without copying it.
+RECORD_FORMAT = "<ddd"
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+HEADER = MAGIC + struct.pack("<I", RECORD_SIZE) + bytes(HEADER_SIZE - len(MAGIC) - 4)
+
+# Pattern for one line of the text log, e.g. "2024-11-05 14:30:00, Temperature: 21.50 °C, Humidity: 45.00%"
+LINE_PATTERN = re.compile(r"^(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d), Temperature: (-?[\d\.]+) \S+, Humidity: (-?[\d\.]+)%")
+
+
+class BinaryLogWriter(BufferedLogWriter):
+    """
+    A buffered log writer that appends fixed-width binary records instead of text lines.
+
+    It batches, fsyncs, rotates and echoes exactly like BufferedLogWriter.
+    """
+
+    def __init__(self, path="sensor_log.bin", **kwargs):
+        """
+        Args:
+            path (str): The binary log file to append to.
+            **kwargs: Passed on to BufferedLogWriter.
+        """
+        if kwargs.get('index_every') is not None:
+            # Records are fixed-width, so any record can be found without an index
+            raise ValueError("index_every only applies to text logs")
+        super().__init__(path, **kwargs)
+
+    def _encode_row(self, timestamp, temperature_c, humidity):
+        # Pack the reading into one fixed-width record
+        return struct.pack(RECORD_FORMAT, wall_clock_seconds(timestamp), temperature_c, humidity)
+
+    def _open(self):
+        super()._open()
+        # A new (or empty) file needs the header before its first record
+        if self._file.tell() == 0:
+            self._file.write(HEADER)
+
+
+def check_header(file_path):
+    """
+    Make sure a file is a binary sensor log with the expected record size.
+
+    Args:
+        file_path (str): The path of the binary log.
+
+    Raises:
+        ValueError: If the file does not start with a valid header.
+    """
+    with open(file_path, 'rb') as file:
+        header = file.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{file_path} is not a binary sensor log")
+    record_size = struct.unpack("<I", header[len(MAGIC):len(MAGIC) + 4])[0]
+    if record_size != RECORD_SIZE:
+        raise ValueError(f"{file_path} has {record_size} byte records, expected {RECORD_SIZE}")
+
+
+def read_binary_log(file_path):
+    """
+    Memory-map a binary sensor log into a DataFrame.
+
+    The temperature and humidity columns are views onto the memory-mapped file, so
+    they are not copied into memory; only the Time column is built, from the
+    timestamps. A partly written record at the end of the file is ignored.
+
+    Args:
+        file_path (str): The path of the binary log.
+
+    Returns:
+        DataFrame: Columns 'Time', 'Sensor_Temperature' and 'Sensor_Humidity',
+                   the same as extract_sensor_log_data in Calibration_Analysis.py.
+    """
+    # Imported here so the logger can write binary logs without numpy or pandas installed
+    import numpy as np
+    import pandas as pd
+
+    check_header(file_path)
+    n_records = (os.path.getsize(file_path) - HEADER_SIZE) // RECORD_SIZE
+    if n_records == 0:
+        return pd.DataFrame({'Time': pd.Series(dtype='datetime64[ns]'),
+                             'Sensor_Temperature': pd.Series(dtype='float64'),
+                             'Sensor_Humidity': pd.Series(dtype='float64')})
+    # View the records as an (n, 3) array of float64s straight from the file
+    values = np.memmap(file_path, dtype='<f8', mode='r', offset=HEADER_SIZE, shape=(n_records, 3))
+    sensor_df = pd.DataFrame(values[:, 1:], columns=['Sensor_Temperature', 'Sensor_Humidity'], copy=False)
+    sensor_df.insert(0, 'Time', pd.to_datetime(values[:, 0].astype(np.int64), unit='s').astype('datetime64[ns]'))
+    return sensor_df
+
+
+def parse_text_log_line(line):
+    """
+    Parse one line of the text sensor log.
+
+    Args:
+        line (str): A line such as "2024-11-05 14:30:00, Temperature: 21.50 °C, Humidity: 45.00%".
+
+    Returns:
+        tuple: The wall-clock seconds, temperature and humidity, or None if the line is malformed.
+    """
+    match = LINE_PATTERN.match(line)
+    if not match:
+        return None
+    year, month, day, hour, minute, second = (int(field) for field in match.group(1, 2, 3, 4, 5, 6))
+    try:
+        seconds = calendar.timegm((year, month, day, hour, minute, second))
+        # timegm doesn't validate the fields, so make sure the date actually exists
+        datetime(year, month, day, hour, minute, second)
+    except ValueError:
+        return None
+    return float(seconds), float(match.group(7)), float(match.group(8))
+
+
+def convert_text_log(text_path, binary_path, chunk_lines=100000):
+    """
+    Convert an existing text sensor log into a binary log, a chunk at a time.
+
+    Malformed lines (e.g. truncated writes) are skipped and counted.
+
+    Args:
+        text_path (str): The text log to read, e.g. "sensor_log.txt".
+        binary_path (str): The binary log to create (an existing file is overwritten).
+        chunk_lines (int): Number of records packed before each write.
+
+    Returns:
+        tuple: The number of records written and the number of lines skipped.
+    """
+    written = 0
+    skipped = 0
+    with open(text_path, 'r', encoding='utf-8', errors='replace') as text_file, open(binary_path, 'wb') as binary_file:
+        binary_file.write(HEADER)
+        chunk = []
+        for line in text_file:
+            record = parse_text_log_line(line)
+            if record is None:
+                if line.strip():
+                    skipped += 1
+                continue
+            chunk.append(struct.pack(RECORD_FORMAT, *record))
+            if len(chunk) >= chunk_lines:
+                binary_file.write(b"".join(chunk))
+                written += len(chunk)
+                chunk = []
+        binary_file.write(b"".join(chunk))
+        written += len(chunk)
+    return written, skipped
+
+
+# Convert a text log given on the command line, e.g. python Binary_Log.py sensor_log.txt sensor_log.bin
+if __name__ == "__main__":
+    text_log = sys.argv[1] if len(sys.argv) > 1 else "sensor_log.txt"
+    binary_log = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(text_log)[0] + ".bin"
+    records, bad_lines = convert_text_log(text_log, binary_log)
+    print(f"Wrote {records} records to {binary_log} ({bad_lines} malformed lines skipped)")
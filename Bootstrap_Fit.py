@@ -0,0 +1,179 @@
+#Script for bootstrap confidence intervals on the calibration fits, for one or many sensor/reference pairs at once
+
+
+import os                  # Module for counting the cores
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Resamples used for each fit, and the confidence level of the intervals
+N_RESAMPLES = 2000
+CONFIDENCE = 0.95
+# Resampled points held in memory at once (per process) - each resample of n points takes n of them
+BLOCK_POINTS = 4_000_000
+# Resamples in each task handed to a worker process
+TASK_RESAMPLES = 250
+
+# The least-squares fit of the full data, with percentile bootstrap intervals and standard errors.
+# 'slopes' and 'intercepts' hold every resample's fit, e.g. for confidence_band.
+BootstrapFit = namedtuple('BootstrapFit', ['slope', 'intercept', 'slope_low', 'slope_high', 'intercept_low',
+                                           'intercept_high', 'slope_stderr', 'intercept_stderr', 'n', 'confidence',
+                                           'slopes', 'intercepts'])
+
+
+def least_squares(sx, sy, sxx, sxy, n):
+    """
+    Slope and intercept of the least-squares line from the sums of x, y, x² and xy.
+
+    The arguments can be arrays, to fit many sets of sums at once. Using data centred
+    on its means keeps the sums small, so the formula stays accurate.
+
+    Returns:
+        tuple: The slopes and intercepts (NaN where every x is the same).
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+    intercept = (sy - slope * sx) / n
+    return slope, intercept
+
+
+def _resample_fits(x, y, n_resamples, seed, block_points=BLOCK_POINTS):
+    # Fit n_resamples resamples (drawn with replacement) of centred data, a block of resamples at a time
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    slopes = np.empty(n_resamples)
+    intercepts = np.empty(n_resamples)
+    block = max(block_points // n, 1)
+    for start in range(0, n_resamples, block):
+        count = min(block, n_resamples - start)
+        indices = rng.integers(0, n, (count, n))
+        x_resampled = x[indices]
+        y_resampled = y[indices]
+        # Row-wise sums for every resample in the block at once
+        sums = (x_resampled.sum(axis=1), y_resampled.sum(axis=1),
+                np.einsum('ij,ij->i', x_resampled, x_resampled), np.einsum('ij,ij->i', x_resampled, y_resampled))
+        slopes[start:start + count], intercepts[start:start + count] = least_squares(*sums, n)
+    return slopes, intercepts
+
+
+def _summarize(x, y, slopes, intercepts, confidence):
+    # Combine the full-data fit with the resampled fits of the centred data
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x_mean, y_mean = x.mean(), y.mean()
+    x_centred, y_centred = x - x_mean, y - y_mean
+    slope, intercept = least_squares(x_centred.sum(), y_centred.sum(), x_centred @ x_centred, x_centred @ y_centred, len(x))
+    # Move the intercepts back from the centred data to the original axes
+    intercept = y_mean + intercept - slope * x_mean
+    intercepts = y_mean + intercepts - slopes * x_mean
+    tail = (1 - confidence) / 2 * 100
+    with np.errstate(invalid='ignore'):
+        slope_low, slope_high = np.nanpercentile(slopes, [tail, 100 - tail])
+        intercept_low, intercept_high = np.nanpercentile(intercepts, [tail, 100 - tail])
+    return BootstrapFit(slope, intercept, slope_low, slope_high, intercept_low, intercept_high,
+                        np.nanstd(slopes, ddof=1), np.nanstd(intercepts, ddof=1), len(x), confidence,
+                        slopes, intercepts)
+
+
+# The centred (x, y) arrays of every pair by name, in each worker process (set by _init_worker)
+_worker_data = None
+
+
+def _init_worker(data):
+    # Runs once as each worker process starts, so the arrays are sent to a worker once rather than with every task
+    global _worker_data
+    _worker_data = data
+
+
+def _run_task(task):
+    # One chunk of resamples of one pair, in a worker process
+    name, n_resamples, seed = task
+    return _resample_fits(*_worker_data[name], n_resamples, seed)
+
+
+def bootstrap_fits(pairs, n_resamples=N_RESAMPLES, confidence=CONFIDENCE, seed=None, processes=None):
+    """
+    Fit y = slope * x + intercept for many (x, y) pairs, with bootstrap confidence intervals.
+
+    Every pair is resampled with replacement n_resamples times and each resample is fitted
+    by least squares; the intervals are the percentiles of the resampled fits. The resamples
+    are fitted a block at a time in a vectorized pass, and the work for all the pairs is
+    split into tasks that are spread over a pool of processes, so one large pair and many
+    small ones both keep every core busy. Each worker gets the data once, when it starts,
+    and the tasks only carry a pair's name and a seed. The same seed gives the same
+    intervals whatever the number of processes.
+
+    Args:
+        pairs (dict): Maps a name to an (x, y) pair of arrays, e.g. {'Temperature': (sensor, lascar)}.
+        n_resamples (int): Number of resamples per pair.
+        confidence (float): Confidence level of the intervals, e.g. 0.95.
+        seed (int): Seed for the resampling, or None for a different one each time.
+        processes (int): Number of worker processes, or None for one per core.
+
+    Returns:
+        dict: Maps each name to its BootstrapFit.
+    """
+    names = list(pairs)
+    data = {}
+    for name in names:
+        x, y = (np.asarray(values, dtype=np.float64) for values in pairs[name])
+        if len(x) != len(y):
+            raise ValueError(f"{name}: x has {len(x)} values but y has {len(y)}")
+        if len(x) < 3:
+            raise ValueError(f"{name}: at least 3 points are needed, not {len(x)}")
+        data[name] = (x, y)
+
+    # Split every pair's resamples into tasks, each with its own independent random stream.
+    # A task only names its pair - the data goes to each worker once, when it starts.
+    centred = {name: (x - x.mean(), y - y.mean()) for name, (x, y) in data.items()}
+    tasks = []
+    owners = []
+    for name, stream in zip(names, np.random.SeedSequence(seed).spawn(len(names))):
+        chunks = [min(TASK_RESAMPLES, n_resamples - start) for start in range(0, n_resamples, TASK_RESAMPLES)]
+        for chunk, task_seed in zip(chunks, stream.spawn(len(chunks))):
+            tasks.append((name, chunk, task_seed))
+            owners.append(name)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(min(processes, len(tasks)), 1)
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(centred,)) as executor:
+            results = list(executor.map(_run_task, tasks))
+    else:
+        results = [_resample_fits(*centred[name], chunk, task_seed) for name, chunk, task_seed in tasks]
+
+    fits = {}
+    for name in names:
+        slopes = np.concatenate([result[0] for result, owner in zip(results, owners) if owner == name] or [np.empty(0)])
+        intercepts = np.concatenate([result[1] for result, owner in zip(results, owners) if owner == name] or [np.empty(0)])
+        fits[name] = _summarize(*data[name], slopes, intercepts, confidence)
+    return fits
+
+
+def bootstrap_linear_fit(x, y, n_resamples=N_RESAMPLES, confidence=CONFIDENCE, seed=None, processes=None):
+    """
+    Fit y = slope * x + intercept with bootstrap confidence intervals (see bootstrap_fits).
+
+    Returns:
+        BootstrapFit: The fit and its intervals.
+    """
+    return bootstrap_fits({'fit': (x, y)}, n_resamples, confidence, seed, processes)['fit']
+
+
+def confidence_band(fit, x):
+    """
+    The range of the fitted line at each x, over the middle 'confidence' share of the resampled fits.
+
+    Args:
+        fit (BootstrapFit): The fit.
+        x (ndarray): Where to evaluate the line.
+
+    Returns:
+        tuple: The lower and upper edge of the band at each x.
+    """
+    lines = fit.slopes[:, np.newaxis] * np.asarray(x, dtype=np.float64) + fit.intercepts[:, np.newaxis]
+    tail = (1 - fit.confidence) / 2 * 100
+    low, high = np.nanpercentile(lines, [tail, 100 - tail], axis=0)
+    return low, high
@@ -1,9 +1,27 @@
-import matplotlib.pyplot as plt
-from matplotlib.dates import DateFormatter
+import io
+import os
+import csv
+import warnings
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from scipy.stats import linregress
+# matplotlib and scipy are only imported by the functions that plot and fit, so the parsing
+# and loading functions can be imported (e.g. by Parse_Cache.py) without their startup cost
+
+from Time_Alignment import align_to_reference
+from Bootstrap_Fit import bootstrap_fits, confidence_band
+
+# Names for the space-separated fields of a sensor log line once a space is put before each comma and
+# before the '%', e.g. "2024-11-05 14:30:00 , Temperature: 21.50 °C , Humidity: 45.00 %". 'Extra' only
+# gets a value on a line with too many fields, so such lines can be dropped.
+SENSOR_LOG_FIELDS = ['Date', 'Clock', 'Comma', 'Temperature_Label', 'Temperature', 'Unit', 'Second_Comma',
+                     'Humidity_Label', 'Humidity', 'Percent', 'Extra']
+SENSOR_LOG_FIXED_FIELDS = ['Comma', 'Temperature_Label', 'Unit', 'Second_Comma', 'Humidity_Label', 'Percent']
+
+# The final header line of a Lascar data logger CSV file, and the columns we keep from it (with their new names)
+LASCAR_HEADER_START = 'Reading,Date / Time (UTC),'
+LASCAR_COLUMNS = {'Date / Time (UTC)': 'Time', 'Temperature (°C)': 'Lascar_Temperature', 'Humidity (%RH)': 'Lascar_Humidity'}
 
 # Function to extract data from the sensor log text file
 def extract_sensor_log_data(file_path):
@@ -39,152 +57,376 @@ def extract_sensor_log_data(file_path):
     sensor_df = pd.DataFrame(data, columns=['Time', 'Sensor_Temperature', 'Sensor_Humidity'])
     return sensor_df
 
+# Function to read the fields of a block of sensor log lines with pandas' C tokenizer
+# Returns a DataFrame with one row per line (all NaN for a blank line), or None if pandas can't split the block at all
+def read_sensor_log_fields(text, numbers_as_text=False):
+    # The fields that are the same on every line are read as categories, which is faster than as strings
+    dtype = {name: 'category' if name in SENSOR_LOG_FIXED_FIELDS else object for name in SENSOR_LOG_FIELDS}
+    if not numbers_as_text:
+        dtype.update(Temperature=np.float64, Humidity=np.float64)
+    text.seek(0)
+    try:
+        with warnings.catch_warnings():
+            # A first line with too many fields makes pandas warn that it drops them - the 'Extra' check drops the line
+            warnings.simplefilter('ignore', pd.errors.ParserWarning)
+            return pd.read_csv(text, sep=' ', header=None, names=SENSOR_LOG_FIELDS, index_col=False, dtype=dtype,
+                               quoting=csv.QUOTE_NONE, encoding='latin-1', on_bad_lines='skip',
+                               skip_blank_lines=False, engine='c')
+    except pd.errors.ParserError:
+        return None
+
+# Function to count the empty lines ('\n' or '\r\n' on their own) in a block of log lines
+def count_blank_lines(data):
+    codes = np.frombuffer(data, dtype=np.uint8)
+    newline = codes == ord('\n')
+    carriage_return = codes == ord('\r')
+    blank = np.count_nonzero(newline[1:] & newline[:-1]) + np.count_nonzero(newline[:-2] & carriage_return[1:-1] & newline[2:])
+    # An empty first line has no newline before it
+    return int(blank + data.startswith(b'\n') + data.startswith(b'\r\n'))
+
+# Function to parse a block of sensor log lines in one vectorized pass
+# Lines are only kept if they have exactly the fields of a log line, ending in the '%' - the same lines
+# Binary_Log.LINE_PATTERN accepts - so a line cut off mid-write (e.g. "Humidity: 4") is dropped, not read as 4
+# Returns the parsed DataFrame and the number of malformed (non-blank) lines that were skipped
+def parse_sensor_log_chunk(data):
+    if not data.strip():
+        empty_df = pd.DataFrame({'Time': pd.Series(dtype='datetime64[ns]'),
+                                 'Sensor_Temperature': pd.Series(dtype='float64'),
+                                 'Sensor_Humidity': pd.Series(dtype='float64')})
+        return empty_df, 0
+
+    # Count the lines, and the empty ones, so we know how many were dropped
+    line_count = data.count(b'\n') + (not data.endswith(b'\n'))
+    blank_count = count_blank_lines(data)
+
+    # With the separating commas and the '%' after the humidity made fields of their own, every
+    # line splits cleanly on spaces, so pandas' C tokenizer can pull out all the fields at once and
+    # parse the numbers as it goes - and a line missing any of them can be spotted
+    text = io.BytesIO(data.replace(b', ', b' , ').replace(b'%', b' %'))
+    try:
+        fields = read_sensor_log_fields(text)
+    except ValueError:
+        # Some value isn't a number (e.g. a truncated write) - read everything as text and
+        # turn whatever doesn't convert into NaN so the line gets dropped below
+        fields = read_sensor_log_fields(text, numbers_as_text=True)
+        if fields is not None:
+            fields['Temperature'] = pd.to_numeric(fields['Temperature'], errors='coerce')
+            fields['Humidity'] = pd.to_numeric(fields['Humidity'], errors='coerce')
+    if fields is None:
+        # Not one line of the block has the fields of a log line
+        fields = pd.DataFrame(columns=SENSOR_LOG_FIELDS, dtype=object)
+
+    # Convert all the timestamps in one go
+    times = pd.to_datetime(fields['Date'] + ' ' + fields['Clock'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+
+    # Keep only the lines with every field in its place and the three values readable
+    valid = (times.notna() & fields['Temperature'].notna() & fields['Humidity'].notna() & fields['Unit'].notna()
+             & (fields['Temperature_Label'] == 'Temperature:') & (fields['Humidity_Label'] == 'Humidity:')
+             & (fields['Comma'] == ',') & (fields['Second_Comma'] == ',') & (fields['Percent'] == '%')
+             & fields['Extra'].isna())
+    sensor_df = pd.DataFrame({'Time': times[valid].astype('datetime64[ns]'),
+                              'Sensor_Temperature': fields['Temperature'][valid].astype(np.float64),
+                              'Sensor_Humidity': fields['Humidity'][valid].astype(np.float64)}).reset_index(drop=True)
+    skipped = max(line_count - blank_count - len(sensor_df), 0)
+    return sensor_df, skipped
+
+# Function to extract data from the sensor log text file - a faster version of extract_sensor_log_data
+# The whole file is read at once and parsed with parse_sensor_log_chunk; malformed lines are skipped
+def extract_sensor_log_data_vectorized(file_path):
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    sensor_df, skipped = parse_sensor_log_chunk(data)
+    if skipped:
+        print(f"Skipped {skipped} malformed lines in {file_path}")
+    # Keep the count with the data for anyone who wants to check it
+    sensor_df.attrs['skipped_lines'] = skipped
+    return sensor_df
+
+# Function to skip past the metadata at the top of a Lascar CSV file without reading the rest
+# Leaves the open file positioned at the first data row and returns the column names, or None if there is no header
+def read_lascar_header(file):
+    while True:
+        line = file.readline()
+        if not line:
+            return None
+        #this is the start of the line before the data is listed -the final header line
+        if line.startswith(LASCAR_HEADER_START):
+            return line.rstrip('\r\n').split(',')
+
+# Function to parse the date column and keep only the columns we need, with their new names
+def tidy_lascar_data(data):
+    data['Date / Time (UTC)'] = pd.to_datetime(data['Date / Time (UTC)'], format='%Y/%m/%d %H:%M:%S').astype('datetime64[ns]')
+    return data.rename(columns=LASCAR_COLUMNS)[list(LASCAR_COLUMNS.values())]
+
+# Function to read a Lascar CSV file in chunks of rows, without loading it all into memory
+# Yields DataFrames with the columns 'Time', 'Lascar_Temperature' and 'Lascar_Humidity'
+def iter_lascar_chunks(file_path, chunk_rows=100000):
+    with open(file_path, 'r') as f:
+        columns = read_lascar_header(f)
+        if columns is None:
+            print(f"Data header not found in file {file_path}")
+            return
+        for data in pd.read_csv(f, header=None, names=columns, chunksize=chunk_rows):
+            yield tidy_lascar_data(data)
+
+# Function to read one Lascar CSV file in a single pass - the header is found while reading,
+# and the data is parsed straight from the same open file
+# Returns a DataFrame sorted by time, or None if the file has no data header
+def read_lascar_session(file_path):
+    with open(file_path, 'r') as f:
+        columns = read_lascar_header(f)
+        if columns is None:
+            print(f"Data header not found in file {file_path}")
+            return None
+        lascar_df = tidy_lascar_data(pd.read_csv(f, header=None, names=columns))
+    # A logger session is recorded in time order, so this is normally a no-op check
+    if not lascar_df['Time'].is_monotonic_increasing:
+        lascar_df = lascar_df.sort_values('Time', kind='stable')
+    return lascar_df.reset_index(drop=True)
+
+# Function to merge two DataFrames that are each sorted by time into one sorted DataFrame in linear passes
+# Rows with equal times keep 'first' before 'second'
+def merge_two_sorted(first, second):
+    first_times = first['Time'].to_numpy()
+    second_times = second['Time'].to_numpy()
+    # Where each row of 'second' lands in the output: after every row of 'first' at or before it
+    second_positions = np.searchsorted(first_times, second_times, side='right') + np.arange(len(second_times))
+    from_second = np.zeros(len(first_times) + len(second_times), dtype=bool)
+    from_second[second_positions] = True
+    merged = {}
+    for column in first.columns:
+        values = np.empty(len(from_second), dtype=first[column].dtype)
+        values[~from_second] = first[column].to_numpy()
+        values[from_second] = second[column].to_numpy()
+        merged[column] = values
+    return pd.DataFrame(merged)
+
+# Function to combine data logger sessions that are each already sorted by time (a k-way merge)
+# Sessions that don't overlap are just joined end to end; overlapping ones are merged pairwise in a tree
+# Rows with equal times come out in session order: sessions are put in order of their first times,
+# or with keep_order=True kept in the order given (e.g. when merging parts of sessions a chunk at a time)
+def merge_sorted_sessions(data_frames, keep_order=False):
+    data_frames = [df for df in data_frames if len(df)]
+    if not keep_order:
+        data_frames.sort(key=lambda df: df['Time'].iloc[0])
+    if not data_frames:
+        return pd.DataFrame({'Time': pd.Series(dtype='datetime64[ns]'),
+                             'Lascar_Temperature': pd.Series(dtype='float64'),
+                             'Lascar_Humidity': pd.Series(dtype='float64')})
+    overlapping = any(later['Time'].iloc[0] < earlier['Time'].iloc[-1]
+                      for earlier, later in zip(data_frames, data_frames[1:]))
+    if not overlapping:
+        return pd.concat(data_frames, ignore_index=True)
+    while len(data_frames) > 1:
+        paired = [merge_two_sorted(data_frames[i], data_frames[i + 1]) for i in range(0, len(data_frames) - 1, 2)]
+        if len(data_frames) % 2:
+            paired.append(data_frames[-1])
+        data_frames = paired
+    return data_frames[0]
+
+# Function to read many Lascar CSV files in parallel, each in one pass, with a pool of processes
+# Returns one sorted DataFrame per file, in the same order (None for a file without a data header)
+def read_lascar_sessions(file_paths, processes=None):
+    file_paths = list(file_paths)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(file_paths))
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return list(executor.map(read_lascar_session, file_paths, chunksize=max(len(file_paths) // (4 * processes), 1)))
+    return [read_lascar_session(file_path) for file_path in file_paths]
+
 # Function to extract data from the CSV files
-def extract_csv_data(file_paths):
-    data_frames = []
-    #do for both of the file paths given
-    for file_path in file_paths:
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-            # Find the index where the data starts
-            data_start_idx = None
-            for idx, line in enumerate(lines):
-                #this is the start of the line before the data is listed -the final header line
-                if line.startswith('Reading,Date / Time (UTC),'):
-                    data_start_idx = idx
-                    break
-            if data_start_idx is None:
-                print(f"Data header not found in file {file_path}")
-                continue
-            # Read the data into a DataFrame - skip past the final header, straight to the data
-            data = pd.read_csv(file_path, skiprows=data_start_idx)
-            # Parse 'Date / Time (UTC)' column to datetime
-            data['Date / Time (UTC)'] = pd.to_datetime(data['Date / Time (UTC)'], format='%Y/%m/%d %H:%M:%S')
-            # Keep only the columns we need: Time, Temperature, Humidity
-            lascar_df = data[['Date / Time (UTC)', 'Temperature (°C)', 'Humidity (%RH)']].copy()
-            #Rename columns so they're more intuitive to use
-            lascar_df.rename(columns={'Date / Time (UTC)': 'Time', 'Temperature (°C)': 'Lascar_Temperature', 'Humidity (%RH)': 'Lascar_Humidity'}, inplace=True)
-            data_frames.append(lascar_df)
-    # Concatenate all DataFrames - combine two data logger sessions into one
-    if data_frames:
-        combined_lascar_df = pd.concat(data_frames)
-        # Sort by Time
-        combined_lascar_df = combined_lascar_df.sort_values('Time')
-        return combined_lascar_df
+# Each file is read in one pass, the files are read in parallel by a pool of processes,
+# and the sorted sessions are merged rather than re-sorted
+def extract_csv_data(file_paths, processes=None):
+    sessions = read_lascar_sessions(file_paths, processes)
+    # Combine all the data logger sessions into one, in time order
+    return merge_sorted_sessions([session for session in sessions if session is not None])
+
+# Function to load the sensor log and the data logger sessions, both sorted by time
+# The sessions are read by a pool of 'processes' processes (None for one per core)
+def load_calibration_data(sensor_log_file, csv_files, use_parse_cache=True, processes=None):
+    # Extract data
+    if use_parse_cache:
+        # Reuse the parsed data from earlier runs (kept in .parse_cache) - only new log lines get parsed
+        # Imported here as Parse_Cache builds on the parsers in this file
+        from Parse_Cache import load_sensor_log, load_lascar_sessions
+        sensor_data = load_sensor_log(sensor_log_file)
+        lascar_data = merge_sorted_sessions([session for session in load_lascar_sessions(csv_files, processes=processes) if session is not None])
     else:
-        return pd.DataFrame(columns=['Time', 'Lascar_Temperature', 'Lascar_Humidity'])
-
-# File paths
-sensor_log_file = 'sensor_log.txt'
-csv_files = ['CSV-Data-Session1.csv', 'CSV-Data-Session2.csv']
-
-# Extract data
-sensor_data = extract_sensor_log_data(sensor_log_file)
-lascar_data = extract_csv_data(csv_files)
-
-# Ensure both DataFrames are sorted by 'Time'
-sensor_data = sensor_data.sort_values('Time')
-lascar_data = lascar_data.sort_values('Time')
-
-# Find overall min and max times for x-axis alignment
-min_time = min(sensor_data['Time'].min(), lascar_data['Time'].min())
-max_time = max(sensor_data['Time'].max(), lascar_data['Time'].max())
-
-# Create subplots - so there's one on top of the other.
-fig, axs = plt.subplots(2, 1, figsize=(12, 10), sharex=True)
-
-# Plot DHT22 sensor data on top subplot
-axs[0].plot(sensor_data['Time'], sensor_data['Sensor_Temperature'], label='Temperature (°C)', marker='o')
-axs[0].plot(sensor_data['Time'], sensor_data['Sensor_Humidity'], label='Humidity (%)', marker='o')
-axs[0].set_title('DHT22 Sensor: Temperature and Humidity vs Time')
-axs[0].set_ylabel('Value')
-axs[0].legend()
-axs[0].grid()
-
-# Plot Lascar Electronics data logger data on bottom subplot
-axs[1].plot(lascar_data['Time'], lascar_data['Lascar_Temperature'], label='Temperature (°C)', marker='o')
-axs[1].plot(lascar_data['Time'], lascar_data['Lascar_Humidity'], label='Humidity (%)', marker='o')
-axs[1].set_title('Lascar Electronics Data Logger: Temperature and Humidity vs Time')
-axs[1].set_xlabel('Time')
-axs[1].set_ylabel('Value')
-axs[1].legend()
-axs[1].grid()
-
-# Set x-axis limits to align times
-axs[0].set_xlim([min_time, max_time])
-
-# Format x-axis to show only the time
-time_formatter = DateFormatter('%H:%M')  # Time format: HH:MM
-axs[1].xaxis.set_major_formatter(time_formatter)
-
-# Rotate x-ticks for better readability
-plt.xticks(rotation=45)
-
-plt.tight_layout()
-plt.show()
-
-# Debugging prints to ensure mask is working - ignore
-#print(len(sensor_data),"length of sensor data before omitting t<2:30")
-
-# Emit sensor data for times before 2:30 because there is no matching data logger data
-# Tolerance on merge_asof deals with this anyways but it doesn't hurt to do explicitly
-sensor_data = sensor_data[sensor_data['Time'].dt.time >= datetime.strptime("14:30", "%H:%M").time()]
-
-#print(len(sensor_data),"length of sensor data after omitting t<2:30")
-
-# Match each sensor log data point to a Lascar data point occurring at around the same time
-# Use pandas merge_asof function to merge on nearest times within a tolerance
-merged_data = pd.merge_asof(sensor_data, lascar_data, on='Time', direction='nearest', tolerance=pd.Timedelta('10sec'))
-
-# Remove any rows where a match wasn't found within the tolerance
-merged_data = merged_data.dropna(subset=['Lascar_Temperature', 'Lascar_Humidity'])
-
-# Linear fitting for Temperature
-slope_temp, intercept_temp, r_value_temp, p_value_temp, std_err_temp = linregress(
-    merged_data['Sensor_Temperature'], merged_data['Lascar_Temperature'])
-
-# Equation for Temperature
-line_temp = slope_temp * merged_data['Sensor_Temperature'] + intercept_temp
-
-# Plot Lascar Temperature vs Sensor Temperature with a 45-degree line (ideal fit) and fitted line
-plt.figure(figsize=(8, 8))
-#scatter plot the data logger vs sensor temperature values.
-plt.scatter(merged_data['Sensor_Temperature'], merged_data['Lascar_Temperature'], color='black', label='Data Points')
-#overplot the the linear fit and add fit m and c from fit to legend
-plt.plot(merged_data['Sensor_Temperature'], line_temp, 'r-', label=f'Fit: y = {slope_temp:.2f}x + {intercept_temp:.2f}')
-#overplot a line y = x so that it spans the whole dataset
-plt.plot([merged_data['Sensor_Temperature'].min(), merged_data['Sensor_Temperature'].max()],
-         [merged_data['Sensor_Temperature'].min(), merged_data['Sensor_Temperature'].max()],
-         '--', label='Ideal (y = x)')
-plt.xlabel('DHT22 Temperature (°C)')
-plt.ylabel('Data Logger Temperature (°C)')
-plt.title('Data Logger Temperature vs DHT22 Temperature')
-plt.legend()
-plt.grid()
-plt.tight_layout()
-plt.show()
-
-# Linear fitting for Humidity
-slope_humid, intercept_humid, r_value_humid, p_value_humid, std_err_humid = linregress(
-    merged_data['Sensor_Humidity'], merged_data['Lascar_Humidity'])
-
-# Equation for Humidity
-line_humid = slope_humid * merged_data['Sensor_Humidity'] + intercept_humid
-
-# Plot Lascar Humidity vs Sensor Humidity with a 45-degree line (ideal fit) and fitted line
-plt.figure(figsize=(8, 8))
-# Scatter plot the data logger vs sensor humidity values.
-plt.scatter(merged_data['Sensor_Humidity'], merged_data['Lascar_Humidity'], color='black', label='Data Points')
-# Overplot the the linear fit and add fit m and c from fit to legend
-plt.plot(merged_data['Sensor_Humidity'], line_humid, 'r-', label=f'Fit: y = {slope_humid:.2f}x + {intercept_humid:.2f}')
-# Overplot a line y = x so that it spans the whole dataset
-plt.plot([merged_data['Sensor_Humidity'].min(), merged_data['Sensor_Humidity'].max()],
-         [merged_data['Sensor_Humidity'].min(), merged_data['Sensor_Humidity'].max()],
-         '--', label='Ideal (y = x)')
-plt.xlabel('DHT22 Humidity (%)')
-plt.ylabel('Data Logger Humidity (%)')
-plt.title('Data Logger Humidity vs DHT22 Humidity')
-plt.legend()
-plt.grid()
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+        sensor_data = extract_sensor_log_data_vectorized(sensor_log_file)
+        lascar_data = extract_csv_data(csv_files, processes)
+
+    # Ensure both DataFrames are sorted by 'Time'
+    sensor_data = sensor_data.sort_values('Time')
+    lascar_data = lascar_data.sort_values('Time')
+    return sensor_data, lascar_data
+
+# Function to plot temperature and humidity vs time for both devices, one above the other
+# Returns the figure and its decimated lines (keep them for as long as the figure is open)
+def plot_time_series(sensor_data, lascar_data):
+    import matplotlib.pyplot as plt
+    from matplotlib.dates import DateFormatter
+    from Decimation import plot_decimated
+
+    # Find overall min and max times for x-axis alignment
+    min_time = min(sensor_data['Time'].min(), lascar_data['Time'].min())
+    max_time = max(sensor_data['Time'].max(), lascar_data['Time'].max())
+
+    # Create subplots - so there's one on top of the other.
+    fig, axs = plt.subplots(2, 1, figsize=(12, 10), sharex=True)
+
+    # Plot DHT22 sensor data on top subplot
+    # Long histories are decimated to the width of the axes (keeping every peak), and redone on zoom -
+    # the lines are kept in this list because the zoom callbacks only hold weak references to them
+    decimated_lines = []
+    decimated_lines.append(plot_decimated(axs[0], sensor_data['Time'], sensor_data['Sensor_Temperature'], label='Temperature (°C)', marker='o'))
+    decimated_lines.append(plot_decimated(axs[0], sensor_data['Time'], sensor_data['Sensor_Humidity'], label='Humidity (%)', marker='o'))
+    axs[0].set_title('DHT22 Sensor: Temperature and Humidity vs Time')
+    axs[0].set_ylabel('Value')
+    axs[0].legend()
+    axs[0].grid()
+
+    # Plot Lascar Electronics data logger data on bottom subplot
+    decimated_lines.append(plot_decimated(axs[1], lascar_data['Time'], lascar_data['Lascar_Temperature'], label='Temperature (°C)', marker='o'))
+    decimated_lines.append(plot_decimated(axs[1], lascar_data['Time'], lascar_data['Lascar_Humidity'], label='Humidity (%)', marker='o'))
+    axs[1].set_title('Lascar Electronics Data Logger: Temperature and Humidity vs Time')
+    axs[1].set_xlabel('Time')
+    axs[1].set_ylabel('Value')
+    axs[1].legend()
+    axs[1].grid()
+
+    # Set x-axis limits to align times
+    axs[0].set_xlim([min_time, max_time])
+
+    # Format x-axis to show only the time
+    time_formatter = DateFormatter('%H:%M')  # Time format: HH:MM
+    axs[1].xaxis.set_major_formatter(time_formatter)
+
+    # Rotate x-ticks for better readability
+    plt.setp(axs[1].get_xticklabels(), rotation=45)
+
+    fig.tight_layout()
+    return fig, decimated_lines
+
+# Function to plot hours or weeks of readings from a HistoryStore (see History_Store.py) straight from memory,
+# at a resolution that suits the span - the mean as a line, and the min to max range of each bucket shaded
+def plot_history(history, start=None, end=None, max_points=2000):
+    import matplotlib.pyplot as plt
+
+    history_data = history.query_frame(start, end, max_points)
+    resolution = history_data.attrs['resolution']
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    for channel in history.channels:
+        line, = ax.plot(history_data['Time'], history_data[channel], label=channel)
+        if resolution:
+            ax.fill_between(history_data['Time'], history_data[f'{channel}_min'], history_data[f'{channel}_max'],
+                            color=line.get_color(), alpha=0.2)
+    ax.set_title(f"History ({f'{resolution:g} s buckets' if resolution else 'raw readings'})")
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Value')
+    ax.legend()
+    ax.grid()
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    return fig
+
+# Function to match each sensor reading to a data logger reading taken at around the same time
+def match_calibration_data(sensor_data, lascar_data, start_time_of_day="14:30", tolerance=pd.Timedelta('10sec')):
+    # Debugging prints to ensure mask is working - ignore
+    #print(len(sensor_data),"length of sensor data before omitting t<2:30")
+
+    # Emit sensor data for times before 2:30 because there is no matching data logger data
+    # Tolerance on the alignment deals with this anyways but it doesn't hurt to do explicitly
+    if start_time_of_day is not None:
+        sensor_data = sensor_data[sensor_data['Time'].dt.time >= datetime.strptime(start_time_of_day, "%H:%M").time()]
+
+    #print(len(sensor_data),"length of sensor data after omitting t<2:30")
+
+    # Match each sensor log data point to a Lascar data point occurring at around the same time
+    # (the nearest one within the tolerance, as merge_asof would), dropping rows where a match wasn't found.
+    # The 'Offset' column says how far apart the matched times are.
+    merged_data = align_to_reference(sensor_data, lascar_data, tolerance=tolerance, direction='nearest')
+    # A match to a data logger row with a missing value is no use to the fits either
+    return merged_data.dropna(subset=['Lascar_Temperature', 'Lascar_Humidity']).reset_index(drop=True)
+
+# Names and units used on the fit plots for each quantity
+FIT_QUANTITIES = {'Temperature': '°C', 'Humidity': '%'}
+
+# Function to get bootstrap confidence intervals (see Bootstrap_Fit.py) for the fits of every quantity in one batched call
+# Returns a dict mapping each quantity to its BootstrapFit
+def bootstrap_calibration(merged_data, n_resamples=2000, confidence=0.95, processes=None, seed=None):
+    pairs = {quantity: (merged_data[f'Sensor_{quantity}'], merged_data[f'Lascar_{quantity}']) for quantity in FIT_QUANTITIES}
+    return bootstrap_fits(pairs, n_resamples, confidence, seed, processes)
+
+# Function to fit the data logger readings against the sensor readings for one quantity ('Temperature' or 'Humidity')
+# and plot them with the fitted line, its bootstrap confidence band and the ideal y = x line
+# Pass the quantity's result from bootstrap_calibration as 'bootstrap', or None to work it out here
+# Returns the figure, the linregress result and the BootstrapFit
+def plot_fit(merged_data, quantity, bootstrap=None, processes=None):
+    import matplotlib.pyplot as plt
+    from scipy.stats import linregress
+
+    unit = FIT_QUANTITIES[quantity]
+    sensor_values = merged_data[f'Sensor_{quantity}']
+    lascar_values = merged_data[f'Lascar_{quantity}']
+
+    # Linear fitting
+    fit = linregress(sensor_values, lascar_values)
+    if bootstrap is None:
+        bootstrap = bootstrap_calibration(merged_data, processes=processes)[quantity]
+
+    # Equation of the fitted line
+    fitted_line = fit.slope * sensor_values + fit.intercept
+
+    # Plot Lascar values vs Sensor values with a 45-degree line (ideal fit) and fitted line
+    fig, ax = plt.subplots(figsize=(8, 8))
+    # Scatter plot the data logger vs sensor values.
+    ax.scatter(sensor_values, lascar_values, color='black', label='Data Points')
+    # Overplot the the linear fit and add fit m and c from fit to legend
+    ax.plot(sensor_values, fitted_line, 'r-', label=f'Fit: y = {fit.slope:.2f}x + {fit.intercept:.2f}')
+    # Shade where the fitted line could lie, from the resampled fits, and give the intervals in the legend
+    band_x = np.linspace(sensor_values.min(), sensor_values.max(), 100)
+    band_low, band_high = confidence_band(bootstrap, band_x)
+    ax.fill_between(band_x, band_low, band_high, color='r', alpha=0.25,
+                    label=f'{bootstrap.confidence:.0%} CI: slope {bootstrap.slope_low:.3f} to {bootstrap.slope_high:.3f}, '
+                          f'intercept {bootstrap.intercept_low:.2f} to {bootstrap.intercept_high:.2f}')
+    # Overplot a line y = x so that it spans the whole dataset
+    ax.plot([sensor_values.min(), sensor_values.max()],
+            [sensor_values.min(), sensor_values.max()],
+            '--', label='Ideal (y = x)')
+    ax.set_xlabel(f'DHT22 {quantity} ({unit})')
+    ax.set_ylabel(f'Data Logger {quantity} ({unit})')
+    ax.set_title(f'Data Logger {quantity} vs DHT22 {quantity}')
+    ax.legend()
+    ax.grid()
+    fig.tight_layout()
+    return fig, fit, bootstrap
+
+# Main function to run the whole calibration analysis (the defaults are the files and cut-off of the original run)
+def main(sensor_log_file='sensor_log.txt', csv_files=None, start_time_of_day="14:30", use_parse_cache=True):
+    import matplotlib.pyplot as plt
+
+    # File paths
+    if csv_files is None:
+        csv_files = ['CSV-Data-Session1.csv', 'CSV-Data-Session2.csv']
+
+    sensor_data, lascar_data = load_calibration_data(sensor_log_file, csv_files, use_parse_cache)
+
+    fig, decimated_lines = plot_time_series(sensor_data, lascar_data)
+    plt.show()
+
+    merged_data = match_calibration_data(sensor_data, lascar_data, start_time_of_day)
+
+    # Confidence intervals for both fits at once, then the temperature fit and the humidity fit
+    bootstraps = bootstrap_calibration(merged_data)
+    plot_fit(merged_data, 'Temperature', bootstraps['Temperature'])
+    plt.show()
+    plot_fit(merged_data, 'Humidity', bootstraps['Humidity'])
+    plt.show()
+
+# This ensures that the analysis only runs when the script is executed, not when it's imported
+if __name__ == "__main__":
+    main()
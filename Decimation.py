@@ -0,0 +1,185 @@
+#Script for thinning out long time series before plotting them, while keeping their peaks
+
+
+import numpy as np
+import matplotlib.dates as mdates
+
+# Points kept per horizontal pixel of the axes - min/max gives two per bucket
+POINTS_PER_PIXEL = 2
+
+
+def minmax_decimate(x, y, n_buckets, x_range=None):
+    """
+    Keep the lowest and highest point in each of n_buckets equal slices of the x range.
+
+    Every spike survives, however short, because a bucket's extremes are always kept.
+    With one bucket per pixel the plot looks the same as plotting every point. The first
+    and last points are always kept too, even when they lie outside x_range and are
+    clipped into the edge buckets, so a zoomed-in line runs off both sides of the axes.
+
+    Args:
+        x (ndarray): The x values (floats), sorted in increasing order.
+        y (ndarray): The y values (floats); NaNs are ignored.
+        n_buckets (int): Number of buckets.
+        x_range (tuple): The (low, high) x values the buckets span, or None for the range of x.
+
+    Returns:
+        ndarray: Indices of the kept points, in increasing order.
+    """
+    n = len(x)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    low, high = (x[0], x[-1]) if x_range is None else x_range
+    width = (high - low) / n_buckets or 1.0
+    buckets = np.clip(((x - low) / width).astype(np.int64), 0, n_buckets - 1)
+    # x is sorted, so each bucket is one contiguous run of points
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    lengths = np.diff(starts, append=n)
+    positions = np.arange(n)
+
+    # First index in each run that reaches the run's minimum / maximum (NaNs never do)
+    lowest = np.repeat(np.fmin.reduceat(y, starts), lengths)
+    highest = np.repeat(np.fmax.reduceat(y, starts), lengths)
+    min_indices = np.minimum.reduceat(np.where(y == lowest, positions, n), starts)
+    max_indices = np.minimum.reduceat(np.where(y == highest, positions, n), starts)
+
+    kept = np.concatenate([min_indices, max_indices, [0, n - 1]])
+    # An all-NaN bucket has no extremes, and min and max are the same point in a one-point bucket
+    return np.unique(kept[kept < n])
+
+
+def lttb_decimate(x, y, n_out):
+    """
+    Pick n_out points with the largest-triangle-three-buckets algorithm.
+
+    The first and last points are kept; in between, every bucket keeps the point
+    that makes the largest triangle with the point kept before it and the average
+    of the next bucket, which preserves the visual shape (including peaks) well.
+
+    Args:
+        x (ndarray): The x values (floats), sorted in increasing order.
+        y (ndarray): The y values (floats), without NaNs.
+        n_out (int): Number of points to keep, at least 3.
+
+    Returns:
+        ndarray: Indices of the kept points, in increasing order.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    # Bucket edges for the n - 2 inner points, split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # The average point of every bucket, all computed at once
+    counts = np.diff(edges)
+    x_means = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    y_means = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The next bucket's average, or the last point after the final bucket
+        if bucket + 1 < n_out - 2:
+            next_x, next_y = x_means[bucket + 1], y_means[bucket + 1]
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        # Twice the area of the triangle (previous, candidate, next) for every candidate in the bucket
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def decimate(x, y, n_points, method='minmax', x_range=None):
+    """
+    Thin out a series to about n_points points.
+
+    Args:
+        x (ndarray): The x values (floats), sorted in increasing order.
+        y (ndarray): The y values (floats).
+        n_points (int): Roughly how many points to keep.
+        method (str): 'minmax' (keeps every extreme, fastest) or 'lttb' (keeps the shape with fewer points).
+        x_range (tuple): For 'minmax', the (low, high) x values the buckets span, or None for the range of x.
+
+    Returns:
+        ndarray: Indices of the kept points, in increasing order.
+    """
+    if method == 'minmax':
+        return minmax_decimate(x, y, max(n_points // 2, 1), x_range)
+    if method == 'lttb':
+        finite = np.flatnonzero(np.isfinite(y))
+        return finite[lttb_decimate(x[finite], y[finite], n_points)]
+    raise ValueError(f"method must be 'minmax' or 'lttb', not {method!r}")
+
+
+class DecimatedLine:
+    """
+    A line on a Matplotlib axes that only draws about as many points as the axes is pixels wide.
+
+    The full series is kept in memory; whenever the visible x range changes (zooming
+    or panning) the visible part is decimated again, so zooming in shows full detail.
+    """
+
+    def __init__(self, ax, x, y, method='minmax', points_per_pixel=POINTS_PER_PIXEL, **plot_kwargs):
+        """
+        Args:
+            ax: The Matplotlib axes to draw on.
+            x (array-like): The x values - numbers, or datetimes (converted to Matplotlib dates).
+            y (array-like): The y values.
+            method (str): 'minmax' or 'lttb', as in decimate.
+            points_per_pixel (float): Points to keep per horizontal pixel of the axes.
+            **plot_kwargs: Passed on to ax.plot, e.g. label and marker.
+        """
+        x = np.asarray(x)
+        self.is_dates = np.issubdtype(x.dtype, np.datetime64)
+        self.x = mdates.date2num(x) if self.is_dates else x.astype('float64')
+        self.y = np.asarray(y, dtype='float64')
+        if len(self.x) > 1 and np.any(np.diff(self.x) < 0):
+            order = np.argsort(self.x, kind='stable')
+            self.x, self.y = self.x[order], self.y[order]
+        self.ax = ax
+        self.method = method
+        self.points_per_pixel = points_per_pixel
+        indices = self._visible_indices(None)
+        self.line, = ax.plot(self._x_values(indices), self.y[indices], **plot_kwargs)
+        ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+    def _x_values(self, indices):
+        # Hand datetimes back to Matplotlib as dates so the axis stays a date axis
+        return mdates.num2date(self.x[indices]) if self.is_dates else self.x[indices]
+
+    def _visible_indices(self, x_range):
+        n_points = max(int(self.ax.bbox.width * self.points_per_pixel), 3)
+        if x_range is None:
+            return decimate(self.x, self.y, n_points, self.method)
+        # Keep one point beyond each edge so the line runs off the sides of the axes
+        low, high = x_range
+        start = max(np.searchsorted(self.x, low, side='left') - 1, 0)
+        end = min(np.searchsorted(self.x, high, side='right') + 1, len(self.x))
+        indices = decimate(self.x[start:end], self.y[start:end], n_points, self.method, (low, high))
+        return indices + start
+
+    def _on_xlim_changed(self, ax):
+        low, high = sorted(ax.get_xlim())
+        indices = self._visible_indices((low, high))
+        self.line.set_data(self._x_values(indices), self.y[indices])
+
+
+def plot_decimated(ax, x, y, method='minmax', **plot_kwargs):
+    """
+    Plot a long series on an axes like ax.plot does, but decimated to the axes' width in pixels.
+
+    Args:
+        ax: The Matplotlib axes to draw on.
+        x (array-like): The x values - numbers or datetimes.
+        y (array-like): The y values.
+        method (str): 'minmax' or 'lttb', as in decimate.
+        **plot_kwargs: Passed on to ax.plot.
+
+    Returns:
+        DecimatedLine: Keep a reference to it for as long as the figure is open.
+    """
+    return DecimatedLine(ax, x, y, method, **plot_kwargs)
@@ -1,176 +1,129 @@
 #Script for getting readings and writing them to a file (and printing them)
 
 
-import urllib.request  # Module for fetching URLs (for accessing the sensor's web server)
-import re              # Module for regular expressions (for parsing the HTML data)
 import time            # Module for handling time-related functions (for timestamps and delays)
+import asyncio         # Module for running the polling loop over many sensors at once
+import os              # Module for file system operations (for naming the binary logs)
 
-def fetch_sensor_data(url):
-    """
-    Fetch the raw HTML data from the sensor's web server.
-
-    Args:
-        url (str): The URL of the sensor's web server.
-
-    Returns:
-        str: The HTML content retrieved from the server, or None if an error occurs.
-    """
-    try:
-        # Open the URL and read the response
-        with urllib.request.urlopen(url) as response:
-            # Read the data and decode it from bytes to a UTF-8 string
-            data = response.read().decode('utf-8')
-            return data
-    except Exception as e:
-        # Print an error message if something goes wrong during the request
-        print(f"Error fetching data from {url}: {e}")
-        return None
-
-def parse_sensor_data_temp(temp_html_data):
-    """
-    Parse the temperature data from the HTML content.
-
-    Args:
-        html_data (str): The HTML content containing the sensor data.
+from Log_Writer import BufferedLogWriter, exit_on_sigterm
+from Binary_Log import BinaryLogWriter
+from Async_Poller import AsyncSensorPoller
+from Poll_Scheduler import AdaptiveSchedule, poll_adaptively
+from Acquisition_Service import subscribe
+from Metrics import READINGS, READ_FAILURES, start_metrics_server, StatsFileWriter
 
-    Returns:
-        float: A float - the temperature in Fahrenheit,
-               or None if parsing fails.
-    """
-    try:
-        # Define regular expression patterns to find temperature values
-        temp_pattern = r"Temperature: ([\d\.]+) F"
-
-        # Search the HTML data for the temperature pattern
-        temp_match = re.search(temp_pattern, temp_html_data)
-
-        if temp_match:
-            # Extract the temperature value from the regex match and convert to float
-            temperature_f = float(temp_match.group(1))
-           
-            return temperature_f
-        else:
-            # If the pattern is not found, print a warning message
-            print("Failed to parse sensor temperature data from HTML content.")
-            return None
-    except Exception as e:
-        # Print an error message if something goes wrong during parsing
-        print(f"Error parsing sensor temperature data: {e}")
-        return None
-       
-def parse_sensor_data_hmdt(hmdt_html_data):
+def log_file_for_host(host, hosts):
     """
-    Parse the humidity data from the HTML content.
+    Choose the log file for a sensor node.
 
     Args:
-        html_data (str): The HTML content containing the sensor data.
+        host (str): The node the reading came from.
+        hosts (list of str): Every node being polled.
 
     Returns:
-        float: A float - the humidity percentage,
-               or None if parsing fails.
+        str: "sensor_log.txt" when only one node is polled, otherwise a file named after the node.
     """
-    try:
-        # Define regular expression patterns to find humidity values
-        humidity_pattern = r"Humidity: ([\d\.]+)%"
-
-        # Search the HTML data for the humidity pattern
-        humidity_match = re.search(humidity_pattern, hmdt_html_data)
-
-        if humidity_match:
-            # Extract the humidity value from the regex match and convert to float
-            humidity = float(humidity_match.group(1))
-            return humidity
-        else:
-            # If the pattern is not found, print a warning message
-            print("Failed to parse sensor humidity data from HTML content.")
-            return None
-    except Exception as e:
-        # Print an error message if something goes wrong during parsing
-        print(f"Error parsing sensor humidity data: {e}")
-        return None
-
-def fahrenheit_to_celsius(temp_f):
-    """
-    Convert a temperature from Fahrenheit to Celsius.
-
-    Args:
-        temp_f (float): Temperature in degrees Fahrenheit.
-
-    Returns:
-        float: Temperature converted to degrees Celsius.
-    """
-    # Apply the Fahrenheit to Celsius conversion formula
-    temp_c = (temp_f - 32) * 5.0 / 9.0
-    return temp_c
-
-#this writes the data to a file
-def log_data(temperature_c, humidity):
-    """
-    Log the temperature and humidity data with a timestamp.
-
-    Args:
-        temperature_c (float): Temperature in degrees Celsius.
-        humidity (float): Relative humidity in percentage.
-    """
-    # Get the current time formatted as a human-readable string
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    # Create a log entry string with the timestamp, temperature, and humidity
-    log_entry = f"{timestamp}, Temperature: {temperature_c:.2f} °C, Humidity: {humidity:.2f}%"
-    # Print the log entry to the console
-    print(log_entry)
-    # Open the log file in append mode and write the log entry
-    with open("sensor_log.txt", "a") as file:
-        file.write(log_entry + "\n")
-
-def get_readings(temp_url,hmdt_url):
-    """
-    Fetch and parse sensor data from the web server, and convert the temperature to Celsius.
-
-    Args:
-        url (str): The URL of the sensor's web server.
-
-    Returns:
-        tuple: A tuple containing the temperature in Celsius and the humidity percentage,
-               or (None, None) if data retrieval fails.
-    """
-    # Fetch the raw HTML data from the sensor's web server
-    temp_html_data = fetch_sensor_data(temp_url)
-    hmdt_html_data = fetch_sensor_data(hmdt_url)
-    if temp_html_data and hmdt_html_data:
-        # Parse the temperature and humidity values from the HTML data
-        temp_f = parse_sensor_data_temp(temp_html_data)
-        humidity = parse_sensor_data_hmdt(hmdt_html_data)
-        if temp_f is not None and humidity is not None:
-            # Convert the temperature from Fahrenheit to Celsius
-            temp_c = fahrenheit_to_celsius(temp_f)
-            return temp_c, humidity
-    # Return None values if data fetching or parsing failed
-    return None, None
+    if len(hosts) == 1:
+        return "sensor_log.txt"
+    return f"sensor_log_{host}.txt"
 
 def main():
     """
-    Main function to periodically fetch and log sensor data.
+    Main function to periodically fetch and log sensor data from every node.
     """
-    # Define the URL of the sensor's web server
-    sensor_url_temp = "http://192.168.0.5/temp"
-    sensor_url_hmdt = "http://192.168.0.5/humidity"
+    # Define the IP addresses of the sensor nodes' web servers
+    SENSOR_HOSTS = ["192.168.0.5"]
 
-    # Set the interval at which to update/read the sensor data (in seconds)
+    # Set the interval at which to update/read the sensor data (in seconds) while readings are steady
     UPDATE_INTERVAL = 300
-
-    # Start an infinite loop to continuously read and log sensor data
-    while True:
-        # Get the temperature and humidity readings from the sensor
-        temperature, humidity = get_readings(sensor_url_temp,sensor_url_hmdt)
+    # Poll this often (in seconds) while readings change quickly, e.g. during heating tests
+    FAST_INTERVAL = 10
+    # Longest wait (in seconds) between retries of a node that can't be reached
+    MAX_BACKOFF = 900
+    # Seconds to wait for each request, and how many requests may be in flight at once
+    REQUEST_TIMEOUT = 10
+    MAX_CONCURRENCY = 32
+    # Also write a binary log (see Binary_Log.py) beside each text log
+    WRITE_BINARY_LOG = False
+    # Keep a sparse time index (see Log_Index.py) beside each text log, with an entry every this many lines
+    INDEX_EVERY = 100
+    # Take the readings from a running Acquisition_Service.py instead of polling the nodes here,
+    # so the logger and the live plot don't both poll the same sensor
+    USE_ACQUISITION_SERVICE = False
+    # Serve fetch latencies, error counts, flush times etc. (see Metrics.py) at
+    # http://127.0.0.1:METRICS_PORT/metrics for Prometheus, or None not to
+    METRICS_PORT = 9108
+    # Also save the same metrics, with rates per second, to this JSON file every STATS_INTERVAL seconds, or None not to
+    STATS_FILE = None
+    STATS_INTERVAL = 60
+
+    # One long-lived writer per node, keeping its log open rather than opening it for every reading.
+    # Each row is still written out as soon as it arrives (max_batch=1): at one reading every
+    # 10-300 s batching would save next to nothing, and anything held back would be lost if the
+    # logger is killed (or the power goes). Like the original append-and-close, a written row
+    # survives the logger crashing; set fsync=True to also make it survive a power cut.
+    writers = {host: [BufferedLogWriter(log_file_for_host(host, SENSOR_HOSTS), max_batch=1,
+                                        rotate_daily=False, echo=True, echo_interval=0,
+                                        index_every=INDEX_EVERY)]
+               for host in SENSOR_HOSTS}
+    if WRITE_BINARY_LOG:
+        for host in SENSOR_HOSTS:
+            binary_file = os.path.splitext(log_file_for_host(host, SENSOR_HOSTS))[0] + ".bin"
+            writers[host].append(BinaryLogWriter(binary_file, max_batch=1))
+
+    def handle_reading(host, temperature, humidity, timestamp=None):
         if temperature is not None and humidity is not None:
-            # If readings are valid, log the data
-            log_data(temperature, humidity)
+            # If readings are valid, log the data (with the same timestamp in every log)
+            if timestamp is None:
+                timestamp = time.time()
+            READINGS.labels(host).inc()
+            for writer in writers[host]:
+                writer.write(temperature, humidity, timestamp)
         else:
             # If readings are invalid, print an error message
-            print("No data received from sensor.")
-        # Wait for the specified update interval before reading the data again
-        time.sleep(UPDATE_INTERVAL)
+            print(f"No data received from sensor {host}.")
+            READ_FAILURES.labels(host).inc()
+            for writer in writers[host]:
+                writer.flush_if_due()
+
+    if METRICS_PORT is not None:
+        try:
+            start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            # The metrics are only for watching the logger - e.g. a port in use mustn't stop it
+            print(f"Not serving metrics on port {METRICS_PORT}: {e}")
+    stats_writer = None
+    if STATS_FILE is not None:
+        stats_writer = StatsFileWriter(STATS_FILE, STATS_INTERVAL)
+        stats_writer.start()
+
+    # Make sure buffered rows are written out if the logger is stopped with SIGTERM
+    exit_on_sigterm()
+    try:
+        if USE_ACQUISITION_SERVICE:
+            # Let the service downsample its readings to one per interval for each node
+            for reading in subscribe(UPDATE_INTERVAL, SENSOR_HOSTS, idle_timeout=UPDATE_INTERVAL):
+                if reading is None:
+                    # Nothing for a while - make sure old rows still get written out
+                    for host_writers in writers.values():
+                        for writer in host_writers:
+                            writer.flush_if_due()
+                    continue
+                host, timestamp, temperature, humidity = reading
+                handle_reading(host, temperature, humidity, timestamp)
+        else:
+            # Read every node on its own drift-free schedule until interrupted
+            poller = AsyncSensorPoller(SENSOR_HOSTS, timeout=REQUEST_TIMEOUT, max_concurrency=MAX_CONCURRENCY)
+            schedules = {host: AdaptiveSchedule(UPDATE_INTERVAL, FAST_INTERVAL, max_backoff=MAX_BACKOFF)
+                         for host in SENSOR_HOSTS}
+            asyncio.run(poll_adaptively(poller, schedules, handle_reading))
+    finally:
+        for host_writers in writers.values():
+            for writer in host_writers:
+                writer.close()
+        if stats_writer is not None:
+            stats_writer.stop()
 
 # This ensures that the main function runs when the script is executed
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,329 @@
+#Script for keeping weeks of readings in memory at several resolutions, so long histories can be shown without reading the logs
+
+
+import numpy as np
+
+# Seconds of raw samples kept by default (a day of 4 s readings is 21600 samples)
+RAW_SECONDS = 24 * 3600
+# Default rollup tiers as (seconds per bucket, seconds kept): a month of minutes and five years of hours
+TIERS = ((60, 30 * 24 * 3600), (3600, 5 * 365 * 24 * 3600))
+
+
+class _Rollup:
+    """
+    One resolution of the store: a ring of fixed-width time buckets, each holding the
+    minimum, maximum, sum and count of every channel for the samples that fell in it.
+
+    The ring arrays are twice the capacity and every bucket is written to both halves
+    (as in Animated_Plot.RingBuffer), so the held buckets are always one contiguous view.
+    """
+
+    def __init__(self, resolution, capacity, n_channels):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.times = np.zeros(2 * capacity)
+        self.minimum = np.zeros((2 * capacity, n_channels), dtype=np.float32)
+        self.maximum = np.zeros((2 * capacity, n_channels), dtype=np.float32)
+        self.sum = np.zeros((2 * capacity, n_channels))
+        self.count = np.zeros((2 * capacity, n_channels), dtype=np.int32)
+        self._next = 0
+        self.held = 0
+        # The bucket still being filled: its number (start time / resolution) and running totals
+        self.open_bucket = None
+        self._open = (np.full(n_channels, np.inf), np.full(n_channels, -np.inf),
+                      np.zeros(n_channels), np.zeros(n_channels, dtype=np.int64))
+
+    def _commit(self, buckets, minimum, maximum, total, count):
+        # Write closed buckets to the ring (only the newest 'capacity' of them can be kept)
+        buckets, minimum, maximum, total, count = (array[-self.capacity:] for array in (buckets, minimum, maximum, total, count))
+        slots = (self._next + np.arange(len(buckets))) % self.capacity
+        for slot_offset in (0, self.capacity):
+            self.times[slots + slot_offset] = buckets * self.resolution
+            self.minimum[slots + slot_offset] = minimum
+            self.maximum[slots + slot_offset] = maximum
+            self.sum[slots + slot_offset] = total
+            self.count[slots + slot_offset] = count
+        self._next = (self._next + len(buckets)) % self.capacity
+        self.held = min(self.held + len(buckets), self.capacity)
+
+    def _commit_open(self):
+        if self.open_bucket is not None:
+            self._commit(np.array([self.open_bucket]), *(part[np.newaxis] for part in self._open))
+
+    def add(self, timestamp, values):
+        # Add one sample; values is a float array with one entry per channel (NaN for missing)
+        bucket = int(timestamp // self.resolution)
+        minimum, maximum, total, count = self._open
+        if bucket != self.open_bucket:
+            self._commit_open()
+            self.open_bucket = bucket
+            minimum.fill(np.inf)
+            maximum.fill(-np.inf)
+            total.fill(0.0)
+            count.fill(0)
+        present = ~np.isnan(values)
+        np.fmin(minimum, values, out=minimum)
+        np.fmax(maximum, values, out=maximum)
+        total += np.where(present, values, 0.0)
+        count += present
+
+    def add_many(self, timestamps, values):
+        # Add sorted samples in bulk: every bucket's totals are computed at once with reduceat
+        buckets = np.floor_divide(timestamps, self.resolution).astype(np.int64)
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        present = ~np.isnan(values)
+        minimum = np.fmin.reduceat(np.where(present, values, np.inf), starts)
+        maximum = np.fmax.reduceat(np.where(present, values, -np.inf), starts)
+        total = np.add.reduceat(np.where(present, values, 0.0), starts)
+        count = np.add.reduceat(present.astype(np.int64), starts)
+        buckets = buckets[starts]
+
+        if buckets[0] == self.open_bucket:
+            # The first bucket continues the one still being filled
+            open_minimum, open_maximum, open_total, open_count = self._open
+            minimum[0] = np.fmin(minimum[0], open_minimum)
+            maximum[0] = np.fmax(maximum[0], open_maximum)
+            total[0] += open_total
+            count[0] += open_count
+        else:
+            self._commit_open()
+        if len(buckets) > 1:
+            self._commit(buckets[:-1], minimum[:-1], maximum[:-1], total[:-1], count[:-1])
+        # The last bucket may still get more samples
+        self.open_bucket = int(buckets[-1])
+        for part, value in zip(self._open, (minimum[-1], maximum[-1], total[-1], count[-1])):
+            part[:] = value
+
+    def oldest(self):
+        # Start time of the oldest bucket held, or None if there is none
+        if self.held:
+            return self.times[(self._next - self.held) % self.capacity]
+        return None if self.open_bucket is None else self.open_bucket * self.resolution
+
+    def query(self, start, end):
+        # The buckets that overlap [start, end], including the open one: times, min, mean and max
+        first = (self._next - self.held) % self.capacity
+        times = self.times[first:first + self.held]
+        low = np.searchsorted(times, start - self.resolution, side='right')
+        high = np.searchsorted(times, end, side='right')
+        parts = [array[first + low:first + high] for array in (self.times, self.minimum, self.maximum, self.sum, self.count)]
+        if self.open_bucket is not None and start - self.resolution < self.open_bucket * self.resolution <= end:
+            parts = [np.concatenate([part, np.asarray(extra, dtype=part.dtype)[np.newaxis]])
+                     for part, extra in zip(parts, (self.open_bucket * self.resolution,) + self._open)]
+        times, minimum, maximum, total, count = parts
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        # Channels with no samples in a bucket show as NaN rather than +/-inf
+        minimum = np.where(count > 0, minimum, np.nan)
+        maximum = np.where(count > 0, maximum, np.nan)
+        return times, minimum, mean, maximum
+
+
+class HistoryStore:
+    """
+    An in-memory time series of readings at several resolutions, with bounded memory.
+
+    The newest samples are kept as they are, for raw_seconds. Every sample is also
+    rolled up into each tier's buckets (e.g. one per minute and one per hour), which keep
+    the minimum, mean and maximum of each channel, so peaks survive the rollup. Every
+    level is a fixed-size ring of typed arrays, so memory use is set when the store is
+    made, however long it runs.
+
+    Times are wall-clock seconds (see Log_Writer.wall_clock_seconds), so hour buckets
+    line up with the hours of the local clock, as in the logs.
+    """
+
+    def __init__(self, channels=('Temperature', 'Humidity'), raw_seconds=RAW_SECONDS, sample_interval=4.0, tiers=TIERS):
+        """
+        Args:
+            channels (tuple of str): Names of the values in each sample.
+            raw_seconds (float): Seconds of raw samples to keep.
+            sample_interval (float): The shortest expected time between samples, used to size the raw ring.
+            tiers (tuple): (seconds per bucket, seconds kept) for each rollup tier, finest first.
+        """
+        self.channels = tuple(channels)
+        n_channels = len(self.channels)
+        self.raw_capacity = max(int(np.ceil(raw_seconds / sample_interval)), 1)
+        self._times = np.zeros(2 * self.raw_capacity)
+        self._values = np.zeros((2 * self.raw_capacity, n_channels), dtype=np.float32)
+        self._next = 0
+        self.count = 0   # number of raw samples currently held
+        self.tiers = [_Rollup(resolution, max(int(np.ceil(kept / resolution)), 1), n_channels)
+                      for resolution, kept in sorted(tiers)]
+        self.last_time = None
+        self.dropped = 0   # samples ignored because they were older than the newest one
+
+    @classmethod
+    def from_frame(cls, df, columns=None, channels=None, time_column='Time', **kwargs):
+        """
+        Make a store holding the readings of a parsed frame, e.g. from Calibration_Analysis.load_calibration_data.
+
+        Args:
+            df (DataFrame): The readings, with a datetime64 time column.
+            columns (list of str): The columns to keep, or None for every column but the time.
+            channels (list of str): Names to give those columns in the store, or None to keep the column names.
+            time_column (str): The name of the time column.
+            **kwargs: Passed on to HistoryStore, e.g. raw_seconds and tiers.
+
+        Returns:
+            HistoryStore: The filled store.
+        """
+        if columns is None:
+            columns = [column for column in df.columns if column != time_column]
+        store = cls(columns if channels is None else channels, **kwargs)
+        if len(df):
+            if not df[time_column].is_monotonic_increasing:
+                df = df.sort_values(time_column, kind='stable')
+            # datetime64[ns] to wall-clock seconds, as in the binary log
+            timestamps = df[time_column].to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+            store.append_many(timestamps, df[columns].to_numpy(dtype='float64'))
+        return store
+
+    def append(self, timestamp, *values):
+        """
+        Add one sample.
+
+        Args:
+            timestamp (float): Time of the sample in wall-clock seconds; samples older than the newest are ignored.
+            *values (float): One value per channel, or None where it is missing.
+        """
+        if self.last_time is not None and timestamp < self.last_time:
+            self.dropped += 1
+            return
+        values = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        self._times[self._next] = self._times[self._next + self.raw_capacity] = timestamp
+        self._values[self._next] = self._values[self._next + self.raw_capacity] = values
+        self._next = (self._next + 1) % self.raw_capacity
+        self.count = min(self.count + 1, self.raw_capacity)
+        for tier in self.tiers:
+            tier.add(timestamp, values)
+        self.last_time = timestamp
+
+    def append_many(self, timestamps, values):
+        """
+        Add many samples at once, much faster than calling append for each.
+
+        Args:
+            timestamps (ndarray): Times in wall-clock seconds, in increasing order.
+            values (ndarray): One row per sample, one column per channel (NaN where missing).
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(timestamps), len(self.channels))
+        if self.last_time is not None:
+            keep = timestamps >= self.last_time
+            self.dropped += int(len(keep) - keep.sum())
+            timestamps, values = timestamps[keep], values[keep]
+        if len(timestamps) == 0:
+            return
+        # Only the newest raw_capacity samples fit in the raw ring
+        recent_times, recent_values = timestamps[-self.raw_capacity:], values[-self.raw_capacity:]
+        slots = (self._next + np.arange(len(recent_times))) % self.raw_capacity
+        for slot_offset in (0, self.raw_capacity):
+            self._times[slots + slot_offset] = recent_times
+            self._values[slots + slot_offset] = recent_values
+        self._next = (self._next + len(recent_times)) % self.raw_capacity
+        self.count = min(self.count + len(recent_times), self.raw_capacity)
+        for tier in self.tiers:
+            tier.add_many(timestamps, values)
+        self.last_time = timestamps[-1]
+
+    def levels(self):
+        """
+        The resolutions held, finest first, and how far back each goes.
+
+        Returns:
+            list: (seconds per point, 0 for raw; oldest time held, or None if empty) for each level.
+        """
+        first = (self._next - self.count) % self.raw_capacity
+        raw_oldest = self._times[first] if self.count else None
+        return [(0, raw_oldest)] + [(tier.resolution, tier.oldest()) for tier in self.tiers]
+
+    def query(self, start=None, end=None, max_points=None, resolution=None):
+        """
+        Get the history between two times, at the finest resolution that suits the span.
+
+        The finest level that still holds data back to 'start' is used, unless it would
+        return more than max_points points, in which case a coarser tier is used. For
+        spans older than every level, the coarsest tier is used.
+
+        Args:
+            start (float): Start of the span in wall-clock seconds, or None for everything held.
+            end (float): End of the span in wall-clock seconds, or None for the newest sample.
+            max_points (int): Most points wanted, e.g. the width of the plot in pixels, or None for no limit.
+            resolution (float): Use this level (0 for raw, or a tier's seconds per bucket) instead of choosing.
+
+        Returns:
+            dict: 'resolution' (seconds per point, 0 for raw), 'Time' (wall-clock seconds) and, for every
+                  channel, its mean and '<channel>_min' / '<channel>_max'. For raw samples the three are
+                  the same values.
+        """
+        levels = self.levels()
+        if start is None:
+            start = min((oldest for _, oldest in levels if oldest is not None), default=0.0)
+        if end is None:
+            end = self.last_time if self.last_time is not None else start
+        if resolution is None:
+            resolution = levels[-1][0]
+            # A level that hasn't wrapped around yet still holds everything since the first sample
+            wrapped = [self.count == self.raw_capacity] + [tier.held == tier.capacity for tier in self.tiers]
+            for (level_resolution, oldest), level_wrapped in zip(levels, wrapped):
+                if oldest is None or (level_wrapped and oldest > start):
+                    continue
+                points = self._raw_points(start, end) if level_resolution == 0 else (end - start) / level_resolution + 1
+                if max_points is None or points <= max_points:
+                    resolution = level_resolution
+                    break
+
+        result = {'resolution': resolution}
+        if resolution == 0:
+            first = (self._next - self.count) % self.raw_capacity
+            times = self._times[first:first + self.count]
+            low, high = np.searchsorted(times, start, side='left'), np.searchsorted(times, end, side='right')
+            result['Time'] = times[low:high]
+            for index, channel in enumerate(self.channels):
+                values = self._values[first + low:first + high, index]
+                result[channel] = result[f'{channel}_min'] = result[f'{channel}_max'] = values
+            return result
+        tier = next((tier for tier in self.tiers if tier.resolution == resolution), None)
+        if tier is None:
+            raise ValueError(f"No level with a resolution of {resolution} s")
+        times, minimum, mean, maximum = tier.query(start, end)
+        result['Time'] = times
+        for index, channel in enumerate(self.channels):
+            result[channel] = mean[:, index]
+            result[f'{channel}_min'] = minimum[:, index]
+            result[f'{channel}_max'] = maximum[:, index]
+        return result
+
+    def _raw_points(self, start, end):
+        first = (self._next - self.count) % self.raw_capacity
+        times = self._times[first:first + self.count]
+        return np.searchsorted(times, end, side='right') - np.searchsorted(times, start, side='left')
+
+    def query_frame(self, start=None, end=None, max_points=None, resolution=None):
+        """
+        Like query, but as a DataFrame with a datetime64 'Time' column, as used by the analysis scripts.
+
+        start and end may also be datetimes (e.g. pd.Timestamp), as in the frames' 'Time' columns.
+
+        Returns:
+            DataFrame: One row per point, with the resolution in df.attrs['resolution'].
+        """
+        import pandas as pd
+        start, end = (value if value is None or isinstance(value, (int, float)) else pd.Timestamp(value).value / 1e9
+                      for value in (start, end))
+        result = self.query(start, end, max_points, resolution)
+        resolution = result.pop('resolution')
+        df = pd.DataFrame(result)
+        df['Time'] = (df['Time'].to_numpy() * 1e9).astype(np.int64).astype('datetime64[ns]')
+        df.attrs['resolution'] = resolution
+        return df
+
+    def memory_bytes(self):
+        """
+        The memory held by the store's arrays, which stays the same as it fills.
+        """
+        arrays = [self._times, self._values]
+        for tier in self.tiers:
+            arrays += [tier.times, tier.minimum, tier.maximum, tier.sum, tier.count]
+        return sum(array.nbytes for array in arrays)
@@ -0,0 +1,395 @@
+#Script for a local server that sensor nodes push their readings to, instead of the PC polling them
+
+
+import asyncio          # Module for serving many nodes at once
+import json             # Module for encoding the replies to HTTP pushes
+import math             # Module for math functions (for checking readings are finite numbers)
+import re               # Module for checking node names
+import struct           # Module for unpacking binary records
+import time             # Module for handling time-related functions (for timestamps and flush checks)
+import urllib.parse     # Module for reading the node name from the request's query string
+
+from Binary_Log import RECORD_FORMAT, RECORD_SIZE
+from Log_Writer import BufferedLogWriter, exit_on_sigterm
+from Metrics import READINGS, INGEST_REJECTED, start_metrics_server
+
+# Where to accept pushes: HTTP POSTs to /readings, and UDP datagrams (None to turn one off)
+HTTP_ADDRESS = ("0.0.0.0", 8080)
+UDP_ADDRESS = ("0.0.0.0", 8081)
+# Largest HTTP body accepted, in bytes (about 43000 binary records)
+MAX_BODY = 1024 * 1024
+# How far ahead of the PC's clock a reading's timestamp may be before it is rejected
+MAX_CLOCK_SKEW = 300.0
+# Timestamps before this (2001-09-09) come from a node whose clock was never set
+EARLIEST_TIMESTAMP = 1e9
+# Readings outside the DHT22's measuring range are rejected
+TEMPERATURE_RANGE = (-40.0, 80.0)
+HUMIDITY_RANGE = (0.0, 100.0)
+# Node names become part of a log file name, so they are limited to these characters (and 64 of them)
+NODE_NAME = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+# Most nodes accepted besides the known ones, since every node gets its own log file
+MAX_NODES = 32
+
+_RECORD = struct.Struct(RECORD_FORMAT)
+
+
+def decode_batch(data, text=False):
+    """
+    Decode a batch of pushed readings.
+
+    A binary batch is a run of RECORD_SIZE byte records laid out like the binary log's
+    (three little-endian float64s: timestamp, temperature in °C, humidity in %), except
+    that the timestamp is seconds since the epoch as given by time.time() (0 for "now",
+    for nodes without a clock). A text batch has one "timestamp,temperature,humidity"
+    line per reading, e.g. "1730817000,21.5,45.0".
+
+    Args:
+        data (bytes): The batch.
+        text (bool): Whether the batch is text rather than binary.
+
+    Returns:
+        list: (timestamp, temperature_c, humidity) tuples.
+
+    Raises:
+        ValueError: If the batch is malformed (it is then rejected as a whole).
+    """
+    if not text:
+        if len(data) % RECORD_SIZE:
+            raise ValueError(f"batch of {len(data)} bytes is not a whole number of {RECORD_SIZE} byte records")
+        return list(_RECORD.iter_unpack(data))
+    readings = []
+    for line in data.decode('ascii').splitlines():
+        if not line.strip():
+            continue
+        fields = line.split(',')
+        if len(fields) != 3:
+            raise ValueError(f"expected timestamp,temperature,humidity but got {line!r}")
+        readings.append(tuple(float(field) for field in fields))
+    return readings
+
+
+def validate_reading(timestamp, temperature_c, humidity, now, max_clock_skew=MAX_CLOCK_SKEW):
+    """
+    Check a pushed reading is plausible.
+
+    Args:
+        timestamp (float): Seconds since the epoch, or 0 for "now".
+        temperature_c (float): Temperature in degrees Celsius.
+        humidity (float): Relative humidity in percentage.
+        now (float): The time the batch arrived.
+        max_clock_skew (float): How far in the future the timestamp may be.
+
+    Returns:
+        float: The reading's timestamp (now if it was 0), or None if the reading is invalid.
+    """
+    if timestamp == 0:
+        timestamp = now
+    if not (math.isfinite(timestamp) and math.isfinite(temperature_c) and math.isfinite(humidity)):
+        return None
+    if timestamp < EARLIEST_TIMESTAMP or timestamp > now + max_clock_skew:
+        return None
+    if not (TEMPERATURE_RANGE[0] <= temperature_c <= TEMPERATURE_RANGE[1] and HUMIDITY_RANGE[0] <= humidity <= HUMIDITY_RANGE[1]):
+        return None
+    return timestamp
+
+
+class _DatagramHandler(asyncio.DatagramProtocol):
+    # Every datagram is one binary batch from the node it was sent from
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, address):
+        try:
+            self.server.ingest(address[0], data)
+        except ValueError as e:
+            print(f"Rejected datagram from {address[0]}: {e}")
+
+
+class IngestionServer:
+    """
+    Accept batches of readings pushed by the sensor nodes, over HTTP and/or UDP.
+
+    Nodes POST a batch to /readings (binary by default, or text with a text/plain
+    Content-Type), optionally naming themselves with ?node=<name>; otherwise the node
+    is named after its IP address, as the polling scripts name their hosts. A UDP
+    datagram holds one binary batch. Every valid reading is passed to handle_reading,
+    the same callback the polling logger uses, so pushed readings go through the same
+    logging and calibration pipeline. Each node's readings are passed on in time order:
+    a batch is sorted, and readings older than the newest one already accepted from
+    the node are rejected.
+    """
+
+    def __init__(self, handle_reading, max_clock_skew=MAX_CLOCK_SKEW, max_body=MAX_BODY,
+                 known_nodes=(), max_nodes=MAX_NODES):
+        """
+        Args:
+            handle_reading (callable): Called as handle_reading(host, temperature_c, humidity, timestamp)
+                for every valid reading.
+            max_clock_skew (float): How far ahead of this PC's clock a timestamp may be.
+            max_body (int): Largest HTTP body accepted, in bytes.
+            known_nodes (list of str): Nodes that are always accepted, e.g. SENSOR_HOSTS.
+            max_nodes (int): Most other nodes accepted; batches from any more are rejected.
+        """
+        self.handle_reading = handle_reading
+        self.max_clock_skew = max_clock_skew
+        self.max_body = max_body
+        self.known_nodes = set(known_nodes)
+        self.max_nodes = max_nodes
+        self._other_nodes = set()
+        # The newest timestamp accepted from each node - the logs must stay in time order
+        self._last_timestamps = {}
+
+    def check_node(self, host):
+        """
+        Check a node may push, remembering it if it is new.
+
+        Args:
+            host (str): The node's name or IP address.
+
+        Raises:
+            ValueError: If the name isn't a safe file name part, or too many nodes are pushing already.
+        """
+        if host in self.known_nodes or host in self._other_nodes:
+            return
+        if not NODE_NAME.fullmatch(host):
+            INGEST_REJECTED.labels('bad_node').inc()
+            raise ValueError(f"node names may only hold letters, digits, '_', '.' and '-', not {host!r}")
+        if len(self._other_nodes) >= self.max_nodes:
+            INGEST_REJECTED.labels('too_many_nodes').inc()
+            raise ValueError(f"already accepting {self.max_nodes} nodes, so not {host!r}")
+        self._other_nodes.add(host)
+
+    def ingest(self, host, data, text=False):
+        """
+        Decode, validate and hand on one batch.
+
+        Args:
+            host (str): The node the batch came from.
+            data (bytes): The batch, as described in decode_batch.
+            text (bool): Whether the batch is text rather than binary.
+
+        Returns:
+            tuple: The number of readings accepted and rejected.
+
+        Raises:
+            ValueError: If the batch is malformed or the node isn't accepted (see check_node).
+        """
+        self.check_node(host)
+        try:
+            readings = decode_batch(data, text)
+        except ValueError:
+            INGEST_REJECTED.labels('malformed').inc()
+            raise
+        now = time.time()
+        valid = []
+        for timestamp, temperature_c, humidity in readings:
+            timestamp = validate_reading(timestamp, temperature_c, humidity, now, self.max_clock_skew)
+            if timestamp is not None:
+                valid.append((timestamp, temperature_c, humidity))
+        invalid = len(readings) - len(valid)
+        if invalid:
+            INGEST_REJECTED.labels('invalid').inc(invalid)
+
+        # The logs, their index and the analysis all rely on time order, so a batch is written
+        # sorted, and readings older than the node's newest one so far are dropped, not appended
+        valid.sort(key=lambda reading: reading[0])
+        last_timestamp = self._last_timestamps.get(host, float('-inf'))
+        accepted = 0
+        for timestamp, temperature_c, humidity in valid:
+            if timestamp < last_timestamp:
+                continue
+            self.handle_reading(host, temperature_c, humidity, timestamp)
+            last_timestamp = timestamp
+            accepted += 1
+        self._last_timestamps[host] = last_timestamp
+        out_of_order = len(valid) - accepted
+        if out_of_order:
+            INGEST_REJECTED.labels('out_of_order').inc(out_of_order)
+        return accepted, invalid + out_of_order
+
+    async def _respond(self, writer, status, reason, body, keep_alive):
+        data = (json.dumps(body) + "\n").encode('utf-8')
+        writer.write((f"HTTP/1.1 {status} {reason}\r\n"
+                      "Content-Type: application/json\r\n"
+                      f"Content-Length: {len(data)}\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('ascii') + data)
+        await writer.drain()
+
+    async def _handle_http(self, reader, writer):
+        # Serve requests on one connection until the node closes it (keep-alive saves a handshake per batch)
+        peer = writer.get_extra_info('peername')
+        peer_host = peer[0] if isinstance(peer, tuple) else "unknown"
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get('connection', '').lower() != 'close'
+
+                if 'transfer-encoding' in headers:
+                    await self._respond(writer, 411, "Length Required", {"error": "send a Content-Length"}, False)
+                    break
+                length = int(headers.get('content-length', 0))
+                if length > self.max_body:
+                    INGEST_REJECTED.labels('too_large').inc()
+                    await self._respond(writer, 413, "Payload Too Large", {"error": f"batches are limited to {self.max_body} bytes"}, False)
+                    break
+                body = await reader.readexactly(length)
+
+                path, _, query = target.partition('?')
+                if path != "/readings":
+                    await self._respond(writer, 404, "Not Found", {"error": "push readings to /readings"}, keep_alive)
+                elif method != "POST":
+                    await self._respond(writer, 405, "Method Not Allowed", {"error": "use POST"}, keep_alive)
+                else:
+                    node = urllib.parse.parse_qs(query).get('node', [peer_host])[0]
+                    text = headers.get('content-type', '').startswith('text/')
+                    try:
+                        accepted, rejected = self.ingest(node, body, text)
+                        await self._respond(writer, 200, "OK", {"accepted": accepted, "rejected": rejected}, keep_alive)
+                    except ValueError as e:
+                        await self._respond(writer, 400, "Bad Request", {"error": str(e)}, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            # A dropped connection or a garbled request line - nothing to answer
+            print(f"Closed connection from {peer_host}: {e}")
+        except asyncio.CancelledError:
+            # The server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, http_address=HTTP_ADDRESS, udp_address=UDP_ADDRESS):
+        """
+        Start accepting pushes.
+
+        Args:
+            http_address (tuple): The (host, port) to accept HTTP POSTs on, or None.
+            udp_address (tuple): The (host, port) to accept UDP datagrams on, or None.
+
+        Returns:
+            list: The running asyncio server and/or datagram transport (close them to stop).
+        """
+        running = []
+        if http_address is not None:
+            running.append(await asyncio.start_server(self._handle_http, *http_address))
+        if udp_address is not None:
+            transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: _DatagramHandler(self), local_addr=udp_address)
+            running.append(transport)
+        return running
+
+
+async def run_ingestion(handle_reading, flush_if_due, http_address=HTTP_ADDRESS, udp_address=UDP_ADDRESS, flush_check=1.0,
+                        known_nodes=()):
+    """
+    Accept pushed readings until interrupted.
+
+    Args:
+        handle_reading (callable): Called for every valid reading, as in IngestionServer.
+        flush_if_due (callable): Called every flush_check seconds, so buffered rows are written
+            out even when the nodes go quiet.
+        http_address (tuple): Where to accept HTTP POSTs, or None.
+        udp_address (tuple): Where to accept UDP datagrams, or None.
+        flush_check (float): Seconds between calls to flush_if_due.
+        known_nodes (list of str): Nodes that are always accepted (see IngestionServer).
+    """
+    server = IngestionServer(handle_reading, known_nodes=known_nodes)
+    running = await server.serve(http_address, udp_address)
+    print(f"Accepting readings over HTTP on {http_address} and UDP on {udp_address}")
+    try:
+        while True:
+            await asyncio.sleep(flush_check)
+            flush_if_due()
+    finally:
+        for item in running:
+            item.close()
+
+
+def main():
+    """
+    Main function to accept pushed readings and write them to the same logs as Get_Readings_and_Write.py.
+    """
+    # The nodes expected to push, so their logs get the same names as when they are polled.
+    # Up to MAX_NODES nodes not listed are still accepted, each with its own sensor_log_<node>.txt.
+    SENSOR_HOSTS = ["192.168.0.5"]
+    # Keep a sparse time index (see Log_Index.py) beside each text log, with an entry every this many lines
+    INDEX_EVERY = 100
+    # Also send every reading to the subscribers of an acquisition service socket (see Acquisition_Service.py),
+    # e.g. so Animated_Plot.py can show pushed readings, or None not to
+    PUBLISH_ADDRESS = None
+    # Serve the metrics (see Metrics.py) on this port, or None not to
+    METRICS_PORT = 9110
+
+    # Imported here so the ingestion server itself doesn't depend on the polling logger
+    from Get_Readings_and_Write import log_file_for_host
+    from Acquisition_Service import ReadingPublisher
+
+    # Pushed readings can arrive thousands at a time, so rows are written in large batches
+    # (or after a few seconds) rather than one file append per request
+    writers = {}
+    publisher = ReadingPublisher() if PUBLISH_ADDRESS is not None else None
+
+    def handle_reading(host, temperature, humidity, timestamp):
+        writer = writers.get(host)
+        if writer is None:
+            log_file = log_file_for_host(host, SENSOR_HOSTS) if host in SENSOR_HOSTS else f"sensor_log_{host}.txt"
+            writer = writers[host] = BufferedLogWriter(log_file, max_batch=1000, max_age=5.0, echo=True,
+                                                       echo_interval=60.0, index_every=INDEX_EVERY)
+        READINGS.labels(host).inc()
+        try:
+            writer.write(temperature, humidity, timestamp)
+        except OSError as e:
+            # The rows stay buffered and are tried again at the next flush
+            print(f"Error writing {writer.path}: {e}")
+        if publisher is not None:
+            publisher.publish(host, temperature, humidity, timestamp)
+
+    def flush_if_due():
+        # One log that can't be written mustn't stop the others (or the server)
+        for writer in writers.values():
+            try:
+                writer.flush_if_due()
+            except OSError as e:
+                print(f"Error writing {writer.path}: {e}")
+
+    async def serve():
+        if publisher is not None:
+            service = await publisher.serve(PUBLISH_ADDRESS)
+        try:
+            await run_ingestion(handle_reading, flush_if_due, known_nodes=SENSOR_HOSTS)
+        finally:
+            if publisher is not None:
+                service.close()
+
+    if METRICS_PORT is not None:
+        try:
+            start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            # The metrics are only for watching the server - e.g. a port in use mustn't stop it
+            print(f"Not serving metrics on port {METRICS_PORT}: {e}")
+    # Make sure buffered rows are written out if the server is stopped with SIGTERM
+    exit_on_sigterm()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for writer in writers.values():
+            try:
+                writer.close()
+            except OSError as e:
+                print(f"Error writing {writer.path}: {e}")
+
+# This ensures that the server only runs when the script is executed
+if __name__ == "__main__":
+    main()
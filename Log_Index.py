@@ -0,0 +1,247 @@
+#Script for a sparse time index over the text sensor log, for reading short time windows quickly
+
+
+import os        # Module for file system operations (for file sizes)
+import struct    # Module for packing index entries into fixed-width binary records
+import bisect    # Module for binary searching the index
+import calendar  # Module for converting wall-clock times to seconds since the epoch
+from datetime import datetime
+
+# Every index file starts with this 16 byte header: a magic string, the spacing of the entries and padding
+MAGIC = b"DAHIDX01"
+HEADER_SIZE = 16
+# Every entry is the wall-clock seconds of a log line (as in Binary_Log.py) and the byte offset where it starts
+ENTRY_FORMAT = "<qq"
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+# Number of characters in the timestamp at the start of every log line, e.g. "2024-11-05 14:30:00"
+TIMESTAMP_LENGTH = 19
+
+
+def index_path_for(log_path):
+    """
+    Name of the sidecar index file for a log, e.g. "sensor_log.txt.idx".
+
+    Args:
+        log_path (str): The path of the text log.
+
+    Returns:
+        str: The path of its index file.
+    """
+    return log_path + ".idx"
+
+
+def to_wall_clock_seconds(moment):
+    """
+    Convert a time to wall-clock seconds since 1970-01-01 00:00, as stored in the index.
+
+    Args:
+        moment (datetime or str): A datetime (or pandas Timestamp), or a string like "2024-11-05 14:30:00".
+
+    Returns:
+        int: The wall-clock seconds.
+    """
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    return calendar.timegm(moment.timetuple())
+
+
+def line_seconds(line):
+    """
+    Read the timestamp at the start of a log line.
+
+    Args:
+        line (bytes): A line of the text log.
+
+    Returns:
+        int: The wall-clock seconds of the line, or None if it doesn't start with a timestamp.
+    """
+    try:
+        return to_wall_clock_seconds(datetime.strptime(line[:TIMESTAMP_LENGTH].decode('ascii'), "%Y-%m-%d %H:%M:%S"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class SparseLogIndex:
+    """
+    A sidecar index mapping timestamps to byte offsets for every Nth line of a text log.
+
+    The index file is append-only. Opening it brings it up to date with anything
+    appended to the log since it was last written, and BufferedLogWriter keeps it
+    up to date as it writes. The log is assumed to be in time order.
+    """
+
+    def __init__(self, log_path, every=1000, read_only=False):
+        """
+        Args:
+            log_path (str): The path of the text log to index.
+            every (int): Add an index entry for every this many lines.
+            read_only (bool): Whether to keep new entries in memory only, leaving the index file alone.
+        """
+        self.log_path = log_path
+        self.index_path = index_path_for(log_path)
+        self.every = every
+        self.read_only = read_only
+        self.times = []
+        self.offsets = []
+        # How far through the log has been counted, and how many lines since the last entry
+        self._counted_to = 0
+        self._since_entry = 0
+        self._file = None
+        self._load()
+        self.catch_up()
+
+    def _load(self):
+        # Read the existing entries, or start a new index if there isn't a usable one
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as file:
+                header = file.read(HEADER_SIZE)
+                data = file.read()
+            if len(header) == HEADER_SIZE and header[:len(MAGIC)] == MAGIC and struct.unpack("<I", header[8:12])[0] == self.every:
+                usable = len(data) - len(data) % ENTRY_SIZE
+                for seconds, offset in struct.iter_unpack(ENTRY_FORMAT, data[:usable]):
+                    self.times.append(seconds)
+                    self.offsets.append(offset)
+                # Drop entries past the end of the log (e.g. the log was truncated or replaced)
+                log_size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+                while self.offsets and self.offsets[-1] >= log_size:
+                    self.times.pop()
+                    self.offsets.pop()
+                if not self.read_only:
+                    self._file = open(self.index_path, 'r+b')
+                    self._file.truncate(HEADER_SIZE + len(self.offsets) * ENTRY_SIZE)
+                    self._file.seek(0, os.SEEK_END)
+                if self.offsets:
+                    # Re-count from the last entry - it is line 0 of the current stretch
+                    self._counted_to = self.offsets[-1]
+                    self._since_entry = -1
+                return
+        if self.read_only:
+            return
+        self._file = open(self.index_path, 'wb')
+        self._file.write(MAGIC + struct.pack("<I", self.every) + bytes(HEADER_SIZE - len(MAGIC) - 4))
+        self._file.flush()
+
+    def _add_entry(self, seconds, offset):
+        self.times.append(seconds)
+        self.offsets.append(offset)
+        if self._file is not None:
+            self._file.write(struct.pack(ENTRY_FORMAT, seconds, offset))
+
+    def add_line(self, seconds, offset, length):
+        """
+        Record that a line was appended to the log, adding an index entry if it is the Nth.
+
+        Args:
+            seconds (int): The wall-clock seconds of the line.
+            offset (int): The byte offset where the line starts.
+            length (int): The length of the line in bytes, including its newline.
+        """
+        self._counted_to = offset + length
+        if self._since_entry < 0:
+            # This is the line the last entry already points at
+            self._since_entry = 1
+            return
+        if self._since_entry % self.every == 0:
+            self._add_entry(int(seconds), offset)
+            self._since_entry = 0
+        self._since_entry += 1
+
+    def catch_up(self):
+        """
+        Index any complete lines appended to the log since the index was last updated.
+        """
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as log_file:
+            log_file.seek(self._counted_to)
+            offset = self._counted_to
+            for line in log_file:
+                if not line.endswith(b"\n"):
+                    # Leave a partly written line for next time
+                    break
+                if self._since_entry < 0 or self._since_entry % self.every == 0:
+                    seconds = line_seconds(line)
+                    if seconds is not None:
+                        self.add_line(seconds, offset, len(line))
+                    # A malformed line can't be an entry - try again with the next one
+                else:
+                    self._since_entry += 1
+                offset += len(line)
+            self._counted_to = offset
+        self.flush()
+
+    def flush(self):
+        """
+        Write any new entries out to the index file.
+        """
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """
+        Flush and close the index file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def byte_range(self, start_seconds, end_seconds):
+        """
+        Find a stretch of the log that contains every line between two times.
+
+        Args:
+            start_seconds (int): Wall-clock seconds of the start of the window.
+            end_seconds (int): Wall-clock seconds of the end of the window.
+
+        Returns:
+            tuple: The byte offsets to read from and up to (None meaning the end of the log).
+        """
+        # Start at the last entry strictly before the window, in case earlier lines share its first second
+        first = bisect.bisect_left(self.times, start_seconds) - 1
+        low = self.offsets[first] if first >= 0 else 0
+        # Stop at the first entry after the window
+        last = bisect.bisect_right(self.times, end_seconds)
+        high = self.offsets[last] if last < len(self.offsets) else None
+        return low, high
+
+
+def read_window(log_path, start, end, index=None, every=1000, update=True):
+    """
+    Read only the lines of a text log between two times, using its sparse index.
+
+    Args:
+        log_path (str): The path of the text log.
+        start (datetime or str): The start of the window (inclusive).
+        end (datetime or str): The end of the window (inclusive).
+        index (SparseLogIndex): An already open index, or None to open (and update) the sidecar index.
+        every (int): Spacing of the index entries, if the index is opened here.
+        update (bool): Whether to save newly indexed lines to the sidecar file. Pass False
+            while a logger that maintains the index is still writing to the same log.
+
+    Returns:
+        DataFrame: Columns 'Time', 'Sensor_Temperature' and 'Sensor_Humidity' for the window.
+    """
+    # Imported here so the logger can keep the index up to date without pandas installed
+    import pandas as pd
+    from Calibration_Analysis import parse_sensor_log_chunk
+
+    own_index = index is None
+    if own_index:
+        index = SparseLogIndex(log_path, every, read_only=not update)
+    else:
+        index.catch_up()
+    try:
+        start_seconds = to_wall_clock_seconds(start)
+        end_seconds = to_wall_clock_seconds(end)
+        low, high = index.byte_range(start_seconds, end_seconds)
+    finally:
+        if own_index:
+            index.close()
+
+    # Read just that stretch of the file and parse it in one go
+    with open(log_path, 'rb') as file:
+        file.seek(low)
+        data = file.read() if high is None else file.read(high - low)
+    sensor_df, _ = parse_sensor_log_chunk(data)
+    in_window = (sensor_df['Time'] >= pd.Timestamp(start)) & (sensor_df['Time'] <= pd.Timestamp(end))
+    return sensor_df[in_window].reset_index(drop=True)
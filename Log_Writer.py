@@ -0,0 +1,239 @@
+#Script for writing sensor readings to the log file in batches
+
+
+import os        # Module for file system operations (for fsync, renaming and file sizes)
+import signal    # Module for handling signals (so buffered rows survive SIGTERM)
+import time      # Module for handling time-related functions (for timestamps and batch ages)
+import calendar  # Module for converting wall-clock times to seconds since the epoch
+
+from Log_Index import SparseLogIndex, index_path_for
+from Metrics import FLUSH_SECONDS, ROWS_WRITTEN
+
+# Format of the timestamp at the start of every log line
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def format_log_entry(timestamp, temperature_c, humidity):
+    """
+    Build one line of the sensor log.
+
+    Args:
+        timestamp (str): The time of the reading, formatted with TIMESTAMP_FORMAT.
+        temperature_c (float): Temperature in degrees Celsius.
+        humidity (float): Relative humidity in percentage.
+
+    Returns:
+        str: The log entry, without a trailing newline.
+    """
+    return f"{timestamp}, Temperature: {temperature_c:.2f} °C, Humidity: {humidity:.2f}%"
+
+
+def wall_clock_seconds(timestamp):
+    """
+    Convert a time since the epoch to wall-clock seconds, as used by the binary log and the log index.
+
+    Args:
+        timestamp (float): Seconds since the epoch, as returned by time.time().
+
+    Returns:
+        float: Seconds since 1970-01-01 00:00 of the local wall-clock time.
+    """
+    return float(calendar.timegm(time.localtime(timestamp)))
+
+
+class BufferedLogWriter:
+    """
+    A long-lived writer that collects readings in memory and appends them to the log in batches.
+
+    The batch is written out when it holds max_batch rows or its oldest row is older
+    than max_age seconds, whichever comes first. The file is kept open between
+    batches, and rotated by size and/or by date if asked to.
+    """
+
+    def __init__(self, path="sensor_log.txt", max_batch=100, max_age=60.0, fsync=False,
+                 rotate_bytes=None, rotate_daily=False, echo=False, echo_interval=60.0, index_every=None):
+        """
+        Args:
+            path (str): The log file to append to.
+            max_batch (int): Number of buffered rows that triggers a flush.
+            max_age (float): Seconds the oldest buffered row may wait before a flush.
+            fsync (bool): Whether to fsync the file after every batch.
+            rotate_bytes (int): Rotate the file once it would grow past this many bytes, or None.
+            rotate_daily (bool): Whether to rotate the file when the date changes.
+            echo (bool): Whether to print readings to the console.
+            echo_interval (float): Minimum seconds between two printed readings.
+            index_every (int): Keep a sparse time index (see Log_Index.py) with an entry
+                every this many lines, or None for no index.
+        """
+        self.path = path
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self.echo = echo
+        self.echo_interval = echo_interval
+        self.index_every = index_every
+
+        self._rows = []
+        self._index = None
+        self._oldest = None
+        self._file = None
+        self._file_date = None
+        self._last_echo = None
+        self._suppressed = 0
+
+    def _encode_row(self, timestamp, temperature_c, humidity):
+        # Format the reading as one line of the log
+        log_entry = format_log_entry(time.strftime(TIMESTAMP_FORMAT, time.localtime(timestamp)),
+                                     temperature_c, humidity)
+        return (log_entry + "\n").encode('utf-8')
+
+    def _open(self):
+        # Open the log in append mode and remember which day it belongs to
+        self._file = open(self.path, "ab")
+        self._file_date = time.strftime("%Y-%m-%d")
+        if self.index_every is not None:
+            # Opening the index also indexes anything already in the log
+            self._index = SparseLogIndex(self.path, self.index_every)
+
+    def _rotated_path(self, label):
+        # Build a free file name such as sensor_log_2024-11-05.txt for the rotated file
+        stem, ext = os.path.splitext(self.path)
+        candidate = f"{stem}_{label}{ext}"
+        count = 1
+        while os.path.exists(candidate):
+            candidate = f"{stem}_{label}_{count}{ext}"
+            count += 1
+        return candidate
+
+    def _rotate(self, label):
+        # Move the current file aside; the next write starts a new one under the original name
+        self._file.close()
+        self._file = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        if os.path.getsize(self.path) > 0:
+            rotated_path = self._rotated_path(label)
+            os.rename(self.path, rotated_path)
+            # The index moves with its log
+            if os.path.exists(index_path_for(self.path)):
+                os.rename(index_path_for(self.path), index_path_for(rotated_path))
+
+    def _maybe_rotate(self, batch_size, first_timestamp):
+        if self.rotate_daily:
+            batch_date = time.strftime("%Y-%m-%d", time.localtime(first_timestamp))
+            if batch_date != self._file_date:
+                self._rotate(self._file_date)
+                self._open()
+        if self.rotate_bytes is not None:
+            if self._file.tell() > 0 and self._file.tell() + batch_size > self.rotate_bytes:
+                self._rotate(time.strftime("%Y%m%d-%H%M%S"))
+                self._open()
+
+    def _echo(self, timestamp, temperature_c, humidity):
+        # Print at most one reading per echo_interval, and say how many were skipped
+        now = time.monotonic()
+        if self._last_echo is not None and now - self._last_echo < self.echo_interval:
+            self._suppressed += 1
+            return
+        log_entry = format_log_entry(time.strftime(TIMESTAMP_FORMAT, time.localtime(timestamp)),
+                                     temperature_c, humidity)
+        if self._suppressed:
+            log_entry += f"  (+{self._suppressed} more since last shown)"
+        print(log_entry)
+        self._last_echo = now
+        self._suppressed = 0
+
+    def write(self, temperature_c, humidity, timestamp=None):
+        """
+        Add a reading to the batch, flushing the batch if it is full or old enough.
+
+        Args:
+            temperature_c (float): Temperature in degrees Celsius.
+            humidity (float): Relative humidity in percentage.
+            timestamp (float): Time of the reading in seconds since the epoch, or None for now.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self._rows.append((timestamp, temperature_c, humidity))
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if self.echo:
+            self._echo(timestamp, temperature_c, humidity)
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        """
+        Flush the batch if it has reached max_batch rows or max_age seconds.
+
+        Call this periodically when readings may stop arriving for a while.
+        """
+        if not self._rows:
+            return
+        if len(self._rows) >= self.max_batch or time.monotonic() - self._oldest >= self.max_age:
+            self.flush()
+
+    def flush(self):
+        """
+        Write every buffered row to the log file in one go.
+        """
+        if not self._rows:
+            return
+        start = time.perf_counter()
+        encoded_rows = [self._encode_row(*row) for row in self._rows]
+        data = b"".join(encoded_rows)
+        if self._file is None:
+            self._open()
+        self._maybe_rotate(len(data), self._rows[0][0])
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            # One fsync per batch rather than one per line
+            os.fsync(self._file.fileno())
+        if self._index is not None:
+            # Tell the index where each new line starts
+            for (timestamp, _, _), encoded_row in zip(self._rows, encoded_rows):
+                self._index.add_line(wall_clock_seconds(timestamp), offset, len(encoded_row))
+                offset += len(encoded_row)
+            self._index.flush()
+        log_name = os.path.basename(self.path)
+        FLUSH_SECONDS.labels(log_name).observe(time.perf_counter() - start)
+        ROWS_WRITTEN.labels(log_name).inc(len(self._rows))
+        self._rows = []
+        self._oldest = None
+
+    def close(self):
+        """
+        Flush any buffered rows and close the log file.
+        """
+        try:
+            self.flush()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._index is not None:
+                self._index.close()
+                self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def exit_on_sigterm():
+    """
+    Turn SIGTERM into a normal interpreter exit.
+
+    By default SIGTERM kills the process without running 'finally' blocks or
+    context managers, so rows still buffered in a BufferedLogWriter would be lost.
+    After this call SIGTERM raises SystemExit, which unwinds the stack like Ctrl+C does.
+    """
+    def handle_sigterm(signum, frame):
+        raise SystemExit(128 + signum)
+    signal.signal(signal.SIGTERM, handle_sigterm)
@@ -0,0 +1,386 @@
+#Script for lightweight counters, gauges and latency histograms, served in Prometheus text format and/or written to a stats file
+
+
+import os           # Module for file system operations (for replacing the stats file atomically)
+import json         # Module for writing the stats file
+import time         # Module for handling time-related functions (for timing and rates)
+import bisect       # Module for finding a histogram bucket quickly
+import math         # Module for math functions (for spotting infinite and NaN values)
+import threading    # Module for locks and the background server/writer threads
+
+# Histogram buckets (upper bounds, in seconds) for network requests and for log flushes
+FETCH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+def format_value(value):
+    """
+    Write a sample value for the Prometheus text format, exactly.
+
+    '{:g}' would keep only 6 significant digits, so a counter past a million would stop
+    showing small increments and rate() would read zero until it jumped.
+
+    Args:
+        value (float): The value.
+
+    Returns:
+        str: The shortest text that reads back as the same float, e.g. "1234567.0" or "+Inf".
+    """
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class _Metric:
+    """
+    Base for a metric family: one named metric with a value per combination of label values.
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Get the metric for one combination of label values, creating it on first use.
+
+        Args:
+            *values: One value per label name, in order.
+        """
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes the labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        """
+        The metric in Prometheus text format.
+
+        Returns:
+            list: The lines of text.
+        """
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    # A single number that can be changed safely from several threads
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    """
+    A count that only goes up, e.g. the number of failed requests.
+    """
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        """
+        Add to the count (only for a counter without labels).
+        """
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {format_value(child.value)}"]
+
+    def snapshot(self):
+        return {",".join(values): child.value for values, child in self._children.items()}
+
+
+class Gauge(Counter):
+    """
+    A value that can go up and down, e.g. the depth of a queue.
+    """
+
+    kind = "gauge"
+
+    def set(self, value):
+        """
+        Set the value (only for a gauge without labels).
+        """
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    # Counts per bucket, plus the total and the sum of every observation
+    __slots__ = ('bounds', 'counts', 'count', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self):
+        """
+        Time a block of code, e.g. 'with histogram.labels("/temp").time(): ...'.
+        """
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """
+    The distribution of a measurement, e.g. request latency, as counts per bucket.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=FETCH_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        """
+        Record a measurement (only for a histogram without labels).
+        """
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else f"{bound:g}"
+            lines.append(f"{self.name}_bucket{self._label_text(values, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {format_value(child.sum)}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {child.count}")
+        return lines
+
+    def snapshot(self):
+        # The count, mean and approximate 50th/95th percentiles (upper bucket bounds) of each child
+        result = {}
+        for values, child in self._children.items():
+            summary = {'count': child.count, 'mean': child.sum / child.count if child.count else None}
+            for name, fraction in (('p50', 0.5), ('p95', 0.95)):
+                target = fraction * child.count
+                cumulative = 0
+                summary[name] = None
+                for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                    cumulative += count
+                    if child.count and cumulative >= target:
+                        summary[name] = bound
+                        break
+            result[",".join(values)] = summary
+        return result
+
+
+class MetricsRegistry:
+    """
+    A set of metrics that are rendered and saved together.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, metric_class, name, *args, **kwargs):
+        # Registering the same name twice returns the existing metric, so modules can share metrics
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._get(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=FETCH_BUCKETS):
+        return self._get(Histogram, name, help_text, labelnames, buckets)
+
+    def render(self):
+        """
+        Every metric in Prometheus text format.
+
+        Returns:
+            str: The text served at /metrics.
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Every metric's current values, for the stats file.
+
+        Returns:
+            dict: Maps each metric name to its values by label.
+        """
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+
+# The registry the rest of the scripts record into
+REGISTRY = MetricsRegistry()
+
+FETCH_SECONDS = REGISTRY.histogram("sensor_fetch_seconds", "Time taken to fetch a page from a sensor node.", ["endpoint"])
+FETCH_ERRORS = REGISTRY.counter("sensor_fetch_errors_total", "Failed fetches from sensor nodes, by kind (timeout or error).", ["endpoint", "kind"])
+PARSE_FAILURES = REGISTRY.counter("sensor_parse_failures_total", "Sensor pages whose value could not be parsed.", ["field"])
+READINGS = REGISTRY.counter("sensor_readings_total", "Valid readings received from each sensor node.", ["host"])
+READ_FAILURES = REGISTRY.counter("sensor_read_failures_total", "Polls of a sensor node that gave no reading.", ["host"])
+FLUSH_SECONDS = REGISTRY.histogram("log_flush_seconds", "Time taken to write a batch to a log file.", ["log"], FLUSH_BUCKETS)
+ROWS_WRITTEN = REGISTRY.counter("log_rows_written_total", "Rows written to each log file.", ["log"])
+QUEUE_DEPTH = REGISTRY.gauge("queue_depth", "Items waiting in a queue (the fullest one, for per-subscriber queues).", ["queue"])
+QUEUE_DROPPED = REGISTRY.counter("queue_dropped_total", "Items dropped from a full queue.", ["queue"])
+INGEST_REJECTED = REGISTRY.counter("ingest_rejected_total", "Pushed readings rejected by the ingestion server, by reason.", ["reason"])
+
+
+def start_metrics_server(port=9108, host="127.0.0.1", registry=REGISTRY):
+    """
+    Serve the metrics at http://host:port/metrics from a background thread.
+
+    Args:
+        port (int): The port to listen on.
+        host (str): The address to listen on - the default only accepts local connections.
+        registry (MetricsRegistry): The metrics to serve.
+
+    Returns:
+        ThreadingHTTPServer: The running server (call shutdown() to stop it).
+    """
+    # Imported here so the logging path (which imports this module) doesn't pay for it unless the endpoint is used
+    import http.server
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != "/metrics":
+                self.send_error(404)
+                return
+            data = self.server.registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            # Don't print a line for every scrape
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+class StatsFileWriter(threading.Thread):
+    """
+    Background thread that saves a JSON snapshot of the metrics every so often.
+
+    Besides the raw values it adds the rate per second of every counter since the
+    previous snapshot, e.g. the readings per second of each node.
+    """
+
+    def __init__(self, path="sensor_stats.json", interval=60.0, registry=REGISTRY):
+        """
+        Args:
+            path (str): The file to write (replaced atomically each time).
+            interval (float): Seconds between snapshots.
+            registry (MetricsRegistry): The metrics to save.
+        """
+        super().__init__(name="stats-file-writer", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop_event = threading.Event()
+        self._previous = None
+
+    def write_snapshot(self):
+        """
+        Write the current snapshot now.
+        """
+        now = time.time()
+        snapshot = self.registry.snapshot()
+        rates = {}
+        if self._previous is not None:
+            previous_time, previous_snapshot = self._previous
+            for name, metric in self.registry._metrics.items():
+                if isinstance(metric, Counter) and not isinstance(metric, Gauge):
+                    rates[name] = {label: (value - previous_snapshot.get(name, {}).get(label, 0.0)) / (now - previous_time)
+                                   for label, value in snapshot[name].items()}
+        self._previous = (now, snapshot)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump({'time': now, 'metrics': snapshot, 'rates_per_second': rates}, file, indent=1)
+        os.replace(temporary_path, self.path)
+
+    def _try_write_snapshot(self):
+        # A stats file that can't be written is reported, not allowed to stop anything
+        try:
+            self.write_snapshot()
+        except OSError as e:
+            print(f"Could not write the stats file {self.path}: {e}")
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self._try_write_snapshot()
+
+    def stop(self):
+        """
+        Stop the thread, writing one last snapshot.
+        """
+        self._stop_event.set()
+        self._try_write_snapshot()
@@ -0,0 +1,256 @@
+#Script for caching parsed sensor logs and Lascar CSVs on disk, so re-running the analysis only parses new data
+
+
+import os        # Module for file system operations (for file sizes, times and atomic replacement)
+import json      # Module for reading and writing the cache metadata
+import hashlib   # Module for fingerprinting file contents
+
+import numpy as np
+
+from Binary_Log import HEADER, HEADER_SIZE, RECORD_SIZE, read_binary_log
+from Calibration_Analysis import parse_sensor_log_chunk, read_lascar_sessions
+
+# Bump this whenever the cached data or metadata changes shape, so old caches are rebuilt
+CACHE_VERSION = 1
+# Bytes hashed from each end of the parsed part of a file when fingerprinting it
+FINGERPRINT_BLOCK = 1024 * 1024
+
+
+def cache_paths(file_path, cache_dir=None):
+    """
+    Names of the cached data and metadata files for a source file.
+
+    Args:
+        file_path (str): The sensor log or Lascar CSV being cached.
+        cache_dir (str): Where to keep the cache, or None for a '.parse_cache' folder beside the file.
+
+    Returns:
+        tuple: The path of the cached data (a binary log, see Binary_Log.py) and of its JSON metadata.
+    """
+    absolute_path = os.path.abspath(file_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(absolute_path), ".parse_cache")
+    # The hash of the full path keeps files with the same name in different folders apart
+    key = hashlib.sha1(absolute_path.encode('utf-8')).hexdigest()[:12]
+    stem = os.path.join(cache_dir, f"{os.path.basename(file_path)}.{key}")
+    return stem + ".bin", stem + ".json"
+
+
+def content_fingerprint(file_path, end):
+    """
+    Hash the first 'end' bytes of a file - all of them if that is at most two blocks,
+    otherwise the first and last FINGERPRINT_BLOCK bytes and the length.
+
+    Reading only the ends keeps the check fast on very large logs, and still catches
+    a file that was replaced, rewritten or truncated and regrown.
+
+    Args:
+        file_path (str): The file to fingerprint.
+        end (int): Number of bytes from the start of the file to cover.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256(str(end).encode('ascii'))
+    with open(file_path, 'rb') as file:
+        if end <= 2 * FINGERPRINT_BLOCK:
+            digest.update(file.read(end))
+        else:
+            digest.update(file.read(FINGERPRINT_BLOCK))
+            file.seek(end - FINGERPRINT_BLOCK)
+            digest.update(file.read(FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+
+def frame_to_records(df, temperature_column, humidity_column):
+    """
+    Pack a parsed frame into binary log records: wall-clock seconds, temperature and humidity.
+
+    Returns:
+        bytes: The records, RECORD_SIZE bytes each.
+    """
+    records = np.empty((len(df), 3), dtype='<f8')
+    records[:, 0] = df['Time'].to_numpy(dtype='datetime64[ns]').astype(np.int64) // 1_000_000_000
+    records[:, 1] = df[temperature_column].to_numpy(dtype='float64')
+    records[:, 2] = df[humidity_column].to_numpy(dtype='float64')
+    return records.tobytes()
+
+
+def _write_atomically(path, data):
+    # Write to a temporary file first so a crash never leaves a half-written cache file
+    # (named after the process, so parallel runs sharing a cache don't trip over each other)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(data)
+    os.replace(temporary_path, path)
+
+
+def _load_metadata(metadata_path, data_path, absolute_path):
+    # Read the metadata, or None if it is missing, stale or doesn't match its data file
+    try:
+        with open(metadata_path, 'r') as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if metadata.get('version') != CACHE_VERSION or metadata.get('path') != absolute_path:
+        return None
+    if not os.path.exists(data_path) or os.path.getsize(data_path) < HEADER_SIZE + metadata['records'] * RECORD_SIZE:
+        return None
+    return metadata
+
+
+def _save(metadata_path, metadata, file_path):
+    stat = os.stat(file_path)
+    metadata.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                    fingerprint=content_fingerprint(file_path, metadata['parsed_offset']))
+    _write_atomically(metadata_path, json.dumps(metadata, indent=1).encode('utf-8'))
+
+
+def _read_cached(data_path, metadata, temperature_column, humidity_column):
+    # Memory-map the cached records and give the columns their usual names
+    cached_df = read_binary_log(data_path)
+    if len(cached_df) > metadata['records']:
+        # Records appended by a run that crashed before updating the metadata
+        cached_df = cached_df.iloc[:metadata['records']]
+    cached_df.columns = ['Time', temperature_column, humidity_column]
+    cached_df.attrs['skipped_lines'] = metadata.get('skipped', 0)
+    return cached_df
+
+
+def _parse_sensor_log_from(file_path, offset):
+    # Parse the complete lines from 'offset' on; a partly written last line is left for next time
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        data = file.read()
+    cut = data.rfind(b'\n') + 1
+    sensor_df, skipped = parse_sensor_log_chunk(data[:cut])
+    return sensor_df, skipped, offset + cut
+
+
+def load_sensor_log(file_path, cache_dir=None):
+    """
+    Parse a sensor log, reusing the cached result of earlier runs.
+
+    The log is append-only, so if the part parsed last time is unchanged only the new
+    tail is parsed and appended to the cache. Anything else (a different file, an edit,
+    a truncation) is caught by the fingerprint and the log is parsed from scratch.
+
+    Args:
+        file_path (str): The sensor log text file.
+        cache_dir (str): Where to keep the cache, or None for a '.parse_cache' folder beside the file.
+
+    Returns:
+        DataFrame: Columns 'Time', 'Sensor_Temperature' and 'Sensor_Humidity', the same
+                   as extract_sensor_log_data_vectorized in Calibration_Analysis.py.
+    """
+    absolute_path = os.path.abspath(file_path)
+    data_path, metadata_path = cache_paths(file_path, cache_dir)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    metadata = _load_metadata(metadata_path, data_path, absolute_path)
+    stat = os.stat(file_path)
+
+    if (metadata is not None and stat.st_size == metadata['size'] and stat.st_mtime_ns == metadata['mtime_ns']
+            and metadata['parsed_offset'] == stat.st_size):
+        # Nothing has changed since last time
+        return _read_cached(data_path, metadata, 'Sensor_Temperature', 'Sensor_Humidity')
+
+    tail_parsed = False
+    if (metadata is not None and stat.st_size >= metadata['parsed_offset']
+            and content_fingerprint(file_path, metadata['parsed_offset']) == metadata['fingerprint']):
+        # Only new lines were added - parse just those and append them
+        try:
+            tail_df, skipped, parsed_offset = _parse_sensor_log_from(file_path, metadata['parsed_offset'])
+        except ValueError as e:
+            # Damage the parser can't get past - don't keep failing on the same tail, start again
+            print(f"Could not parse the new lines of {file_path} ({e}), parsing it all again")
+        else:
+            with open(data_path, 'r+b') as file:
+                # Drop any records a crashed earlier run appended without updating the metadata
+                file.truncate(HEADER_SIZE + metadata['records'] * RECORD_SIZE)
+                file.seek(0, os.SEEK_END)
+                file.write(frame_to_records(tail_df, 'Sensor_Temperature', 'Sensor_Humidity'))
+            metadata.update(records=metadata['records'] + len(tail_df), skipped=metadata['skipped'] + skipped,
+                            parsed_offset=parsed_offset)
+            print(f"Parsed {len(tail_df)} new lines of {file_path}")
+            tail_parsed = True
+    if not tail_parsed:
+        # First run, or the log was replaced - parse it all
+        sensor_df, skipped, parsed_offset = _parse_sensor_log_from(file_path, 0)
+        _write_atomically(data_path, HEADER + frame_to_records(sensor_df, 'Sensor_Temperature', 'Sensor_Humidity'))
+        metadata = {'version': CACHE_VERSION, 'path': absolute_path, 'records': len(sensor_df),
+                    'skipped': skipped, 'parsed_offset': parsed_offset}
+        print(f"Parsed all {len(sensor_df)} lines of {file_path}")
+    if metadata['skipped']:
+        print(f"Skipped {metadata['skipped']} malformed lines in {file_path}")
+    _save(metadata_path, metadata, file_path)
+    return _read_cached(data_path, metadata, 'Sensor_Temperature', 'Sensor_Humidity')
+
+
+def _cached_lascar_session(file_path, cache_dir=None):
+    # The cached session if the file hasn't changed since it was cached, otherwise None
+    data_path, metadata_path = cache_paths(file_path, cache_dir)
+    metadata = _load_metadata(metadata_path, data_path, os.path.abspath(file_path))
+    stat = os.stat(file_path)
+    if metadata is not None and stat.st_size == metadata['size']:
+        if stat.st_mtime_ns == metadata['mtime_ns']:
+            return _read_cached(data_path, metadata, 'Lascar_Temperature', 'Lascar_Humidity')
+        if content_fingerprint(file_path, stat.st_size) == metadata['fingerprint']:
+            # Same contents, new timestamp - remember the new mtime
+            _save(metadata_path, metadata, file_path)
+            return _read_cached(data_path, metadata, 'Lascar_Temperature', 'Lascar_Humidity')
+    return None
+
+
+def _cache_lascar_session(file_path, lascar_df, cache_dir=None):
+    # Save a freshly read session to the cache
+    data_path, metadata_path = cache_paths(file_path, cache_dir)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    _write_atomically(data_path, HEADER + frame_to_records(lascar_df, 'Lascar_Temperature', 'Lascar_Humidity'))
+    metadata = {'version': CACHE_VERSION, 'path': os.path.abspath(file_path), 'records': len(lascar_df),
+                'skipped': 0, 'parsed_offset': os.path.getsize(file_path)}
+    _save(metadata_path, metadata, file_path)
+
+
+def load_lascar_session(file_path, cache_dir=None):
+    """
+    Read a Lascar CSV file, reusing the cached result of earlier runs.
+
+    The exports never change once written, so the file is only parsed again if its
+    contents differ from last time (a copied file with a new mtime is still a hit).
+
+    Args:
+        file_path (str): The Lascar CSV file.
+        cache_dir (str): Where to keep the cache, or None for a '.parse_cache' folder beside the file.
+
+    Returns:
+        DataFrame: Columns 'Time', 'Lascar_Temperature' and 'Lascar_Humidity', sorted by time,
+                   or None if the file has no data header.
+    """
+    return load_lascar_sessions([file_path], cache_dir, processes=1)[0]
+
+
+def load_lascar_sessions(file_paths, cache_dir=None, processes=None):
+    """
+    Read many Lascar CSV files, reusing the cached results of earlier runs.
+
+    The cache is checked for every file first; the files that have to be parsed are then
+    read in parallel by a pool of processes (see read_lascar_sessions in Calibration_Analysis.py)
+    and cached for next time.
+
+    Args:
+        file_paths (list of str): The Lascar CSV files.
+        cache_dir (str): Where to keep the cache, or None for a '.parse_cache' folder beside each file.
+        processes (int): Number of worker processes for the files to parse, or None for one per core.
+
+    Returns:
+        list: One DataFrame per file, in the same order, as from load_lascar_session.
+    """
+    file_paths = list(file_paths)
+    sessions = [_cached_lascar_session(file_path, cache_dir) for file_path in file_paths]
+    misses = [index for index, session in enumerate(sessions) if session is None]
+    parsed = read_lascar_sessions([file_paths[index] for index in misses], processes)
+    for index, lascar_df in zip(misses, parsed):
+        if lascar_df is not None:
+            _cache_lascar_session(file_paths[index], lascar_df, cache_dir)
+        sessions[index] = lascar_df
+    return sessions
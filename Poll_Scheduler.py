@@ -0,0 +1,143 @@
+#Script for scheduling sensor polls: a fixed cadence that speeds up when readings change quickly and backs off from unreachable nodes
+
+
+import asyncio  # Module for polling every node in its own task
+import math     # Module for math functions (for counting missed polls)
+import random   # Module for random numbers (for jittering the retry delays)
+import time     # Module for handling time-related functions (for the monotonic clock)
+
+
+class AdaptiveSchedule:
+    """
+    When to poll one sensor node next.
+
+    Polls are kept on a fixed grid of the monotonic clock, so the period doesn't drift
+    by however long each request took, and missed slots are skipped rather than made up.
+    The interval drops to fast_interval while the readings change faster than the given
+    rates, then doubles back up to the baseline once they settle. While a node can't be
+    read it is retried after an exponentially growing, jittered delay.
+    """
+
+    def __init__(self, baseline=300.0, fast_interval=10.0, temp_rate=0.5, hmdt_rate=2.0,
+                 temp_noise=0.2, hmdt_noise=1.0, retry_delay=15.0, max_backoff=900.0, jitter=0.5, start=None):
+        """
+        Args:
+            baseline (float): Seconds between polls while the readings are steady.
+            fast_interval (float): Seconds between polls while the readings change quickly.
+            temp_rate (float): Temperature change (°C per minute) that counts as quick.
+            hmdt_rate (float): Humidity change (% per minute) that counts as quick.
+            temp_noise (float): Temperature change (°C) between two readings that is ignored as noise.
+            hmdt_noise (float): Humidity change (%) between two readings that is ignored as noise.
+            retry_delay (float): Seconds before the first retry of a node that couldn't be read.
+            max_backoff (float): Longest delay between retries, in seconds.
+            jitter (float): Fraction of each retry delay that is randomised, so nodes don't retry in step.
+            start (float): time.monotonic() of the first poll, or None for now.
+        """
+        self.baseline = baseline
+        self.fast_interval = fast_interval
+        self.temp_rate = temp_rate
+        self.hmdt_rate = hmdt_rate
+        self.temp_noise = temp_noise
+        self.hmdt_noise = hmdt_noise
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+        self.interval = baseline
+        self.next_due = time.monotonic() if start is None else start
+        self.failures = 0
+        self._last = None  # (time.monotonic(), temperature, humidity) of the last good reading
+
+    def _advance(self, now):
+        # Move on to the next slot of the grid, skipping any that have already gone by
+        self.next_due += self.interval
+        if self.next_due <= now:
+            missed = math.floor((now - self.next_due) / self.interval) + 1
+            self.next_due += missed * self.interval
+
+    def is_changing(self, temperature_c, humidity, now):
+        """
+        Check whether a reading has moved quickly away from the last one.
+
+        Args:
+            temperature_c (float): Temperature in degrees Celsius.
+            humidity (float): Relative humidity in percentage.
+            now (float): time.monotonic() of the reading.
+
+        Returns:
+            bool: True if either value changed faster than its rate, beyond its noise.
+        """
+        if self._last is None:
+            return False
+        last_time, last_temperature, last_humidity = self._last
+        minutes = max(now - last_time, 1e-9) / 60.0
+        temp_change = max(abs(temperature_c - last_temperature) - self.temp_noise, 0.0)
+        hmdt_change = max(abs(humidity - last_humidity) - self.hmdt_noise, 0.0)
+        return temp_change / minutes > self.temp_rate or hmdt_change / minutes > self.hmdt_rate
+
+    def succeeded(self, temperature_c, humidity, now=None):
+        """
+        Record a good reading and schedule the next poll.
+
+        Args:
+            temperature_c (float): Temperature in degrees Celsius.
+            humidity (float): Relative humidity in percentage.
+            now (float): time.monotonic() of the reading, or None for now.
+        """
+        if now is None:
+            now = time.monotonic()
+        if self.failures:
+            # The node is back - start a new grid from this reading
+            self.failures = 0
+            self.next_due = now
+        if self.is_changing(temperature_c, humidity, now):
+            self.interval = self.fast_interval
+        else:
+            # Settle back towards the baseline gradually, in case the change picks up again
+            self.interval = min(self.interval * 2, self.baseline)
+        self._last = (now, temperature_c, humidity)
+        self._advance(now)
+
+    def failed(self, now=None):
+        """
+        Record a failed poll and schedule a retry.
+
+        Args:
+            now (float): time.monotonic() when the poll failed, or None for now.
+        """
+        if now is None:
+            now = time.monotonic()
+        self.failures += 1
+        delay = min(self.retry_delay * 2 ** (self.failures - 1), self.max_backoff)
+        self.next_due = now + delay * (1.0 - self.jitter * random.random())
+
+
+async def _poll_node(poller, host, schedule, handle_reading):
+    # Poll one node whenever its schedule says so
+    while True:
+        await asyncio.sleep(max(0.0, schedule.next_due - time.monotonic()))
+        temperature, humidity = await poller.get_readings(host)
+        handle_reading(host, temperature, humidity)
+        if temperature is not None and humidity is not None:
+            schedule.succeeded(temperature, humidity)
+        else:
+            schedule.failed()
+
+
+async def poll_adaptively(poller, schedules, handle_reading):
+    """
+    Poll every node on its own adaptive schedule and pass each result on.
+
+    Every node runs in its own task, so a node that is slow or backing off never delays the others.
+
+    Args:
+        poller (AsyncSensorPoller): The poller to read the nodes with.
+        schedules (dict): Maps each host to its AdaptiveSchedule.
+        handle_reading (callable): Called as handle_reading(host, temperature_c, humidity)
+            after every poll; the values are None if the node could not be read.
+    """
+    try:
+        await asyncio.gather(*(_poll_node(poller, host, schedule, handle_reading)
+                               for host, schedule in schedules.items()))
+    finally:
+        await poller.close()
@@ -0,0 +1,111 @@
+#Script for running every part of the project from one command, e.g. python Sensor_CLI.py log
+
+
+import argparse  # Module for reading the subcommand and its options
+import sys       # Module for the exit status
+
+# Each subcommand imports the scripts it runs inside its own function, so e.g. 'log' never loads
+# matplotlib, pandas or scipy and starts in a fraction of a second even on a Raspberry Pi
+
+
+def run_log(options):
+    # Poll the sensor nodes and write their logs (settings at the top of Get_Readings_and_Write.main)
+    from Get_Readings_and_Write import main
+    main()
+
+
+def run_ingest(options):
+    # Accept readings pushed by the nodes and write them to the same logs (see Ingestion_Server.py)
+    from Ingestion_Server import main
+    main()
+
+
+def run_plot(options):
+    # Show the live temperature vs. humidity plot
+    from Animated_Plot import main
+    main()
+
+
+def run_calibrate(options):
+    # Fit the sensor against the Lascar data logger, with the plots or (streaming) just the numbers
+    start_time = None if options.start_time.lower() == 'none' else options.start_time
+    csv_files = options.csv_files or None
+    if not options.streaming:
+        from Calibration_Analysis import main
+        main(options.sensor_log, csv_files, start_time, use_parse_cache=not options.no_cache)
+        return
+    from datetime import datetime
+    from Streaming_Calibration import streaming_calibration
+    if csv_files is None:
+        csv_files = ['CSV-Data-Session1.csv', 'CSV-Data-Session2.csv']
+    if start_time is not None:
+        start_time = datetime.strptime(start_time, "%H:%M").time()
+    fit_temp, fit_humid, matched = streaming_calibration(options.sensor_log, csv_files, start_time_of_day=start_time)
+    print(f"Matched {matched} points")
+    print(f"Temperature fit: y = {fit_temp.slope:.4f}x + {fit_temp.intercept:.4f}  r = {fit_temp.rvalue:.4f}  stderr = {fit_temp.stderr:.4f}")
+    print(f"Humidity fit:    y = {fit_humid.slope:.4f}x + {fit_humid.intercept:.4f}  r = {fit_humid.rvalue:.4f}  stderr = {fit_humid.stderr:.4f}")
+
+
+def run_convert(options):
+    # Convert a text sensor log into a binary log (see Binary_Log.py)
+    import os
+    from Binary_Log import convert_text_log
+    binary_log = options.binary_log or os.path.splitext(options.text_log)[0] + ".bin"
+    records, bad_lines = convert_text_log(options.text_log, binary_log)
+    print(f"Wrote {records} records to {binary_log} ({bad_lines} malformed lines skipped)")
+
+
+def build_parser():
+    """
+    Build the command line parser, with one subparser per subcommand.
+
+    Returns:
+        ArgumentParser: The parser; each subcommand sets 'handler' to the function that runs it.
+    """
+    parser = argparse.ArgumentParser(description="Log, ingest, plot, calibrate and convert DHT22 sensor data.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    log_parser = subparsers.add_parser('log', help="poll the sensor nodes and write their logs")
+    log_parser.set_defaults(handler=run_log)
+
+    ingest_parser = subparsers.add_parser('ingest', help="accept readings pushed by the nodes and write their logs")
+    ingest_parser.set_defaults(handler=run_ingest)
+
+    plot_parser = subparsers.add_parser('plot', help="show the live temperature vs. humidity plot")
+    plot_parser.set_defaults(handler=run_plot)
+
+    calibrate_parser = subparsers.add_parser('calibrate', help="fit the sensor against the Lascar data logger")
+    calibrate_parser.add_argument('sensor_log', nargs='?', default='sensor_log.txt', help="the sensor log")
+    calibrate_parser.add_argument('csv_files', nargs='*', help="the Lascar CSV exports")
+    calibrate_parser.add_argument('--start-time', default="14:30", help="ignore sensor readings before this time of day (HH:MM), or 'none'")
+    calibrate_parser.add_argument('--no-cache', action='store_true', help="parse the files again instead of using the parse cache")
+    calibrate_parser.add_argument('--streaming', action='store_true', help="only print the fits, in constant memory (see Streaming_Calibration.py)")
+    calibrate_parser.set_defaults(handler=run_calibrate)
+
+    convert_parser = subparsers.add_parser('convert', help="convert a text sensor log into a binary log")
+    convert_parser.add_argument('text_log', nargs='?', default='sensor_log.txt', help="the text log to read")
+    convert_parser.add_argument('binary_log', nargs='?', help="the binary log to write (default: the text log's name with .bin)")
+    convert_parser.set_defaults(handler=run_convert)
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the subcommand named on the command line.
+
+    Args:
+        argv (list of str): The arguments, or None for sys.argv[1:].
+    """
+    options = build_parser().parse_args(argv)
+    try:
+        options.handler(options)
+    except KeyboardInterrupt:
+        pass
+    except FileNotFoundError as e:
+        print(f"File not found: {e.filename}")
+        sys.exit(1)
+
+
+# Run with e.g. python Sensor_CLI.py calibrate sensor_log.txt Session1.csv Session2.csv --start-time 14:30
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#Script with the functions for fetching, parsing and converting the sensor's readings, shared by every script
+
+
+import urllib.request  # Module for fetching URLs (for accessing the sensor's web server)
+import re              # Module for regular expressions (for parsing the HTML data)
+import time            # Module for handling time-related functions (for timing requests)
+
+from Metrics import FETCH_SECONDS, FETCH_ERRORS, PARSE_FAILURES
+
+def fetch_sensor_data(url, timeout=None):
+    """
+    Fetch the raw HTML data from the sensor's web server.
+
+    Args:
+        url (str): The URL of the sensor's web server.
+        timeout (float): Seconds to wait for the server before giving up, or None to wait indefinitely.
+
+    Returns:
+        str: The HTML content retrieved from the server, or None if an error occurs.
+    """
+    # Label the metrics with host and path, e.g. "192.168.0.5/temp"
+    endpoint = url.split('://', 1)[-1]
+    start = time.perf_counter()
+    try:
+        # Open the URL and read the response
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            # Read the data and decode it from bytes to a UTF-8 string
+            data = response.read().decode('utf-8')
+            FETCH_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+            return data
+    except Exception as e:
+        # urllib reports a timeout while connecting as a URLError wrapping the TimeoutError
+        timed_out = isinstance(e, TimeoutError) or isinstance(getattr(e, 'reason', None), TimeoutError)
+        FETCH_ERRORS.labels(endpoint, 'timeout' if timed_out else 'error').inc()
+        # Print an error message if something goes wrong during the request
+        print(f"Error fetching data from {url}: {e}")
+        return None
+
+def parse_sensor_data_temp(temp_html_data):
+    """
+    Parse the temperature data from the HTML content.
+
+    Args:
+        html_data (str): The HTML content containing the sensor data.
+
+    Returns:
+        float: A float - the temperature in Fahrenheit,
+               or None if parsing fails.
+    """
+    try:
+        # Define regular expression patterns to find temperature values
+        temp_pattern = r"Temperature: ([\d\.]+) F"
+
+        # Search the HTML data for the temperature pattern
+        temp_match = re.search(temp_pattern, temp_html_data)
+
+        if temp_match:
+            # Extract the temperature value from the regex match and convert to float
+            temperature_f = float(temp_match.group(1))
+           
+            return temperature_f
+        else:
+            # If the pattern is not found, print a warning message
+            print("Failed to parse sensor temperature data from HTML content.")
+            PARSE_FAILURES.labels('temperature').inc()
+            return None
+    except Exception as e:
+        # Print an error message if something goes wrong during parsing
+        print(f"Error parsing sensor temperature data: {e}")
+        PARSE_FAILURES.labels('temperature').inc()
+        return None
+       
+def parse_sensor_data_hmdt(hmdt_html_data):
+    """
+    Parse the humidity data from the HTML content.
+
+    Args:
+        html_data (str): The HTML content containing the sensor data.
+
+    Returns:
+        float: A float - the humidity percentage,
+               or None if parsing fails.
+    """
+    try:
+        # Define regular expression patterns to find humidity values
+        humidity_pattern = r"Humidity: ([\d\.]+)%"
+
+        # Search the HTML data for the humidity pattern
+        humidity_match = re.search(humidity_pattern, hmdt_html_data)
+
+        if humidity_match:
+            # Extract the humidity value from the regex match and convert to float
+            humidity = float(humidity_match.group(1))
+            return humidity
+        else:
+            # If the pattern is not found, print a warning message
+            print("Failed to parse sensor humidity data from HTML content.")
+            PARSE_FAILURES.labels('humidity').inc()
+            return None
+    except Exception as e:
+        # Print an error message if something goes wrong during parsing
+        print(f"Error parsing sensor humidity data: {e}")
+        PARSE_FAILURES.labels('humidity').inc()
+        return None
+
+def fahrenheit_to_celsius(temp_f):
+    """
+    Convert a temperature from Fahrenheit to Celsius.
+
+    Args:
+        temp_f (float): Temperature in degrees Fahrenheit.
+
+    Returns:
+        float: Temperature converted to degrees Celsius.
+    """
+    # Apply the Fahrenheit to Celsius conversion formula
+    temp_c = (temp_f - 32) * 5.0 / 9.0
+    return temp_c
+
+def get_readings(temp_url, hmdt_url, timeout=None):
+    """
+    Fetch and parse sensor data from the web server, and convert the temperature to Celsius.
+
+    Args:
+        temp_url (str): The URL of the sensor's temperature page.
+        hmdt_url (str): The URL of the sensor's humidity page.
+        timeout (float): Seconds to wait for each request, or None to wait indefinitely.
+
+    Returns:
+        tuple: A tuple containing the temperature in Celsius and the humidity percentage,
+               or (None, None) if data retrieval fails.
+    """
+    # Fetch the raw HTML data from the sensor's web server
+    temp_html_data = fetch_sensor_data(temp_url, timeout)
+    hmdt_html_data = fetch_sensor_data(hmdt_url, timeout)
+    if temp_html_data and hmdt_html_data:
+        # Parse the temperature and humidity values from the HTML data
+        temp_f = parse_sensor_data_temp(temp_html_data)
+        humidity = parse_sensor_data_hmdt(hmdt_html_data)
+        if temp_f is not None and humidity is not None:
+            # Convert the temperature from Fahrenheit to Celsius
+            temp_c = fahrenheit_to_celsius(temp_f)
+            return temp_c, humidity
+    # Return None values if data fetching or parsing failed
+    return None, None
@@ -0,0 +1,174 @@
+#Script for a local stand-in for the ESP8266 DHTServer, for testing and benchmarking without the real sensor
+
+
+import sys             # Module for reading command line arguments
+import time            # Module for handling time-related functions (for simulating slow responses)
+import random          # Module for generating random readings, delays and failures
+import threading       # Module for serving in the background and keeping the counters consistent
+import http.server     # Module for the HTTP server itself
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answer requests the same way the DHTServer firmware (Wifi_Code.ido) does.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        sensor = self.server.sensor
+        delay, fail = sensor.next_request()
+        time.sleep(delay)
+        if fail:
+            # Hang up without answering, as a node dropping off the WiFi would
+            self.close_connection = True
+            return
+
+        if self.path == "/temp":
+            body = f"Temperature: {sensor.read_temperature_f()} F"
+        elif self.path == "/humidity":
+            body = f"Humidity: {sensor.read_humidity()}%"
+        elif self.path == "/":
+            body = "Hello from the weather esp8266, read from /temp or /humidity"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        if not sensor.keep_alive:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Stay quiet - a benchmark makes thousands of requests
+        pass
+
+
+class StandInSensor:
+    """
+    A local HTTP server that mimics one sensor node's /temp and /humidity pages.
+
+    Like the firmware it reports whole numbers ("Temperature: 72 F", "Humidity: 45%")
+    and, unless threaded is set, answers one request at a time. Each response can be
+    delayed by a fixed latency plus random jitter, and a fraction of requests can fail.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, failure_rate=0.0,
+                 keep_alive=False, threaded=False, seed=None):
+        """
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on, or 0 for any free port.
+            latency (float): Seconds added to every response.
+            jitter (float): Up to this many seconds more (uniformly random) added to every response.
+            failure_rate (float): Fraction of requests answered by hanging up, between 0 and 1.
+            keep_alive (bool): Whether to keep connections open between requests. The firmware closes them.
+            threaded (bool): Whether to answer requests concurrently. The firmware answers one at a time.
+            seed (int): Seed for the random number generator, so runs are repeatable.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.keep_alive = keep_alive
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._temperature_f = 70.0
+        self._humidity = 45.0
+        server_class = http.server.ThreadingHTTPServer if threaded else http.server.HTTPServer
+        self._server = server_class((host, port), StandInHandler)
+        self._server.sensor = self
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def next_request(self):
+        """
+        Count a request and decide how it will be answered.
+
+        Returns:
+            tuple: The delay in seconds before answering, and whether the request fails.
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._rng.uniform(0.0, self.jitter)
+            fail = self._rng.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        return delay, fail
+
+    def read_temperature_f(self):
+        # Random walk around room temperature, truncated to a whole number like the firmware
+        with self._lock:
+            self._temperature_f = min(max(self._temperature_f + self._rng.gauss(0, 0.2), 50.0), 95.0)
+            return int(self._temperature_f)
+
+    def read_humidity(self):
+        with self._lock:
+            self._humidity = min(max(self._humidity + self._rng.gauss(0, 0.5), 20.0), 80.0)
+            return int(self._humidity)
+
+    def serve_forever(self):
+        """
+        Serve requests in this thread until stop() is called from another one.
+        """
+        self._server.serve_forever()
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        Returns:
+            StandInSensor: This stand-in, so it can be started inline.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="stand-in-sensor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving and release the port.
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+# Serve a stand-in until interrupted, e.g. python Sensor_Stand_In.py 8080 0.2 0.1 0.05
+# (port, latency, jitter and failure rate) and point a script at http://127.0.0.1:8080
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    jitter = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    failure_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.0
+    sensor = StandInSensor(port=port, latency=latency, jitter=jitter, failure_rate=failure_rate)
+    print(f"Stand-in sensor serving {sensor.url}/temp and {sensor.url}/humidity")
+    try:
+        sensor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sensor.stop()
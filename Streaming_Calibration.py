@@ -0,0 +1,213 @@
+#Script for calibrating the DHT22 against the Lascar data logger without loading whole logs into memory
+
+import math
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+from scipy.stats import t as t_distribution
+
+from Calibration_Analysis import parse_sensor_log_chunk, iter_lascar_chunks, merge_sorted_sessions
+
+# Same fields as the result of scipy.stats.linregress
+LinregressResult = namedtuple('LinregressResult', ['slope', 'intercept', 'rvalue', 'pvalue', 'stderr', 'intercept_stderr'])
+
+
+# Running linear regression of y on x that only keeps sufficient statistics:
+# the count, the means and the sums of squared/cross deviations from the means.
+# Chunks are combined with Chan et al.'s parallel update, which stays accurate where
+# raw sums of squares would lose precision over long histories.
+class RunningLinregress:
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.ss_x = 0.0   # sum of (x - mean_x)^2
+        self.ss_y = 0.0   # sum of (y - mean_y)^2
+        self.ss_xy = 0.0  # sum of (x - mean_x)(y - mean_y)
+
+    # Add a chunk of paired values (any array-likes of equal length)
+    def update(self, x, y):
+        x = pd.Series(x, dtype='float64').to_numpy()
+        y = pd.Series(y, dtype='float64').to_numpy()
+        n_b = len(x)
+        if n_b == 0:
+            return
+        mean_x_b = x.mean()
+        mean_y_b = y.mean()
+        dx = x - mean_x_b
+        dy = y - mean_y_b
+        ss_x_b = (dx * dx).sum()
+        ss_y_b = (dy * dy).sum()
+        ss_xy_b = (dx * dy).sum()
+
+        # Combine this chunk's statistics with everything seen so far
+        n = self.n + n_b
+        delta_x = mean_x_b - self.mean_x
+        delta_y = mean_y_b - self.mean_y
+        weight = self.n * n_b / n
+        self.ss_x += ss_x_b + delta_x * delta_x * weight
+        self.ss_y += ss_y_b + delta_y * delta_y * weight
+        self.ss_xy += ss_xy_b + delta_x * delta_y * weight
+        self.mean_x += delta_x * n_b / n
+        self.mean_y += delta_y * n_b / n
+        self.n = n
+
+    # Work out the fit from the statistics, the same way scipy.stats.linregress does
+    def result(self):
+        n = self.n
+        if n < 2:
+            raise ValueError("Need at least two matched points to fit a line")
+        if self.ss_x == 0:
+            raise ValueError("Cannot calculate a linear regression if all x values are identical")
+        # linregress uses the population (divide by n) covariances
+        ssxm = self.ss_x / n
+        ssym = self.ss_y / n
+        ssxym = self.ss_xy / n
+        if ssym == 0:
+            r = 0.0
+        else:
+            r = max(min(ssxym / math.sqrt(ssxm * ssym), 1.0), -1.0)
+        slope = ssxym / ssxm
+        intercept = self.mean_y - slope * self.mean_x
+        if n == 2:
+            # A line through two points is exact
+            pvalue = 1.0 if ssym == 0 else 0.0
+            slope_stderr = 0.0
+            intercept_stderr = 0.0
+        else:
+            df = n - 2
+            TINY = 1.0e-20
+            t_stat = r * math.sqrt(df / ((1.0 - r + TINY) * (1.0 + r + TINY)))
+            pvalue = 2 * t_distribution.sf(abs(t_stat), df)
+            slope_stderr = math.sqrt((1 - r ** 2) * ssym / ssxm / df)
+            intercept_stderr = slope_stderr * math.sqrt(ssxm + self.mean_x ** 2)
+        return LinregressResult(float(slope), float(intercept), float(r), float(pvalue), slope_stderr, intercept_stderr)
+
+
+# Function to read the sensor log text file in blocks of whole lines, parsing each block as it's read
+def iter_sensor_log_chunks(file_path, chunk_bytes=16 * 1024 * 1024):
+    skipped = 0
+    remainder = b''
+    with open(file_path, 'rb') as file:
+        while True:
+            block = file.read(chunk_bytes)
+            if not block:
+                break
+            block = remainder + block
+            # Hold back the partial line at the end until the next block completes it
+            cut = block.rfind(b'\n') + 1
+            remainder = block[cut:]
+            if cut:
+                sensor_df, chunk_skipped = parse_sensor_log_chunk(block[:cut])
+                skipped += chunk_skipped
+                yield sensor_df
+    if remainder.strip():
+        # A last line without its newline is still being written (or was cut off) - it isn't parsed
+        skipped += 1
+    if skipped:
+        print(f"Skipped {skipped} malformed lines in {file_path}")
+
+
+# Function to read a Lascar CSV file in chunks that are each in time order
+def iter_sorted_lascar_chunks(file_path, chunk_rows=100000):
+    for chunk in iter_lascar_chunks(file_path, chunk_rows):
+        # A logger session is recorded in time order, so this is normally a no-op check
+        if not chunk['Time'].is_monotonic_increasing:
+            chunk = chunk.sort_values('Time', kind='stable')
+        if len(chunk):
+            yield chunk.reset_index(drop=True)
+
+# Function to read several Lascar sessions as one stream in time order, a chunk at a time
+# Sessions may overlap in time: the rows every session has got past are merged with
+# merge_sorted_sessions (a k-way merge) and passed on, holding at most one chunk per session.
+# Rows with equal times always come out in the order of their sessions' first times, as
+# extract_csv_data gives them, so the matches are the same as in Calibration_Analysis.py
+def iter_lascar_sessions(file_paths, chunk_rows=100000):
+    sessions = []
+    for file_path in file_paths:
+        chunks = iter_sorted_lascar_chunks(file_path, chunk_rows)
+        first_chunk = next(chunks, None)
+        if first_chunk is not None:
+            sessions.append([first_chunk, chunks])
+    sessions.sort(key=lambda session: session[0]['Time'].iloc[0])
+    while sessions:
+        # No session can still produce a row earlier than the end of the chunk that ends first
+        ready_until = min(chunk['Time'].iloc[-1] for chunk, _ in sessions)
+        ready = []
+        for session in sessions:
+            chunk = session[0]
+            cut = int(chunk['Time'].searchsorted(ready_until, side='right'))
+            ready.append(chunk.iloc[:cut])
+            session[0] = chunk.iloc[cut:].reset_index(drop=True)
+        yield merge_sorted_sessions(ready, keep_order=True)
+        # Top up the sessions that were used up, and drop the ones that have ended
+        for session in sessions:
+            if len(session[0]) == 0:
+                session[0] = next(session[1], None)
+        sessions = [session for session in sessions if session[0] is not None]
+
+
+# Function to match sensor chunks to reference chunks with the same rule as pd.merge_asof,
+# holding only the reference rows that can still match the current sensor chunk.
+# Both streams must be in time order. Yields merged chunks with unmatched rows dropped.
+def align_chunks(sensor_chunks, lascar_chunks, tolerance=pd.Timedelta('10sec'), direction='nearest'):
+    lascar_chunks = iter(lascar_chunks)
+    buffer = None
+    exhausted = False
+    last_time = None
+    for sensor_chunk in sensor_chunks:
+        if len(sensor_chunk) == 0:
+            continue
+        sensor_chunk = sensor_chunk.sort_values('Time')
+        if last_time is not None and sensor_chunk['Time'].iloc[0] < last_time:
+            print("Warning: sensor log is not in time order - some points may not be matched")
+        last_time = sensor_chunk['Time'].iloc[-1]
+
+        # Pull in reference rows until they reach past the end of this chunk's matching window
+        window_end = last_time + tolerance
+        while not exhausted and (buffer is None or len(buffer) == 0 or buffer['Time'].iloc[-1] <= window_end):
+            lascar_chunk = next(lascar_chunks, None)
+            if lascar_chunk is None:
+                exhausted = True
+            else:
+                buffer = lascar_chunk if buffer is None else pd.concat([buffer, lascar_chunk], ignore_index=True)
+        if buffer is None:
+            return
+
+        merged = pd.merge_asof(sensor_chunk, buffer, on='Time', direction=direction, tolerance=tolerance)
+        yield merged.dropna(subset=['Lascar_Temperature', 'Lascar_Humidity'])
+
+        # Rows older than this can't be within the tolerance of any later sensor reading
+        buffer = buffer[buffer['Time'] >= last_time - tolerance]
+
+
+# Function to run the whole calibration fit in constant memory
+# Returns the temperature and humidity fits (same fields as linregress) and the number of matched points
+def streaming_calibration(sensor_log_file, csv_files, start_time_of_day=None, tolerance=pd.Timedelta('10sec'),
+                          chunk_bytes=16 * 1024 * 1024, chunk_rows=100000):
+    temperature_fit = RunningLinregress()
+    humidity_fit = RunningLinregress()
+
+    sensor_chunks = iter_sensor_log_chunks(sensor_log_file, chunk_bytes)
+    if start_time_of_day is not None:
+        # Same as the mask in Calibration_Analysis.py, applied to each chunk
+        sensor_chunks = (chunk[chunk['Time'].dt.time >= start_time_of_day] for chunk in sensor_chunks)
+
+    for merged in align_chunks(sensor_chunks, iter_lascar_sessions(csv_files, chunk_rows), tolerance):
+        temperature_fit.update(merged['Sensor_Temperature'], merged['Lascar_Temperature'])
+        humidity_fit.update(merged['Sensor_Humidity'], merged['Lascar_Humidity'])
+
+    return temperature_fit.result(), humidity_fit.result(), temperature_fit.n
+
+
+if __name__ == "__main__":
+    # Same files and 14:30 cut-off as Calibration_Analysis.py
+    sensor_log_file = 'sensor_log.txt'
+    csv_files = ['CSV-Data-Session1.csv', 'CSV-Data-Session2.csv']
+    start_time = datetime.strptime("14:30", "%H:%M").time()
+
+    fit_temp, fit_humid, matched = streaming_calibration(sensor_log_file, csv_files, start_time_of_day=start_time)
+    print(f"Matched {matched} points")
+    print(f"Temperature fit: y = {fit_temp.slope:.4f}x + {fit_temp.intercept:.4f}  r = {fit_temp.rvalue:.4f}  stderr = {fit_temp.stderr:.4f}")
+    print(f"Humidity fit:    y = {fit_humid.slope:.4f}x + {fit_humid.intercept:.4f}  r = {fit_humid.rvalue:.4f}  stderr = {fit_humid.stderr:.4f}")
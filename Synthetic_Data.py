@@ -0,0 +1,114 @@
+#Script for generating synthetic sensor logs and Lascar data logger CSVs for testing and benchmarking
+
+
+import sys     # Module for reading command line arguments
+import math    # Module for math functions (for the dew point)
+import random  # Module for generating random readings
+from datetime import datetime, timedelta
+
+from Log_Writer import TIMESTAMP_FORMAT, format_log_entry
+
+
+def write_sensor_log(file_path, n_lines, start=datetime(2024, 11, 5, 14, 0, 0), interval=5,
+                     bad_fraction=0.0, seed=0, chunk_lines=100000):
+    """
+    Write a synthetic sensor log in the same format as Get_Readings_and_Write.py.
+
+    The readings drift slowly around room conditions with some noise, and a
+    fraction of the lines can be corrupted to mimic truncated writes.
+
+    Args:
+        file_path (str): The log file to create (an existing file is overwritten).
+        n_lines (int): Number of lines to write.
+        start (datetime): Timestamp of the first reading.
+        interval (float): Seconds between readings.
+        bad_fraction (float): Fraction of lines to truncate, between 0 and 1.
+        seed (int): Seed for the random number generator, so runs are repeatable.
+        chunk_lines (int): Number of lines built in memory before each write.
+    """
+    rng = random.Random(seed)
+    temperature_c = 21.0
+    humidity = 45.0
+    with open(file_path, 'w', encoding='utf-8') as file:
+        chunk = []
+        for i in range(n_lines):
+            # Random walk that stays within sensible room conditions
+            temperature_c = min(max(temperature_c + rng.gauss(0, 0.05), 10.0), 35.0)
+            humidity = min(max(humidity + rng.gauss(0, 0.2), 20.0), 80.0)
+            timestamp = (start + timedelta(seconds=i * interval)).strftime(TIMESTAMP_FORMAT)
+            log_entry = format_log_entry(timestamp, temperature_c, humidity)
+            if bad_fraction and rng.random() < bad_fraction:
+                # Cut the line short, as if the write was interrupted
+                log_entry = log_entry[:rng.randrange(1, len(log_entry) - 1)]
+            chunk.append(log_entry + "\n")
+            if len(chunk) >= chunk_lines:
+                file.write("".join(chunk))
+                chunk = []
+        file.write("".join(chunk))
+
+
+def dew_point(temperature_c, humidity):
+    """
+    Approximate the dew point with the Magnus formula, as the Lascar software reports it.
+
+    Args:
+        temperature_c (float): Temperature in degrees Celsius.
+        humidity (float): Relative humidity in percentage.
+
+    Returns:
+        float: The dew point in degrees Celsius.
+    """
+    gamma = math.log(humidity / 100.0) + 17.62 * temperature_c / (243.12 + temperature_c)
+    return 243.12 * gamma / (17.62 - gamma)
+
+
+def write_lascar_csv(file_path, n_rows, start=datetime(2024, 11, 5, 14, 0, 0), interval=10,
+                     serial_number="10456789", seed=0, chunk_rows=100000):
+    """
+    Write a synthetic Lascar EL-USB data logger export, as read by extract_csv_data in Calibration_Analysis.py.
+
+    The file starts with a few lines of logger metadata, then the
+    'Reading,Date / Time (UTC),...' header and one row per reading. As in the real
+    exports, only the first row carries the serial number.
+
+    Args:
+        file_path (str): The CSV file to create (an existing file is overwritten).
+        n_rows (int): Number of readings to write.
+        start (datetime): Timestamp (UTC) of the first reading.
+        interval (float): Seconds between readings.
+        serial_number (str): The logger's serial number.
+        seed (int): Seed for the random number generator, so runs are repeatable.
+        chunk_rows (int): Number of rows built in memory before each write.
+    """
+    rng = random.Random(seed)
+    temperature_c = 21.0
+    humidity = 45.0
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(f"Logger,EL-USB-2\nSerial Number,{serial_number}\nSample Rate,{interval} s\n\n")
+        file.write("Reading,Date / Time (UTC),Temperature (°C),Humidity (%RH),Dew Point (°C),Serial Number\n")
+        chunk = []
+        for i in range(n_rows):
+            # Random walk, like the sensor log - the logger records to 0.5 °C and 0.5 %RH
+            temperature_c = min(max(temperature_c + rng.gauss(0, 0.05), 10.0), 35.0)
+            humidity = min(max(humidity + rng.gauss(0, 0.2), 20.0), 80.0)
+            timestamp = (start + timedelta(seconds=i * interval)).strftime('%Y/%m/%d %H:%M:%S')
+            logged_temperature = round(temperature_c * 2) / 2
+            logged_humidity = round(humidity * 2) / 2
+            row = f"{i + 1},{timestamp},{logged_temperature:.1f},{logged_humidity:.1f},{dew_point(logged_temperature, logged_humidity):.1f}"
+            chunk.append(row + (f",{serial_number}\n" if i == 0 else "\n"))
+            if len(chunk) >= chunk_rows:
+                file.write("".join(chunk))
+                chunk = []
+        file.write("".join(chunk))
+
+
+# Write a log given on the command line, e.g. python Synthetic_Data.py synthetic_log.txt 1000000
+# or a Lascar CSV, e.g. python Synthetic_Data.py synthetic_session.csv 100000
+if __name__ == "__main__":
+    output_file = sys.argv[1] if len(sys.argv) > 1 else "synthetic_sensor_log.txt"
+    line_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    if output_file.endswith(".csv"):
+        write_lascar_csv(output_file, line_count)
+    else:
+        write_sensor_log(output_file, line_count)
+    print(f"Wrote {line_count} lines to {output_file}")
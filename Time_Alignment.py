@@ -0,0 +1,130 @@
+#Script for matching the readings of any number of sensors to a reference data logger's timeline in one pass
+
+
+import numpy as np
+import pandas as pd
+
+# Rows matched at a time, to bound the memory used by the temporary arrays on very long streams
+BLOCK_ROWS = 4_000_000
+
+
+def match_times(times, reference_times, tolerance=None, direction='nearest', block_rows=BLOCK_ROWS):
+    """
+    Find the reference reading that matches each time, with the same rules as pd.merge_asof.
+
+    Args:
+        times (array-like): The times to match, in any order.
+        reference_times (array-like): The reference times, sorted in increasing order.
+        tolerance (Timedelta): The largest allowed distance between matched times, or None for no limit.
+        direction (str): 'backward' (the last reference at or before each time), 'forward'
+            (the first at or after it) or 'nearest' (whichever is closer, backward on a tie).
+        block_rows (int): Number of times matched at once.
+
+    Returns:
+        tuple: The index into reference_times of each match (-1 where there is none), and the
+               offset of each time from its match as timedelta64[ns] (NaT where there is none).
+    """
+    if direction not in ('backward', 'forward', 'nearest'):
+        raise ValueError(f"direction must be 'backward', 'forward' or 'nearest', not {direction!r}")
+    # Work on the raw nanosecond counts - searchsorted on int64 is the fastest path numpy has
+    times = np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+    reference = np.asarray(reference_times, dtype='datetime64[ns]').view(np.int64)
+    limit = None if tolerance is None else pd.Timedelta(tolerance).value
+
+    indices = np.full(len(times), -1, dtype=np.int64)
+    offsets = np.zeros(len(times), dtype=np.int64)
+    if len(reference) == 0:
+        return indices, np.full(len(times), np.timedelta64('NaT'), dtype='timedelta64[ns]')
+    for start in range(0, len(times), block_rows):
+        block = times[start:start + block_rows]
+        # The last reference at or before each time, and the first at or after it
+        backward = np.searchsorted(reference, block, side='right') - 1
+        forward = np.searchsorted(reference, block, side='left')
+        has_backward = backward >= 0
+        has_forward = forward < len(reference)
+        backward_distance = np.where(has_backward, block - reference[np.maximum(backward, 0)], np.iinfo(np.int64).max)
+        forward_distance = np.where(has_forward, reference[np.minimum(forward, len(reference) - 1)] - block, np.iinfo(np.int64).max)
+        if direction == 'backward':
+            chosen, found, distance = backward, has_backward, backward_distance
+        elif direction == 'forward':
+            chosen, found, distance = forward, has_forward, forward_distance
+        else:
+            use_forward = forward_distance < backward_distance
+            chosen = np.where(use_forward, forward, backward)
+            found = has_backward | has_forward
+            distance = np.minimum(backward_distance, forward_distance)
+        if limit is not None:
+            found &= distance <= limit
+        indices[start:start + len(block)] = np.where(found, chosen, -1)
+        offsets[start:start + len(block)] = block - reference[np.clip(chosen, 0, len(reference) - 1)]
+
+    offsets = offsets.view('timedelta64[ns]')
+    offsets[indices < 0] = np.timedelta64('NaT')
+    return indices, offsets
+
+
+def stack_streams(streams, sensor_column='Sensor'):
+    """
+    Combine the frames of several sensors into one long frame, with a column naming each row's sensor.
+
+    Args:
+        streams (dict): Maps each sensor's name to its DataFrame (all with the same columns).
+        sensor_column (str): Name of the column that names the sensor.
+
+    Returns:
+        DataFrame: Every row of every stream, with sensor_column as a categorical column.
+    """
+    names = list(streams)
+    stacked = pd.concat([streams[name] for name in names], ignore_index=True)
+    codes = np.repeat(np.arange(len(names)), [len(streams[name]) for name in names])
+    stacked.insert(0, sensor_column, pd.Categorical.from_codes(codes, categories=names))
+    return stacked
+
+
+def align_to_reference(sensor_data, reference_data, tolerance=pd.Timedelta('10sec'), direction='nearest',
+                       dropna=True, offset_column='Offset'):
+    """
+    Match every sensor reading to a reading of the reference logger, for any number of sensors at once.
+
+    All the streams are matched in a single vectorized pass, whatever their number, and
+    the result is one frame rather than a merged frame per sensor. With one sensor and
+    the defaults it gives the same matches as
+    pd.merge_asof(sensor_data, reference_data, on='Time', direction='nearest', tolerance=10 s).
+
+    Args:
+        sensor_data (DataFrame): Sensor readings with a 'Time' column, in any order. Several
+            sensors can be stacked in one frame (see stack_streams).
+        reference_data (DataFrame): Reference readings with a 'Time' column.
+        tolerance (Timedelta): The largest allowed distance between matched times, or None for no limit.
+        direction (str): 'backward', 'forward' or 'nearest', as in match_times.
+        dropna (bool): Whether to drop sensor readings that have no match. If False they are
+            kept, with NaN reference values.
+        offset_column (str): Name of the column for each row's sensor time minus its reference time.
+
+    Returns:
+        DataFrame: The sensor columns, the reference columns (other than 'Time') and the offset.
+    """
+    if not reference_data['Time'].is_monotonic_increasing:
+        reference_data = reference_data.sort_values('Time', kind='stable')
+    reference_columns = [column for column in reference_data.columns if column != 'Time']
+    clashes = set(reference_columns) & (set(sensor_data.columns) | {offset_column})
+    if clashes:
+        raise ValueError(f"Sensor and reference data both have the columns {sorted(clashes)}")
+
+    indices, offsets = match_times(sensor_data['Time'], reference_data['Time'], tolerance, direction)
+    matched = indices >= 0
+    if dropna:
+        aligned = sensor_data[matched].reset_index(drop=True)
+        indices = indices[matched]
+        offsets = offsets[matched]
+    else:
+        aligned = sensor_data.reset_index(drop=True)
+    for column in reference_columns:
+        values = reference_data[column].to_numpy()
+        if dropna:
+            aligned[column] = values[indices]
+        else:
+            # Unmatched rows get NaN - float columns (like the readings) can hold it
+            aligned[column] = np.where(matched, values[np.maximum(indices, 0)].astype('float64'), np.nan)
+    aligned[offset_column] = offsets
+    return aligned
@@ -0,0 +1,31 @@
+#Tests for the per-subscriber downsampling in Acquisition_Service.py
+
+
+from Acquisition_Service import Subscriber, decode_reading
+
+
+def drain(subscriber):
+    # Take every queued reading off the subscriber's queue
+    readings = []
+    while not subscriber.queue.empty():
+        readings.append(decode_reading(subscriber.queue.get_nowait()))
+    return readings
+
+
+def test_failures_are_downsampled_like_readings():
+    subscriber = Subscriber(min_interval=300.0)
+    # A node that fails every 4 s for ten minutes
+    for step in range(150):
+        subscriber.offer("node1", 1000.0 + 4 * step, None, None)
+    failures = drain(subscriber)
+    assert [reading[1] for reading in failures] == [1000.0, 1300.0]
+
+
+def test_failure_does_not_hold_back_next_reading():
+    subscriber = Subscriber(min_interval=300.0)
+    subscriber.offer("node1", 1000.0, None, None)
+    subscriber.offer("node1", 1004.0, 21.5, 40.0)
+    subscriber.offer("node1", 1008.0, 21.6, 40.1)
+    readings = drain(subscriber)
+    assert [reading[1] for reading in readings] == [1000.0, 1004.0]
+    assert readings[1][2] == 21.5
@@ -0,0 +1,42 @@
+#Tests for the time ordering of pushed readings in Ingestion_Server.py, run with python -m pytest
+
+
+import struct
+import time
+from datetime import datetime
+
+from Binary_Log import RECORD_FORMAT
+from Ingestion_Server import IngestionServer
+from Log_Index import read_window
+from Log_Writer import BufferedLogWriter
+
+
+def binary_batch(*readings):
+    return b"".join(struct.pack(RECORD_FORMAT, *reading) for reading in readings)
+
+
+def test_batches_are_sorted_and_older_readings_rejected():
+    received = []
+    server = IngestionServer(lambda host, temperature, humidity, timestamp: received.append((host, timestamp)))
+    now = time.time()
+    assert server.ingest("node1", binary_batch((now - 100, 21.0, 45.0), (now - 120, 21.0, 45.0), (now - 110, 21.0, 45.0))) == (3, 0)
+    assert [timestamp for _, timestamp in received] == [now - 120, now - 110, now - 100]
+
+    # Older than what node1 has already sent, so not appended - but another node is unaffected
+    assert server.ingest("node1", binary_batch((now - 1000, 21.0, 45.0), (now - 50, 21.0, 45.0))) == (1, 1)
+    assert server.ingest("node2", binary_batch((now - 1000, 21.0, 45.0))) == (1, 0)
+    assert received[-2:] == [("node1", now - 50), ("node2", now - 1000)]
+
+
+def test_log_stays_readable_by_window(tmp_path):
+    log_path = str(tmp_path / "sensor_log_node1.txt")
+    writer = BufferedLogWriter(log_path, max_batch=1, index_every=1)
+    server = IngestionServer(lambda host, temperature, humidity, timestamp: writer.write(temperature, humidity, timestamp))
+    now = int(time.time())
+    server.ingest("node1", binary_batch(*((now - 100 + i, 21.0, 45.0) for i in range(3))))
+    server.ingest("node1", binary_batch(*((now - 1000 + i, 22.0, 46.0) for i in range(3))))
+    writer.close()
+
+    window = read_window(log_path, datetime.fromtimestamp(now - 100), datetime.fromtimestamp(now - 98))
+    assert len(window) == 3
+    assert len(read_window(log_path, datetime.fromtimestamp(now - 1000), datetime.fromtimestamp(now - 998))) == 0
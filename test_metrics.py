@@ -0,0 +1,25 @@
+#Tests for the metrics text format in Metrics.py, run with python -m pytest
+
+
+from Metrics import MetricsRegistry, format_value
+
+
+def test_counter_above_a_million_renders_exactly():
+    registry = MetricsRegistry()
+    counter = registry.counter("rows_total", "Rows.", ["log"])
+    counter.labels("sensor_log.txt").inc(1234567)
+    counter.labels("sensor_log.txt").inc()
+    assert 'rows_total{log="sensor_log.txt"} 1234568.0' in registry.render().splitlines()
+
+
+def test_histogram_sum_renders_exactly():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("flush_seconds", "Flushes.", buckets=(1.0,))
+    histogram.observe(370370.37)
+    assert "flush_seconds_sum 370370.37" in registry.render().splitlines()
+
+
+def test_special_values():
+    assert format_value(float('inf')) == "+Inf"
+    assert format_value(float('-inf')) == "-Inf"
+    assert format_value(float('nan')) == "NaN"
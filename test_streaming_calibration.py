@@ -0,0 +1,39 @@
+#Tests that Streaming_Calibration.py gives the same fits as the in-memory analysis, run with python -m pytest
+
+
+from datetime import datetime
+
+import pytest
+from scipy.stats import linregress
+
+from Calibration_Analysis import extract_csv_data, extract_sensor_log_data_vectorized, match_calibration_data
+from Streaming_Calibration import streaming_calibration
+from Synthetic_Data import write_sensor_log, write_lascar_csv
+
+
+def in_memory_fits(sensor_log, csv_files):
+    merged = match_calibration_data(extract_sensor_log_data_vectorized(sensor_log).sort_values('Time'),
+                                    extract_csv_data(csv_files, processes=1), start_time_of_day=None)
+    return (linregress(merged['Sensor_Temperature'], merged['Lascar_Temperature']),
+            linregress(merged['Sensor_Humidity'], merged['Lascar_Humidity']), len(merged))
+
+
+@pytest.mark.parametrize('second_start, second_interval', [
+    (datetime(2024, 11, 5, 15, 0, 3), 10),  # overlapping, never at the same second
+    (datetime(2024, 11, 5, 15, 0, 0), 7),   # overlapping, with readings at the same seconds
+])
+def test_streaming_matches_in_memory(tmp_path, second_start, second_interval):
+    sensor_log = str(tmp_path / "sensor_log.txt")
+    csv_files = [str(tmp_path / "session2.csv"), str(tmp_path / "session1.csv")]
+    write_sensor_log(sensor_log, 20000, start=datetime(2024, 11, 5, 13, 0), bad_fraction=0.01)
+    write_lascar_csv(csv_files[1], 5000, start=datetime(2024, 11, 5, 13, 0), interval=10, seed=1)
+    write_lascar_csv(csv_files[0], 5000, start=second_start, interval=second_interval, seed=2)
+
+    expected_temperature, expected_humidity, expected_matched = in_memory_fits(sensor_log, csv_files)
+    # Small chunks, so the sessions are merged over many batches
+    temperature, humidity, matched = streaming_calibration(sensor_log, csv_files, chunk_bytes=64 * 1024, chunk_rows=700)
+
+    assert matched == expected_matched
+    for fit, expected in ((temperature, expected_temperature), (humidity, expected_humidity)):
+        assert fit.slope == pytest.approx(expected.slope, rel=1e-9)
+        assert fit.intercept == pytest.approx(expected.intercept, rel=1e-9)